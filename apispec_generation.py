@@ -1,7 +1,10 @@
 """
-Generates the API spec in openAPI3 format, from the
+Generates the API spec in openAPI3 format, from the docstrings of the endpoints, and saves it as openapi.yml and openapi.json.
+This is a build step, run when the endpoints change (`python apispec_generation.py`, or s/build-spec), not when the server starts:
+the server serves the saved openapi.json.
 """
 import json
+import subprocess
 
 from apispec import APISpec
 from apispec.ext.marshmallow import MarshmallowPlugin
@@ -31,11 +34,16 @@ def generate(app, api_commit_hash, api_semantic_version):
                   "description": 'Your local development API'}],
     )
 
+    # one response schema for the calculations of every reference: a schema is added to the spec only once
     spec.components.schema(
-        "uk_who_calculation",
+        "calculation",
         schema=schemas.CalculationResponseSchema)
     with app.test_request_context():
         spec.path(view=blueprints.uk_who_blueprint.uk_who_calculation)
+    with app.test_request_context():
+        spec.path(view=blueprints.uk_who_blueprint.uk_who_bulk_calculation)
+    with app.test_request_context():
+        spec.path(view=blueprints.uk_who_blueprint.uk_who_bulk_calculation_csv)
 
     spec.components.schema(
         "chartData",
@@ -51,36 +59,39 @@ def generate(app, api_commit_hash, api_semantic_version):
         spec.path(
             view=blueprints.uk_who_blueprint.uk_who_plottable_child_data)
 
-    spec.components.schema(
-        "references", schema=schemas.ReferencesResponseSchema)
-    with app.test_request_context():
-        spec.path(view=blueprints.utilities_blueprint.references)
-
-    # Instructions endpoint (TODO: #121 #120 candidate for deprecation)
-    with app.test_request_context():
-        spec.path(view=blueprints.utilities_blueprint.instructions)
-
     # Trisomy 21 endpoint
-    spec.components.schema(
-        "trisomy_21_calculation",
-        schema=schemas.CalculationResponseSchema)
     with app.test_request_context():
         spec.path(view=blueprints.trisomy_21_blueprint.trisomy_21_calculation)
+    with app.test_request_context():
+        spec.path(view=blueprints.trisomy_21_blueprint.trisomy_21_bulk_calculation)
+    with app.test_request_context():
+        spec.path(view=blueprints.trisomy_21_blueprint.trisomy_21_bulk_calculation_csv)
 
     # OpenAPI3 specification endpoint
     with app.test_request_context():
         spec.path(view=blueprints.openapi_blueprint.openapi_endpoint)
 
+    # Metrics endpoint
+    with app.test_request_context():
+        spec.path(view=blueprints.metrics_blueprint.metrics_endpoint)
+
     # Turner's syndrome endpoint
-    spec.components.schema(
-        "turner_calculation",
-        schema=schemas.CalculationResponseSchema)
     with app.test_request_context():
         spec.path(view=blueprints.turner_blueprint.turner_calculation)
+    with app.test_request_context():
+        spec.path(view=blueprints.turner_blueprint.turner_bulk_calculation)
+    with app.test_request_context():
+        spec.path(view=blueprints.turner_blueprint.turner_bulk_calculation_csv)
 
     ##### END API SPEC ########
     ###########################
 
+    # an operation key which apispec does not recognise (eg an uppercase 'POST:' in a docstring) is dropped without a warning,
+    # leaving the path empty: fail the build rather than save a spec which documents nothing for it
+    undocumented_paths = [path for path, operations in spec.to_dict()["paths"].items() if not operations]
+    if undocumented_paths:
+        raise ValueError(f"No operations were read from the docstrings of: {', '.join(undocumented_paths)}")
+
     ################################
     ### API SPEC AUTO GENERATION ###
 
@@ -95,3 +106,21 @@ def generate(app, api_commit_hash, api_semantic_version):
     ####################################
 
     return spec
+
+
+def git_commit_hash() -> str:
+    # the commit is 'baked' into the spec version
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).strip().decode('utf-8')
+    except (OSError, subprocess.CalledProcessError):
+        return "Git not available"
+
+
+if __name__ == "__main__":
+    from app import API_SEMANTIC_VERSION, create_app
+
+    api_commit_hash = git_commit_hash()
+    generate(create_app(warm_up_caches=False), api_commit_hash, API_SEMANTIC_VERSION)
+    print(" * openAPI3.0 spec was generated and saved to the repo")
+    print(f" * API semantic version is {API_SEMANTIC_VERSION}, commit hash is {api_commit_hash}")
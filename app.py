@@ -3,105 +3,140 @@ RCPCH Growth Charts API Server
 """
 
 # standard imports
-import json
+import logging
 from os import environ, urandom, path
-import subprocess
 
 # third-party imports
-from flask import Flask, json
+from flask import Flask
 from flask_cors import CORS
 
 # rcpch imports
-import apispec_generation
 import blueprints
-from rcpchgrowth.rcpchgrowth.chart_functions import create_chart
 from rcpchgrowth.rcpchgrowth.constants.parameter_constants import *
+from rcpchgrowth.rcpchgrowth.cache_backends import cache_backend
+from rcpchgrowth.rcpchgrowth.result_cache import MEASUREMENT_CACHE_SIZE, use_measurement_cache
+from rcpchgrowth.rcpchgrowth.structured_logging import configure_logging
+from rcpchgrowth.rcpchgrowth.warm_up import warm_up
 
 
 ### API VERSION AND COMMIT HASH ###
 API_SEMANTIC_VERSION = "2.1.0"  # this is manually set
 
-# Read saved version info from **saved** JSON APIspec
-# (Because Git may not exist in Live and may not be able to get current commit hash)
-with open('openapi.json') as json_file:
-    api = json.load(json_file)
-    SAVED_API_VERSION = api['info']['version']
-
-# Declare shell colour variables for pretty logging output
-OKBLUE = "\033[94m"
-OKGREEN = "\033[92m"
-WARNING = "\033[93m"
-FAIL = "\033[91m"
-ENDC = "\033[0m"
-
-
-#######################
-##### FLASK SETUP #####
-app = Flask(__name__, static_folder="static")
-CORS(app)
-
-# Declare growth chart folder for growth chart data
-chart_data_folder = path.join(app.root_path, 'chart_data')
-
-# Mount all UK-WHO endpoints from the blueprint
-app.register_blueprint(
-    blueprints.uk_who_blueprint.uk_who, url_prefix='/uk-who')
-
-# Mount all Trisomy 21 endpoints from the blueprint
-app.register_blueprint(
-    blueprints.trisomy_21_blueprint.trisomy_21, url_prefix='/trisomy-21')
-
-# Mount all Turner's endpoints from the blueprint
-app.register_blueprint(
-    blueprints.turner_blueprint.turners, url_prefix='/turner')
-
-
-# Mount openAPI3 spec endpoint from the blueprint
-app.register_blueprint(
-    blueprints.openapi_blueprint.openapi)
-
-
-# ENVIRONMENT
-# Load the secret key from the ENV if it has been set
-if "FLASK_SECRET_KEY" in environ:
-    app.secret_key = environ["FLASK_SECRET_KEY"]
-    print(f"{OKGREEN} * FLASK_SECRET_KEY was loaded from the environment{ENDC}")
-# Otherwise create a new one. (NB: We don't need session persistence between reboots of the app)
-else:
-    app.secret_key = urandom(16)
-    print(f"{OKGREEN} * A new SECRET_KEY for Flask was automatically generated{ENDC}")
-
-from app import app     # position of this import is important. Don't allow it to be autoformatted alphabetically to the top of the imports!
-
-##### END FLASK SETUP #####
-###########################
-
-
-# generate the API spec
-try:
+logger = logging.getLogger(__name__)
+
+
+def create_app(warm_up_caches: bool = None):
+    """
+    Creates the Flask app with all the endpoints mounted.
+    No subprocesses are run and no files are written: the openAPI spec is generated at build time
+    (`python apispec_generation.py`, or s/build-spec) and the saved openapi.json is served as it is.
+    Unless warm_up_caches is False (by default, unless WARM_UP=false is set in the environment), the reference arrays
+    and charts are built here, so that with `gunicorn --preload` they are built once, before the workers are forked,
+    and no first request pays for them.
+    """
+
+    # Logs go to stderr, as JSON lines unless LOG_FORMAT=text, at LOG_LEVEL and above
+    configure_logging(level=environ.get("LOG_LEVEL", "INFO"), structured=environ.get("LOG_FORMAT", "json").lower() != "text")
+
+    #######################
+    ##### FLASK SETUP #####
+    app = Flask(__name__, static_folder="static")
+    CORS(app)
+
+    # Declare growth chart folder for growth chart data
+    app.config["CHART_DATA_FOLDER"] = path.join(app.root_path, 'chart_data')
+
+    # Mount all UK-WHO endpoints from the blueprint
+    app.register_blueprint(
+        blueprints.uk_who_blueprint.uk_who, url_prefix='/uk-who')
+
+    # Mount all Trisomy 21 endpoints from the blueprint
+    app.register_blueprint(
+        blueprints.trisomy_21_blueprint.trisomy_21, url_prefix='/trisomy-21')
+
+    # Mount all Turner's endpoints from the blueprint
+    app.register_blueprint(
+        blueprints.turner_blueprint.turners, url_prefix='/turner')
+
+    # Mount openAPI3 spec endpoint from the blueprint
+    app.register_blueprint(
+        blueprints.openapi_blueprint.openapi)
+
+    # Mount the metrics endpoint, and collect request metrics from every endpoint
+    app.register_blueprint(
+        blueprints.metrics_blueprint.metrics)
+    blueprints.metrics_blueprint.request_metrics.init_app(app)
+
+    # Server-Timing headers, splitting the time of each request into the stages of its calculation
+    app.config["SERVER_TIMING"] = environ.get("SERVER_TIMING", "false").lower() in ("true", "1")
+    blueprints.server_timing.server_timing.init_app(app)
+
+    # Requests slower than SLOW_REQUEST_SECONDS are logged, with their stage timings and anonymised inputs
+    if "SLOW_REQUEST_SECONDS" in environ:
+        app.config["SLOW_REQUEST_SECONDS"] = float(environ["SLOW_REQUEST_SECONDS"])
+    blueprints.slow_requests.slow_request_log.init_app(app)
+
+    # On-demand profiling of requests sent with the PROFILING_TOKEN, read from /profiling. Off unless the token is set.
+    app.config["PROFILING_TOKEN"] = environ.get("PROFILING_TOKEN")
+    app.config["PROFILING_WINDOW"] = int(environ.get("PROFILING_WINDOW", blueprints.profiling_blueprint.DEFAULT_PROFILING_WINDOW))
+    app.register_blueprint(
+        blueprints.profiling_blueprint.profiling)
+    blueprints.profiling_blueprint.request_profiler.init_app(app)
+
+    # ENVIRONMENT
+    # Load the secret key from the ENV if it has been set
+    if "FLASK_SECRET_KEY" in environ:
+        app.secret_key = environ["FLASK_SECRET_KEY"]
+        logger.info("FLASK_SECRET_KEY was loaded from the environment")
+    # Otherwise create a new one. (NB: We don't need session persistence between reboots of the app)
+    else:
+        app.secret_key = urandom(16)
+        logger.info("A new SECRET_KEY for Flask was automatically generated")
+
+    ##### END FLASK SETUP #####
+    ###########################
+
+    if warm_up_caches is None:
+        warm_up_caches = environ.get("WARM_UP", "true").lower() != "false"
+    if warm_up_caches:
+        warmed_up = warm_up()
+        logger.info("Warmed up %s reference arrays and %s charts in %.1fs",
+                    warmed_up["reference_arrays"], warmed_up["charts"], warmed_up["seconds"], extra=warmed_up)
+
+    # Read saved version info from **saved** JSON APIspec
+    # (Because Git may not exist in Live and may not be able to get current commit hash)
+    # The spec is loaded into memory, and served from there at / (reloaded if the file is regenerated, see OpenApiSpec)
+    # Without a saved spec (eg while apispec_generation.py builds the first one), the semantic version is used
     try:
-        # if Git is available when the server is running (ie in dev) then update the server version from the Git commit hash
-        # This means we can 'bake' the commit into the openAPI spec
-        api_commit_hash = subprocess.check_output(
-            ["git", "rev-parse", "HEAD"]).strip().decode('utf-8')
-        spec = apispec_generation.generate(
-            app, api_commit_hash, API_SEMANTIC_VERSION)
-        print(f"{OKGREEN} * openAPI3.0 spec was generated and saved to the repo{ENDC}")
-        print(f"{OKGREEN} * API semantic version is {API_SEMANTIC_VERSION}, commit hash is {api_commit_hash} {ENDC}")
-    except:
-        api_commit_hash = "Git not available"
-
-except Exception as error:
-    print(f"{FAIL} * An error occurred while processing the openAPI3.0 spec{ENDC}")
-    print(f"{FAIL} *  > {error} {ENDC}")
-
-
-# adds API version details to all requests
-@app.after_request
-def add_api_version(response):
-    response.headers.add('Growth-Api-Version', SAVED_API_VERSION)
-    return response
-
-
+        saved_api_version = blueprints.openapi_blueprint.openapi_spec.version
+    except FileNotFoundError:
+        logger.warning("No saved openAPI spec: run s/build-spec. Using API version %s", API_SEMANTIC_VERSION)
+        saved_api_version = API_SEMANTIC_VERSION
+
+    # Identical calculations are answered from the result cache: in each worker (memory), shared by the workers
+    # on a node (sqlite) or by every replica (redis). Results are namespaced by the API version, so versions never share them.
+    use_measurement_cache(cache_backend(
+        environ.get("CALCULATION_CACHE", "memory"),
+        location=environ.get("CALCULATION_CACHE_LOCATION"),
+        maxsize=int(environ.get("CALCULATION_CACHE_SIZE", MEASUREMENT_CACHE_SIZE)),
+        namespace=saved_api_version,
+        ttl=int(environ["CALCULATION_CACHE_TTL"]) if "CALCULATION_CACHE_TTL" in environ else None))
+
+    # adds API version details to all requests: the version of the spec being served, which may have been regenerated since
+    @app.after_request
+    def add_api_version(response):
+        try:
+            blueprints.openapi_blueprint.openapi_spec.refresh()
+            api_version = blueprints.openapi_blueprint.openapi_spec.version
+        except FileNotFoundError:
+            api_version = saved_api_version
+        response.headers.add('Growth-Api-Version', api_version)
+        return response
+
+    return app
+
+
+# The app is created by gunicorn (`gunicorn app:create_app()`, see gunicorn.conf.py) or by `flask run`, not on import,
+# so that importing this module (eg to build the spec) neither builds nor warms up an app
 if __name__ == "__main__":
-    app.run(host='0.0.0.0')
+    create_app().run(host='0.0.0.0')
@@ -0,0 +1,220 @@
+"""
+Micro-benchmarks of the calculation core, with pytest-benchmark (in requirements.txt):
+nearest_lowest_index, fetch_lms (exact, cubic and linear branches), sds_for_measurement, measurement_from_sds, centile,
+centile_band_for_centile and the Measurement constructor, for each reference.
+
+Each benchmark runs one batch of inputs drawn from a realistic age distribution for its reference (see AGE_DISTRIBUTIONS),
+the same batch on every run, so that results can be compared between runs.
+
+Run from the root of the repository (or use s/benchmark), and save the results as a baseline:
+    python -m pytest benchmarks/bench_calculations.py --benchmark-storage=benchmarks/baselines --benchmark-save=baseline
+Compare a later run with the last saved baseline, failing if any mean is more than 10% slower:
+    python -m pytest benchmarks/bench_calculations.py --benchmark-storage=benchmarks/baselines --benchmark-compare --benchmark-compare-fail=mean:10%
+The baselines are JSON files, one per run. Compare them only with runs on the same machine.
+"""
+
+# standard imports
+import math
+import random
+from datetime import date, timedelta
+
+# third-party imports
+import pytest
+
+# skipped when collected by a test run without pytest-benchmark; s/benchmark fails without it instead
+pytest.importorskip("pytest_benchmark")
+
+# rcpch imports
+from rcpchgrowth.rcpchgrowth.centile_bands import centile_band_for_centile
+from rcpchgrowth.rcpchgrowth.constants import MEASUREMENT_METHODS, SEXES, TRISOMY_21, TURNERS, UK_WHO
+from rcpchgrowth.rcpchgrowth.global_functions import centile, fetch_lms, lms_value_array_for_measurement_for_reference, measurement_from_sds, nearest_lowest_index, sds_for_measurement
+from rcpchgrowth.rcpchgrowth.measurement import Measurement
+
+# inputs per benchmark batch
+BATCH_SIZE = 200
+
+SEED = 20210401
+
+# (share of children, lowest age, highest age) in decimal years, for each reference.
+# UK-WHO: clinic measurements are mostly of infants, with preterm babies (corrected ages below 0) and school age children.
+AGE_DISTRIBUTIONS = {
+    UK_WHO: [(0.1, -0.3, 0.0), (0.45, 0.0, 2.0), (0.15, 2.0, 4.0), (0.3, 4.0, 18.0)],
+    TURNERS: [(1.0, 1.0, 20.0)],
+    TRISOMY_21: [(0.5, 0.0, 2.0), (0.5, 2.0, 18.0)]
+}
+
+REFERENCES = [UK_WHO, TURNERS, TRISOMY_21]
+
+
+def realistic_inputs(reference: str, size: int = BATCH_SIZE) -> list:
+    """
+    Returns size measurements for the reference, as dicts of the inputs of sds_for_measurement:
+    ages from AGE_DISTRIBUTIONS, any measurement_method and sex the reference has data for at that age,
+    and the observation_value of an SDS drawn from the standard normal distribution
+    """
+    generator = random.Random(f"{SEED}-{reference}")
+    shares, lowest, highest = zip(*AGE_DISTRIBUTIONS[reference])
+    inputs = []
+    while len(inputs) < size:
+        band = generator.choices(range(len(shares)), weights=shares)[0]
+        age = round(generator.uniform(lowest[band], highest[band]), 4)
+        if reference == TURNERS:
+            measurement_method, sex = "height", "female"
+        else:
+            measurement_method, sex = generator.choice(MEASUREMENT_METHODS), generator.choice(SEXES)
+        sds = generator.gauss(0, 1)
+        try:
+            observation_value = measurement_from_sds(
+                reference=reference, requested_sds=sds, measurement_method=measurement_method, sex=sex, age=age, born_preterm=age < 0)
+        except (LookupError, TypeError, ValueError):
+            # no data for this measurement_method at this age
+            continue
+        inputs.append({
+            "reference": reference,
+            "age": age,
+            "measurement_method": measurement_method,
+            "sex": sex,
+            "born_preterm": age < 0,
+            "sds": sds,
+            "observation_value": observation_value
+        })
+    return inputs
+
+
+def lms_branch_inputs(reference: str, branch: str, size: int = BATCH_SIZE) -> list:
+    """
+    Returns size (age, LMS array) pairs for which fetch_lms takes the branch: exact (an age in the reference),
+    cubic (between two ages, within the reference) or linear (between the first two or last two ages of the reference)
+    """
+    pairs = []
+    for values in realistic_inputs(reference, size):
+        lms_array = lms_value_array_for_measurement_for_reference(
+            reference=reference, age=values["age"], measurement_method=values["measurement_method"], sex=values["sex"],
+            born_preterm=values["born_preterm"])
+        if branch == "exact":
+            index = nearest_lowest_index(lms_array, values["age"])
+            age = lms_array[index]["decimal_age"]
+        elif branch == "cubic":
+            index = min(max(nearest_lowest_index(lms_array, values["age"]), 1), len(lms_array) - 3)
+            age = (lms_array[index]["decimal_age"] + lms_array[index + 1]["decimal_age"]) / 2
+        else:
+            index = 0 if len(pairs) % 2 else len(lms_array) - 2
+            age = (lms_array[index]["decimal_age"] + lms_array[index + 1]["decimal_age"]) / 2
+        pairs.append((age, lms_array))
+    return pairs
+
+
+def measurement_inputs(reference: str, size: int = BATCH_SIZE) -> list:
+    """
+    Returns size sets of Measurement arguments, from realistic_inputs: preterm children are born at 24 to 36 weeks
+    and measured at their corrected age
+    """
+    generator = random.Random(f"{SEED}-{reference}-measurement")
+    birth_date = date(2015, 1, 1)
+    arguments = []
+    for values in realistic_inputs(reference, size):
+        if values["born_preterm"]:
+            # born early enough to have been born by the observation date
+            gestation_weeks = generator.randint(24, min(36, math.floor(40 + values["age"] * 365.25 / 7)))
+        else:
+            gestation_weeks = 40
+        # corrected age = chronological age - weeks born early
+        chronological_age = values["age"] + (40 - gestation_weeks) * 7 / 365.25
+        arguments.append({
+            "reference": reference,
+            "sex": values["sex"],
+            "birth_date": birth_date,
+            "observation_date": birth_date + timedelta(days=round(chronological_age * 365.25)),
+            "measurement_method": values["measurement_method"],
+            "observation_value": values["observation_value"],
+            "gestation_weeks": gestation_weeks,
+            "gestation_days": 0
+        })
+    return arguments
+
+
+@pytest.mark.parametrize("reference", REFERENCES)
+def test_nearest_lowest_index(benchmark, reference):
+    benchmark.group = "nearest_lowest_index"
+    pairs = lms_branch_inputs(reference, "cubic")
+
+    def run():
+        for age, lms_array in pairs:
+            nearest_lowest_index(lms_array, age)
+
+    benchmark(run)
+
+
+@pytest.mark.parametrize("branch", ["exact", "cubic", "linear"])
+@pytest.mark.parametrize("reference", REFERENCES)
+def test_fetch_lms(benchmark, reference, branch):
+    benchmark.group = f"fetch_lms {branch}"
+    pairs = lms_branch_inputs(reference, branch)
+
+    def run():
+        for age, lms_array in pairs:
+            fetch_lms(age=age, lms_value_array_for_measurement=lms_array)
+
+    benchmark(run)
+
+
+@pytest.mark.parametrize("reference", REFERENCES)
+def test_sds_for_measurement(benchmark, reference):
+    benchmark.group = "sds_for_measurement"
+    inputs = realistic_inputs(reference)
+
+    def run():
+        for values in inputs:
+            sds_for_measurement(
+                reference=reference, age=values["age"], measurement_method=values["measurement_method"],
+                observation_value=values["observation_value"], sex=values["sex"], born_preterm=values["born_preterm"])
+
+    benchmark(run)
+
+
+@pytest.mark.parametrize("reference", REFERENCES)
+def test_measurement_from_sds(benchmark, reference):
+    benchmark.group = "measurement_from_sds"
+    inputs = realistic_inputs(reference)
+
+    def run():
+        for values in inputs:
+            measurement_from_sds(
+                reference=reference, requested_sds=values["sds"], measurement_method=values["measurement_method"],
+                sex=values["sex"], age=values["age"], born_preterm=values["born_preterm"])
+
+    benchmark(run)
+
+
+def test_centile(benchmark):
+    benchmark.group = "centile"
+    z_scores = [values["sds"] for values in realistic_inputs(UK_WHO)]
+
+    def run():
+        for z in z_scores:
+            centile(z_score=z)
+
+    benchmark(run)
+
+
+def test_centile_band_for_centile(benchmark):
+    benchmark.group = "centile_band_for_centile"
+    inputs = realistic_inputs(UK_WHO)
+
+    def run():
+        for values in inputs:
+            centile_band_for_centile(sds=values["sds"], measurement_method=values["measurement_method"])
+
+    benchmark(run)
+
+
+@pytest.mark.parametrize("reference", REFERENCES)
+def test_measurement(benchmark, reference):
+    benchmark.group = "Measurement"
+    arguments = measurement_inputs(reference)
+
+    def run():
+        for values in arguments:
+            Measurement(**values)
+
+    benchmark(run)
@@ -0,0 +1,185 @@
+"""
+Benchmark of chart generation: the time, peak memory and serialized payload size of create_uk_who_chart,
+create_trisomy_21_chart and create_turner_chart for every measurement_method, sex and centile collection,
+so that chart generation can be measured before and after any change to it (eg caching or vectorization).
+
+Run it from the root of the repository:
+    python -m benchmarks.chart_benchmark --json benchmarks/charts-before.json
+and, after a change, compare with the saved results:
+    python -m benchmarks.chart_benchmark --baseline benchmarks/charts-before.json
+
+The create_*_chart functions are called directly, not through create_chart, whose charts are cached.
+For each chart:
+ - create ms: the fastest and the median of --repeats calls
+ - serialize ms: the fastest of --repeats serializations of the response body ({"centile_data": chart}) to JSON,
+   compact and with sorted keys, as jsonify does
+ - peak KiB: the peak memory allocated (traced with tracemalloc) while the chart is created and serialized once.
+   Tracing slows Python down, so this is a separate call from those timed.
+ - payload KiB: the size of the serialized response body, and of it gzipped (as a proxy might send it)
+There is only one Turner's chart (height, female) for each centile collection. A chart which cannot be created
+(not every reference has data for every measurement_method) is reported with its error, and left out of the totals.
+Only the standard library is used. Times depend on the hardware: compare only results from the same machine.
+"""
+
+# standard imports
+import argparse
+import gzip
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+# rcpch imports
+from rcpchgrowth.rcpchgrowth.chart_functions import create_trisomy_21_chart, create_turner_chart, create_uk_who_chart
+from rcpchgrowth.rcpchgrowth.constants import (
+    COLE_TWO_THIRDS_SDS_NINE_CENTILES, MEASUREMENT_METHODS, SEXES, THREE_PERCENT_CENTILES, TRISOMY_21, TURNERS, UK_WHO)
+
+CENTILE_SELECTIONS = [COLE_TWO_THIRDS_SDS_NINE_CENTILES, THREE_PERCENT_CENTILES]
+
+REFERENCES = [UK_WHO, TRISOMY_21, TURNERS]
+
+
+def main(argv: list = None):
+    arguments = _parse_arguments(argv)
+
+    baseline = None
+    if arguments.baseline:
+        with open(arguments.baseline) as json_file:
+            baseline = json.load(json_file)
+
+    results = {}
+    for reference, centile_selection, measurement_method, sex in charts(arguments.reference):
+        name = chart_name(reference, centile_selection, measurement_method, sex)
+        print(f"{name}...", file=sys.stderr)
+        try:
+            results[name] = run_benchmark(
+                reference=reference, centile_selection=centile_selection, measurement_method=measurement_method, sex=sex,
+                repeats=arguments.repeats)
+        except Exception as err:
+            results[name] = {"error": f"{type(err).__name__}: {err}"}
+
+    print(_report(results, baseline))
+    if arguments.json:
+        with open(arguments.json, "w") as json_file:
+            json.dump(results, json_file, indent=4)
+
+
+def charts(references: list = None) -> list:
+    """
+    Returns (reference, centile_selection, measurement_method, sex) for every chart of the references (default: all)
+    """
+    selected = []
+    for reference in references or REFERENCES:
+        for centile_selection in CENTILE_SELECTIONS:
+            if reference == TURNERS:
+                selected.append((reference, centile_selection, "height", "female"))
+                continue
+            for measurement_method in MEASUREMENT_METHODS:
+                for sex in SEXES:
+                    selected.append((reference, centile_selection, measurement_method, sex))
+    return selected
+
+
+def chart_name(reference: str, centile_selection: str, measurement_method: str, sex: str) -> str:
+    collection = "cole" if centile_selection == COLE_TWO_THIRDS_SDS_NINE_CENTILES else "three_percent"
+    return f"{reference} {measurement_method} {sex} {collection}"
+
+
+def create_chart(reference: str, centile_selection: str, measurement_method: str, sex: str):
+    """
+    Creates the chart with its create_*_chart function, uncached
+    """
+    if reference == UK_WHO:
+        return create_uk_who_chart(measurement_method=measurement_method, sex=sex, centile_selection=centile_selection)
+    elif reference == TRISOMY_21:
+        return create_trisomy_21_chart(measurement_method=measurement_method, sex=sex, centile_selection=centile_selection)
+    return create_turner_chart(centile_selection=centile_selection)
+
+
+def serialize(chart) -> bytes:
+    """
+    Returns the response body of the chart-coordinates endpoints, as JSON
+    """
+    return json.dumps({"centile_data": chart}, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+def run_benchmark(reference: str, centile_selection: str, measurement_method: str, sex: str, repeats: int) -> dict:
+    """
+    Creates and serializes the chart repeats times, then once more with tracemalloc, and returns the times (milliseconds),
+    peak memory and payload sizes (KiB)
+    """
+    create_times = []
+    serialize_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        chart = create_chart(reference, centile_selection, measurement_method, sex)
+        create_times.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        payload = serialize(chart)
+        serialize_times.append((time.perf_counter() - start) * 1000)
+        del chart
+
+    tracemalloc.start()
+    try:
+        serialize(create_chart(reference, centile_selection, measurement_method, sex))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "create_min_ms": min(create_times),
+        "create_median_ms": statistics.median(create_times),
+        "serialize_min_ms": min(serialize_times),
+        "peak_kib": peak / 1024,
+        "payload_kib": len(payload) / 1024,
+        "gzip_payload_kib": len(gzip.compress(payload)) / 1024
+    }
+
+
+"""
+private functions
+"""
+
+
+def _parse_arguments(argv: list):
+    parser = argparse.ArgumentParser(description="Benchmark the time, memory and payload size of chart generation.")
+    parser.add_argument("--reference", action="append", choices=REFERENCES,
+                        help="benchmark only the charts of this reference (may be repeated)")
+    parser.add_argument("--repeats", type=int, default=3, help="timed calls per chart")
+    parser.add_argument("--baseline", help="a --json file of earlier results, to report the change from")
+    parser.add_argument("--json", help="also write the results to this file")
+    arguments = parser.parse_args(argv)
+    if arguments.repeats < 1:
+        parser.error("--repeats must be at least 1")
+    return arguments
+
+
+def _report(results: dict, baseline: dict = None) -> str:
+    columns = ["create_min_ms", "create_median_ms", "serialize_min_ms", "peak_kib", "payload_kib", "gzip_payload_kib"]
+    headings = ["create ms", "median ms", "serial. ms", "peak KiB", "payload KiB", "gzip KiB"]
+    width = max(len(name) for name in results)
+    lines = [f"{'chart':<{width}} " + " ".join(f"{heading:>12}" for heading in headings)]
+    for name, result in results.items():
+        if "error" in result:
+            lines.append(f"{name:<{width}} no chart ({result['error']})")
+            continue
+        lines.append(f"{name:<{width}} " + " ".join(f"{result[column]:>12.1f}" for column in columns))
+        if baseline and "error" not in baseline.get(name, {"error": None}):
+            # the change from the baseline, in percent
+            lines.append(f"{'':<{width}} " + " ".join(
+                f"{_change(result[column], baseline[name].get(column)):>12}" for column in columns))
+    totals = {column: sum(result.get(column, 0) for result in results.values()) for column in columns}
+    lines.append(f"{'total':<{width}} " + " ".join(f"{totals[column]:>12.1f}" for column in columns))
+    return "\n".join(lines)
+
+
+def _change(value: float, baseline_value: float) -> str:
+    if not baseline_value:
+        return "-"
+    return f"{(value - baseline_value) / baseline_value * 100:+.1f}%"
+
+
+if __name__ == "__main__":
+    main()
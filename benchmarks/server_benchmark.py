@@ -0,0 +1,198 @@
+"""
+Local load benchmark for the API server: throughput and latency of the calculation and chart endpoints
+under concurrent clients, to compare gunicorn worker classes and thread counts (see gunicorn.conf.py).
+
+Every calculation request is different (a different observation_date and observation_value), so none is answered
+from the calculation result cache: the calculation endpoint measures the calculation itself. The servers started by
+--compare also have the cache turned off (CALCULATION_CACHE_SIZE=0). Charts are built when the app is created and
+every chart request is answered from the chart cache: the chart endpoint measures that cached path, and is reported
+as such.
+
+Compare the sync and threaded (gthread) worker profiles, each started in turn with gunicorn.conf.py:
+    python benchmarks/server_benchmark.py --compare
+Benchmark a server that is already running:
+    python benchmarks/server_benchmark.py --url http://localhost:5000
+
+Only the standard library is used for the clients. Run it from the root of the repository.
+Results depend on the hardware: run it on the machine type the pods run on, with the worker count they will have.
+"""
+
+# standard imports
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+CALCULATION_REQUEST = {
+    "birth_date": "2020-04-12",
+    "observation_date": "2021-06-12",
+    "observation_value": 75,
+    "measurement_method": "height",
+    "sex": "male",
+    "gestation_weeks": 40,
+    "gestation_days": 0
+}
+
+CHART_REQUEST = {
+    "measurement_method": "height",
+    "sex": "male"
+}
+
+# gunicorn.conf.py and app settings (as environment variables) for each profile compared by --compare.
+# The calculation result cache is off, so that each calculation request is calculated.
+PROFILES = {
+    "sync": {"GUNICORN_WORKER_CLASS": "sync", "GUNICORN_THREADS": "1", "CALCULATION_CACHE": "memory", "CALCULATION_CACHE_SIZE": "0"},
+    "gthread": {"GUNICORN_WORKER_CLASS": "gthread", "GUNICORN_THREADS": "4", "CALCULATION_CACHE": "memory", "CALCULATION_CACHE_SIZE": "0"}
+}
+
+SERVER_START_TIMEOUT_SECONDS = 300
+
+
+def main(argv: list = None):
+    arguments = _parse_arguments(argv)
+
+    if arguments.compare:
+        results = {}
+        for profile, settings in PROFILES.items():
+            print(f"{profile}: starting gunicorn with {settings}", file=sys.stderr)
+            with _GunicornServer(port=arguments.port, workers=arguments.workers, settings=settings) as url:
+                results[profile] = run_benchmark(url=url, requests=arguments.requests, concurrency=arguments.concurrency)
+    else:
+        results = {"server": run_benchmark(url=arguments.url, requests=arguments.requests, concurrency=arguments.concurrency)}
+
+    print(_report(results, concurrency=arguments.concurrency))
+    if arguments.json:
+        with open(arguments.json, "w") as json_file:
+            json.dump(results, json_file, indent=4)
+
+
+def calculation_requests(requests: int) -> list:
+    """
+    Returns requests different calculation request bodies: each has its own observation_value, and the observation
+    dates cycle through the first four years (and so the UK-WHO reference segments)
+    """
+    birth_date = date.fromisoformat(CALCULATION_REQUEST["birth_date"])
+    return [
+        dict(CALCULATION_REQUEST,
+             observation_date=(birth_date + timedelta(days=30 + index % 1460)).isoformat(),
+             observation_value=CALCULATION_REQUEST["observation_value"] + index / 1000)
+        for index in range(requests)]
+
+
+def endpoints(requests: int) -> list:
+    """
+    Returns (name, path, request bodies) for each endpoint benchmarked: one warm-up body, then requests bodies
+    """
+    return [
+        ("calculation", "/uk-who/calculation", calculation_requests(requests + 1)),
+        ("chart-coordinates (cached)", "/uk-who/chart-coordinates", [CHART_REQUEST] * (requests + 1))
+    ]
+
+
+def run_benchmark(url: str, requests: int, concurrency: int) -> dict:
+    """
+    Sends requests POSTs to each of the endpoints from concurrency client threads (after one warm-up request each)
+    and returns the throughput (requests per second) and latency percentiles (milliseconds) for each endpoint.
+    """
+    results = {}
+    for name, path, bodies in endpoints(requests):
+        warm_up, *data = [json.dumps(body).encode("utf-8") for body in bodies]
+        _post(url + path, warm_up)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(lambda body: _post(url + path, body), data))
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        results[name] = {
+            "requests": requests,
+            "requests_per_second": requests / elapsed,
+            "mean_ms": statistics.mean(latencies),
+            "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95),
+            "p99_ms": _percentile(latencies, 99)
+        }
+    return results
+
+
+"""
+private functions
+"""
+
+
+def _parse_arguments(argv: list):
+    parser = argparse.ArgumentParser(description="Benchmark the calculation and chart endpoints under concurrent load.")
+    parser.add_argument("--url", default="http://localhost:5000", help="a running server to benchmark")
+    parser.add_argument("--compare", action="store_true",
+                        help="start gunicorn with each worker profile (sync, gthread) in turn and benchmark each")
+    parser.add_argument("--port", type=int, default=5055, help="port for the servers started by --compare")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="gunicorn workers for --compare")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--json", help="also write the results to this file")
+    return parser.parse_args(argv)
+
+
+def _post(url: str, data: bytes) -> float:
+    # returns the latency in milliseconds
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return (time.perf_counter() - start) * 1000
+
+
+def _percentile(sorted_values: list, percent: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class _GunicornServer:
+    # starts gunicorn with gunicorn.conf.py and the given settings, and stops it on exit
+
+    def __init__(self, port: int, workers: int, settings: dict):
+        self.url = f"http://127.0.0.1:{port}"
+        self.environment = dict(os.environ, GUNICORN_BIND=f"127.0.0.1:{port}", WEB_CONCURRENCY=str(workers),
+                                GUNICORN_ACCESS_LOG="", **settings)
+
+    def __enter__(self) -> str:
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", "app:create_app()"],
+            env=self.environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + SERVER_START_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("gunicorn exited before it was ready. Is it installed? (pip install -r requirements.txt)")
+            try:
+                urllib.request.urlopen(self.url + "/").read()
+                return self.url
+            except OSError:
+                # not listening yet: the app is still warming up
+                time.sleep(0.5)
+        self.process.kill()
+        raise RuntimeError(f"gunicorn was not ready after {SERVER_START_TIMEOUT_SECONDS}s")
+
+    def __exit__(self, *exception):
+        self.process.terminate()
+        self.process.wait()
+
+
+def _report(results: dict, concurrency: int) -> str:
+    lines = [f"{'profile':<10} {'endpoint':<27} {'req/s':>8} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}   ({concurrency} concurrent clients)"]
+    for profile, profile_results in results.items():
+        for endpoint, result in profile_results.items():
+            lines.append(
+                f"{profile:<10} {endpoint:<27} {result['requests_per_second']:>8.1f} {result['mean_ms']:>8.1f} "
+                f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,3 +3,7 @@ from .uk_who_blueprint import *
 from .trisomy_21_blueprint import *
 from .turner_blueprint import *
 from .openapi_blueprint import *
+from .metrics_blueprint import *
+from .profiling_blueprint import *
+from . import server_timing
+from . import slow_requests
@@ -0,0 +1,143 @@
+"""
+This module contains the helpers shared by the calculation and bulk calculation endpoints of each reference Blueprint
+"""
+
+# third-party imports
+from flask import Response, json, request, stream_with_context
+from marshmallow import ValidationError
+
+# rcpch imports
+from rcpchgrowth.rcpchgrowth.batch_calculations import calculate_csv
+from rcpchgrowth.rcpchgrowth.result_cache import calculate_measurement
+from rcpchgrowth.rcpchgrowth.response_fields import MEASUREMENT_FIELDS, parse_fields
+from rcpchgrowth.rcpchgrowth.validation import CALCULATION_REQUEST_FIELD_NAMES, validate_calculation_request
+
+NDJSON_MIMETYPES = ["application/x-ndjson", "application/jsonl"]
+CSV_MIMETYPE = "text/csv"
+
+# number of records read from the request stream before their results are written back
+BULK_CHUNK_SIZE = 500
+
+
+def compact_requested() -> bool:
+    """
+    Returns True if the request asks for compact results (`?compact=true`): numbers and codes only, without the human-readable text
+    """
+    return request.args.get("compact", "false").lower() in ("true", "1")
+
+
+def requested_fields(known_fields: dict = MEASUREMENT_FIELDS):
+    """
+    Returns the selection of response fields in the request (`?fields=measurement_calculated_values.corrected_sds,...`),
+    or None if all fields are requested. Raises a ValueError for a malformed selection, or a field not in known_fields
+    (by default the fields of a Measurement object).
+    """
+    fields = request.args.get("fields")
+    if fields is None:
+        return None
+    return parse_fields(fields, known_fields)
+
+
+def ndjson_calculation_response(reference: str):
+    """
+    Streams newline-delimited JSON results for a newline-delimited JSON request body.
+    Each non-empty input line produces exactly one output line, in the same order:
+    either a Measurement object, or an object with the input `line` number and its `errors`.
+    Records are read and calculated in chunks of BULK_CHUNK_SIZE so memory use does not grow with the request.
+    With `?compact=true` each Measurement object is compact, and with `?fields=` it has only the selected fields (see Measurement).
+    """
+    if request.mimetype not in NDJSON_MIMETYPES:
+        return "Request body mimetype should be application/x-ndjson", 400
+
+    compact = compact_requested()
+    try:
+        fields = requested_fields()
+    except ValueError as err:
+        return json.dumps(err.args), 422
+
+    def generate():
+        chunk = []
+        for line_number, line in enumerate(request.stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            chunk.append((line_number, line))
+            if len(chunk) == BULK_CHUNK_SIZE:
+                yield calculate_ndjson_chunk(chunk=chunk, reference=reference, compact=compact, fields=fields)
+                chunk = []
+        if chunk:
+            yield calculate_ndjson_chunk(chunk=chunk, reference=reference, compact=compact, fields=fields)
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPES[0])
+
+
+def csv_calculation_response(reference: str):
+    """
+    Streams a CSV request body back with SDS, centile and centile band columns appended.
+    Rows are calculated in fixed-size chunks by the array-based rcpchgrowth batch calculations,
+    so memory use does not grow with the size of the upload.
+    With `?compact=true` the centile band columns are band codes rather than messages.
+    """
+    if request.mimetype != CSV_MIMETYPE:
+        return "Request body mimetype should be text/csv", 400
+
+    lines = (line.decode("utf-8", errors="replace") for line in request.stream)
+    try:
+        csv_blocks = calculate_csv(lines=lines, reference=reference, band_codes=compact_requested())
+    except ValueError as err:
+        return json.dumps(err.args), 422
+
+    return Response(stream_with_context(csv_blocks), mimetype=CSV_MIMETYPE)
+
+
+def calculate_ndjson_chunk(chunk: list, reference: str, compact: bool = False, fields: dict = None) -> str:
+    """
+    Calculates a chunk of (line_number, raw_line) pairs and returns their results as NDJSON text
+    """
+    results = []
+    for line_number, line in chunk:
+        try:
+            record = json.loads(line)
+        except ValueError as err:
+            result = {"line": line_number, "errors": {
+                "_schema": [f"Invalid JSON: {err}"]}}
+        else:
+            result = calculate_record(
+                record=record, line_number=line_number, reference=reference, compact=compact, fields=fields)
+        results.append(json.dumps(result))
+    return "\n".join(results) + "\n"
+
+
+def calculate_record(record, line_number: int, reference: str, compact: bool = False, fields: dict = None) -> dict:
+    """
+    Validates and calculates a single bulk record, with the same semantics as the single calculation endpoints.
+    Returns the Measurement object, or the validation errors for this record.
+    """
+    if not isinstance(record, dict):
+        return {"line": line_number, "errors": {"_schema": ["Invalid input type."]}}
+
+    values = {key: record[key]
+              for key in CALCULATION_REQUEST_FIELD_NAMES if key in record}
+
+    # Validate the record, with the same messages as the single calculation endpoints
+    # Dates will discard anything after first 'T' in YYYY-MM-DDTHH:MM:SS.milliseconds+TZ etc
+    try:
+        validated_values = validate_calculation_request(values)
+    except ValidationError as err:
+        return {"line": line_number, "errors": err.messages}
+
+    # validate_calculation_request has parsed the dates (parse_iso_date caches the birth dates repeated through a batch)
+    values['birth_date'] = validated_values['birth_date']
+    values['observation_date'] = validated_values['observation_date']
+    values['observation_value'] = float(values['observation_value'])
+
+    try:
+        return calculate_measurement(
+            reference=reference,
+            compact=compact,
+            fields=fields,
+            **values
+        )
+    except Exception as err:
+        # a failing record must not end the stream for the records after it
+        return {"line": line_number, "errors": {"_schema": [f"{err}"]}}
@@ -0,0 +1,174 @@
+"""
+This module contains the /metrics endpoint, in the Prometheus text exposition format, and the request hooks which collect it
+"""
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from threading import Lock
+
+from flask import Blueprint, current_app, g, request
+
+from rcpchgrowth.rcpchgrowth import result_cache
+from rcpchgrowth.rcpchgrowth.counters import COUNTER_LABELS, counter_values
+
+
+metrics = Blueprint("metrics", __name__)
+
+# upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    """
+    Request counts and latency histograms for each route, and the number of requests in flight.
+    init_app(app) adds the hooks which collect them to a Flask app. A request is timed until its request context
+    is torn down, which for a streamed response (eg the bulk calculations) is after the last chunk is sent.
+    Each process (eg each gunicorn worker) keeps its own.
+    """
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = Lock()
+        self.in_flight = 0
+        # (method, route, status): count
+        self.requests = defaultdict(int)
+        # (method, route): [count in each bucket (not cumulative), then above the last bucket], sum of seconds
+        self.latencies = {}
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def observe(self, method: str, route: str, status: int, seconds: float):
+        bucket = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.requests[(method, route, status)] += 1
+            if (method, route) not in self.latencies:
+                self.latencies[(method, route)] = [[0] * (len(self.buckets) + 1), 0.0]
+            latency = self.latencies[(method, route)]
+            latency[0][bucket] += 1
+            latency[1] += seconds
+
+    def exposition(self) -> list:
+        """
+        Returns the lines of the Prometheus text format for these metrics
+        """
+        with self._lock:
+            in_flight = self.in_flight
+            requests = dict(self.requests)
+            latencies = {labels: (list(counts), seconds) for labels, (counts, seconds) in self.latencies.items()}
+
+        lines = [
+            "# HELP growth_http_requests_in_flight Requests being served.",
+            "# TYPE growth_http_requests_in_flight gauge",
+            f"growth_http_requests_in_flight {in_flight}",
+            "# HELP growth_http_requests_total Requests served, by route and status.",
+            "# TYPE growth_http_requests_total counter"
+        ]
+        for (method, route, status), value in sorted(requests.items()):
+            lines.append(f"growth_http_requests_total{_labels(method=method, route=route, status=status)} {value}")
+
+        lines += [
+            "# HELP growth_http_request_duration_seconds Time to serve requests, by route.",
+            "# TYPE growth_http_request_duration_seconds histogram"
+        ]
+        for (method, route), (counts, seconds) in sorted(latencies.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(
+                    f"growth_http_request_duration_seconds_bucket{_labels(method=method, route=route, le=bound)} {cumulative}")
+            lines.append(f"growth_http_request_duration_seconds_sum{_labels(method=method, route=route)} {seconds}")
+            lines.append(f"growth_http_request_duration_seconds_count{_labels(method=method, route=route)} {cumulative}")
+        return lines
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+
+    def _after_request(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _teardown_request(self, exception=None):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return
+        with self._lock:
+            self.in_flight -= 1
+        # the route template, not the path, so that paths with variables do not each become a series
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        self.observe(request.method, route, g.pop("metrics_status", 500), time.perf_counter() - start)
+
+
+request_metrics = RequestMetrics()
+
+
+@metrics.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """
+    Metrics
+    ---
+    get:
+      summary: Request, calculation cache and reference lookup metrics for this server process, in the Prometheus text format.
+      responses:
+        200:
+          description: "Prometheus text exposition format (version 0.0.4)"
+          content:
+            text/plain: {}
+    """
+    lines = request_metrics.exposition() + _cache_exposition() + _counter_exposition()
+    return current_app.response_class("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+"""
+private functions
+"""
+
+
+def _cache_exposition() -> list:
+    stats = result_cache.measurement_cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    lines = []
+    for name, kind, help_text, value in (
+        ("hits_total", "counter", "Calculations answered from the cache.", stats["hits"]),
+        ("misses_total", "counter", "Calculations not in the cache.", stats["misses"]),
+        ("errors_total", "counter", "Failures of a shared cache backend (each treated as a miss).", stats["errors"]),
+        ("hit_ratio", "gauge", "Hits as a fraction of lookups.", stats["hits"] / lookups if lookups else 0.0),
+        ("entries", "gauge", "Results in the cache.", stats["size"]),
+    ):
+        if value is None:
+            # eg the size of a Redis cache is not known
+            continue
+        lines += [
+            f"# HELP growth_calculation_cache_{name} {help_text}",
+            f"# TYPE growth_calculation_cache_{name} {kind}",
+            f"growth_calculation_cache_{name} {value}"
+        ]
+    return lines
+
+
+def _counter_exposition() -> list:
+    lines = []
+    for name, counts in sorted(counter_values().items()):
+        lines += [
+            f"# HELP growth_{name}_total Count of {name.replace('_', ' ')} by the calculations.",
+            f"# TYPE growth_{name}_total counter"
+        ]
+        for label_values, value in sorted(counts.items()):
+            labels = dict(zip(COUNTER_LABELS.get(name, ()), label_values))
+            lines.append(f"growth_{name}_total{_labels(**labels)} {value}")
+    return lines
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
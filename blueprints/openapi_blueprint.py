@@ -1,12 +1,87 @@
 """
 This module contains the opeanAPI3 spec root endpoint as a Flask Blueprints
 """
+import hashlib
 import json
-from flask import Blueprint
+import logging
+import os
+import time
+from flask import Blueprint, current_app, request
 
 
 openapi = Blueprint("openapi", __name__)
 
+logger = logging.getLogger(__name__)
+
+OPENAPI_SPEC_PATH = "openapi.json"
+
+# how often (at most) the spec file is checked for changes
+SPEC_REFRESH_SECONDS = 5.0
+
+
+class OpenApiSpec:
+    """
+    The openAPI spec, held in memory as the encoded JSON response body with its ETag and version.
+    The file is read and parsed by load(), and again by refresh() only if it has changed since (its mtime or size),
+    so serving the spec touches neither the JSON parser nor, more than once every refresh_seconds, the filesystem.
+    A spec regenerated on disk (eg with a new version) is served, and its version sent, without a restart.
+    """
+
+    def __init__(self, spec_path: str = OPENAPI_SPEC_PATH, refresh_seconds: float = SPEC_REFRESH_SECONDS):
+        self.spec_path = spec_path
+        self.refresh_seconds = refresh_seconds
+        self._loaded = None
+        self._file_stamp = None
+        self._checked = None
+
+    def load(self):
+        file_stamp = self._stamp()
+        with open(self.spec_path) as json_file:
+            spec = json.load(json_file)
+        # encoded as Flask's jsonify would (sorted keys, compact separators), once
+        body = (json.dumps(spec, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8")
+        # replaced in one assignment, so that a request never sees a body with another version's ETag
+        self._loaded = (body, hashlib.sha1(body).hexdigest(), spec["info"]["version"])
+        self._file_stamp = file_stamp
+
+    def refresh(self):
+        """
+        Reloads the spec if the file has changed (eg it has been regenerated with a new version),
+        checking at most once every refresh_seconds. If the changed file cannot be read (eg it is being rewritten),
+        the spec already loaded is kept, and the file is read again at the next check.
+        """
+        now = time.monotonic()
+        if self._loaded is not None and self._checked is not None and now - self._checked < self.refresh_seconds:
+            return
+        self._checked = now
+        if self._loaded is None:
+            self.load()
+            return
+        try:
+            if self._stamp() != self._file_stamp:
+                self.load()
+        except (OSError, ValueError) as err:
+            logger.warning("openAPI spec %s could not be reloaded, the loaded spec is still served: %s", self.spec_path, err)
+
+    def get(self):
+        """
+        Returns (body, etag, version), loading the spec on first use
+        """
+        if self._loaded is None:
+            self.load()
+        return self._loaded
+
+    @property
+    def version(self) -> str:
+        return self.get()[2]
+
+    def _stamp(self):
+        file_status = os.stat(self.spec_path)
+        return file_status.st_mtime_ns, file_status.st_size
+
+
+openapi_spec = OpenApiSpec()
+
 # Create JSON OpenAPI Spec and serve it at /
 
 
@@ -31,8 +106,9 @@ def openapi_endpoint():
             application/json:
               schema: OpenApiSchema
     """
-    # read the spec from file and serve it
-    with open('openapi.json') as json_file:
-        openapi_json = json.load(json_file)
-
-    return openapi_json, 200
+    # serve the spec from memory (reloaded if the file has changed); clients sending If-None-Match with the current ETag get a 304 Not Modified
+    openapi_spec.refresh()
+    body, etag, _version = openapi_spec.get()
+    response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    return response.make_conditional(request)
@@ -0,0 +1,152 @@
+"""
+This module contains on-demand profiling: a request sent with the profiling token is run under cProfile,
+and the profiles are added up for each route over a window of time, to be read from the /profiling endpoint.
+Profiling is off unless PROFILING_TOKEN is set, and then only requests with the header X-Profile-Token: <token> are profiled.
+"""
+import cProfile
+import hmac
+import io
+import marshal
+import pstats
+import time
+from datetime import datetime, timezone
+from threading import Lock
+
+from flask import Blueprint, abort, current_app, g, request
+
+profiling = Blueprint("profiling", __name__)
+
+PROFILE_TOKEN_HEADER = "X-Profile-Token"
+
+# seconds for which the profiles of a route are added up, before they are started again
+DEFAULT_PROFILING_WINDOW = 600
+
+
+class RequestProfiler:
+    """
+    init_app(app) adds the hooks which profile requests with the token, when app.config["PROFILING_TOKEN"] is set.
+    One request at a time is profiled in each process: a request with the token which arrives while another is profiled is not.
+    The profile covers the request hooks and the endpoint. A streamed response (eg the bulk calculations) is profiled
+    until its request context is torn down, after the last chunk is sent, so that the chunks calculated are profiled too.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._profiling = Lock()
+        # route: [window start (epoch seconds), requests profiled, pstats.Stats]
+        self._windows = {}
+
+    def init_app(self, app):
+        app.config.setdefault("PROFILING_TOKEN", None)
+        app.config.setdefault("PROFILING_WINDOW", DEFAULT_PROFILING_WINDOW)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def add(self, route: str, profile: cProfile.Profile):
+        now = time.time()
+        with self._lock:
+            window = self._windows.get(route)
+            if window is None or now - window[0] > current_app.config["PROFILING_WINDOW"]:
+                self._windows[route] = [now, 1, pstats.Stats(profile)]
+            else:
+                window[1] += 1
+                window[2].add(profile)
+
+    def report(self, route: str = None, sort: str = "cumulative", limit: int = 40) -> str:
+        """
+        Returns the profiles of each route (or of route) as text: the limit functions with most time, sorted by sort
+        """
+        output = io.StringIO()
+        with self._lock:
+            for window_route, (start, requests, stats) in sorted(self._windows.items()):
+                if route is not None and window_route != route:
+                    continue
+                started = datetime.fromtimestamp(start, timezone.utc).isoformat(timespec="seconds")
+                output.write(f"{window_route}: {requests} requests profiled since {started}\n")
+                stats.stream = output
+                stats.sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    def marshalled_stats(self, route: str) -> bytes:
+        """
+        Returns the profiles of route in the file format of pstats (as written by pstats.Stats.dump_stats),
+        to be read by pstats or a viewer such as snakeviz. Raises a KeyError if the route has not been profiled.
+        """
+        with self._lock:
+            return marshal.dumps(self._windows[route][2].stats)
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+
+    def _before_request(self):
+        if not authorised() or request.endpoint == "profiling.profiling_endpoint":
+            return
+        if not self._profiling.acquire(blocking=False):
+            return
+        profile = cProfile.Profile()
+        g.profile = profile
+        profile.enable()
+
+    def _after_request(self, response):
+        if response.is_streamed and "profile" in g:
+            # the chunks are generated after this, while they are sent: the profile is added at teardown
+            g.profile_streamed = True
+            return response
+        self._add(self._stop())
+        return response
+
+    def _teardown_request(self, exception=None):
+        # a streamed response is added here, after its last chunk. A request which failed with an unhandled error
+        # (after_request is not called for it) is stopped, but not added.
+        streamed = g.pop("profile_streamed", False)
+        profile = self._stop()
+        if streamed and exception is None:
+            self._add(profile)
+
+    def _add(self, profile: cProfile.Profile):
+        if profile is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            self.add(route, profile)
+
+    def _stop(self):
+        profile = g.pop("profile", None)
+        if profile is not None:
+            profile.disable()
+            self._profiling.release()
+        return profile
+
+
+request_profiler = RequestProfiler()
+
+
+def authorised() -> bool:
+    token = current_app.config.get("PROFILING_TOKEN")
+    return bool(token) and hmac.compare_digest(request.headers.get(PROFILE_TOKEN_HEADER, ""), token)
+
+
+@profiling.route("/profiling", methods=["GET"])
+def profiling_endpoint():
+    """
+    The profiles of the routes, as text, or for one route (?route=/uk-who/calculation) in the pstats file format with ?format=pstats.
+    ?sort= (a pstats sort key, by default cumulative) and ?limit= (by default 40) select the functions shown.
+    Not found unless the request has the profiling token.
+    """
+    if not authorised():
+        abort(404)
+
+    route = request.args.get("route")
+    if request.args.get("format") == "pstats":
+        try:
+            stats = request_profiler.marshalled_stats(route)
+        except KeyError:
+            abort(404)
+        return current_app.response_class(stats, mimetype="application/octet-stream")
+
+    try:
+        report = request_profiler.report(
+            route=route, sort=request.args.get("sort", "cumulative"), limit=int(request.args.get("limit", 40)))
+    except (KeyError, ValueError) as err:
+        return f"{err}\n", 400
+    return current_app.response_class(report, mimetype="text/plain")
@@ -0,0 +1,69 @@
+"""
+Server-Timing response headers: the time of each request split into the stages of its calculation
+(see rcpchgrowth.stage_timing), so that latency can be broken down from the client side. Off unless SERVER_TIMING is set.
+The stages are also timed for the slow request log (see slow_requests) if SLOW_REQUEST_SECONDS is set.
+"""
+import time
+
+from flask import current_app, g, jsonify, request
+
+from rcpchgrowth.rcpchgrowth.stage_timing import stage, start_stage_timing, stop_stage_timing
+
+
+class ServerTiming:
+    """
+    init_app(app) adds the hooks which time the stages of each request, when app.config["SERVER_TIMING"] is true
+    (or app.config["SLOW_REQUEST_SECONDS"] is set: the timings are kept in g.stage_timings, without the header).
+    The header has a duration (in milliseconds) for each stage the request went through, and the total:
+        Server-Timing: parse;dur=0.041, validation;dur=0.215, ages;dur=0.098, reference;dur=0.012, lms;dur=0.067, ..., total;dur=1.103
+    The stages are parse (the JSON body), validation, ages, reference (selection of the reference data), lms (interpolation),
+    centile (centiles and centile bands), plottable (plottable data) and serialize (the JSON response).
+    Time outside them (eg routing, the result cache) is in total only. A streamed response has the timings of its headers only.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault("SERVER_TIMING", False)
+        app.config.setdefault("SLOW_REQUEST_SECONDS", None)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def _before_request(self):
+        if not current_app.config["SERVER_TIMING"] and current_app.config["SLOW_REQUEST_SECONDS"] is None:
+            return
+        g.server_timing = (time.perf_counter(), start_stage_timing())
+        if request.is_json:
+            # parsed (and cached by Flask for the endpoint) here, to time it
+            with stage("parse"):
+                request.get_json(silent=True)
+
+    def _after_request(self, response):
+        server_timing = g.pop("server_timing", None)
+        if server_timing is None:
+            return response
+        start, token = server_timing
+        timings = stop_stage_timing(token)
+        timings["total"] = time.perf_counter() - start
+        g.stage_timings = timings
+        if not current_app.config["SERVER_TIMING"]:
+            return response
+        response.headers["Server-Timing"] = ", ".join(
+            f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings.items())
+        return response
+
+    def _teardown_request(self, exception=None):
+        # after_request is not called if the request failed with an unhandled error
+        server_timing = g.pop("server_timing", None)
+        if server_timing is not None:
+            stop_stage_timing(server_timing[1])
+
+
+server_timing = ServerTiming()
+
+
+def timed_jsonify(*args, **kwargs):
+    """
+    jsonify, timed as the serialize stage
+    """
+    with stage("serialize"):
+        return jsonify(*args, **kwargs)
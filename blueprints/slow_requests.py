@@ -0,0 +1,117 @@
+"""
+The slow request log: every request which takes longer than SLOW_REQUEST_SECONDS is logged (to the slow_requests logger,
+at warning level) with its route, status, time, stage timings (see server_timing) and an anonymised summary of its inputs.
+Off unless SLOW_REQUEST_SECONDS is set.
+"""
+import hashlib
+import hmac
+import logging
+import math
+import time
+
+from flask import current_app, g, request
+
+from rcpchgrowth.rcpchgrowth.date_calculations import chronological_decimal_age, parse_iso_date
+
+logger = logging.getLogger("slow_requests")
+
+
+class SlowRequestLog:
+    """
+    init_app(app) adds the hooks which time each request and log those slower than app.config["SLOW_REQUEST_SECONDS"].
+    A request is timed until its request context is torn down: for a streamed response, after the last chunk is sent.
+    The inputs are summarised by anonymised_inputs: nothing which identifies a child is logged.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault("SLOW_REQUEST_SECONDS", None)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def _before_request(self):
+        if current_app.config["SLOW_REQUEST_SECONDS"] is not None:
+            g.slow_request_start = time.perf_counter()
+
+    def _after_request(self, response):
+        g.slow_request_status = response.status_code
+        return response
+
+    def _teardown_request(self, exception=None):
+        start = g.pop("slow_request_start", None)
+        if start is None:
+            return
+        seconds = time.perf_counter() - start
+        if seconds < current_app.config["SLOW_REQUEST_SECONDS"]:
+            return
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        logger.warning("slow request: %s %s took %.3fs", request.method, route, seconds, extra={
+            "route": route,
+            "method": request.method,
+            "status": g.pop("slow_request_status", 500),
+            "seconds": round(seconds, 6),
+            "stage_seconds": {name: round(value, 6) for name, value in g.get("stage_timings", {}).items()},
+            "inputs": anonymised_inputs()
+        })
+
+
+slow_request_log = SlowRequestLog()
+
+
+def anonymised_inputs() -> dict:
+    """
+    Returns a summary of the request's inputs from which no child can be identified, but which is enough to find
+    (and to replay in benchmarks) the kinds of input which are slow:
+     - reference (the blueprint), payload_bytes and, for bulk requests, the content type
+     - body_digest: a keyed hash of a JSON body (with the app's secret key), so that repeats of one request can be counted.
+       Set FLASK_SECRET_KEY for digests which can be compared between workers.
+     - for a calculation: measurement_method, sex, age_bucket (chronological decimal age, in 0.1 years under 2, then years)
+       and whether the child was born preterm
+     - for plottable child data: the number of results, and their measurement methods
+    """
+    inputs = {
+        "reference": request.blueprint,
+        "payload_bytes": request.content_length
+    }
+    if not request.is_json:
+        # a bulk request: its body has been streamed, not kept
+        inputs["content_type"] = request.mimetype
+        return inputs
+
+    inputs["body_digest"] = hmac.new(_key(), request.get_data(cache=True), hashlib.sha256).hexdigest()[:16]
+    values = request.get_json(silent=True)
+    if isinstance(values, dict) and isinstance(values.get("results"), list):
+        inputs["results"] = len(values["results"])
+        inputs["measurement_methods"] = sorted({
+            str(result["child_observation_value"].get("measurement_method"))
+            for result in values["results"]
+            if isinstance(result, dict) and isinstance(result.get("child_observation_value"), dict)})
+    elif isinstance(values, dict):
+        for name in ("measurement_method", "sex"):
+            if isinstance(values.get(name), str):
+                inputs[name] = values[name]
+        inputs["age_bucket"] = _age_bucket(values.get("birth_date"), values.get("observation_date"))
+        if isinstance(values.get("gestation_weeks"), (int, float)) and values["gestation_weeks"]:
+            inputs["preterm"] = values["gestation_weeks"] < 37
+    return inputs
+
+
+"""
+private functions
+"""
+
+
+def _key() -> bytes:
+    key = current_app.secret_key or b""
+    return key if isinstance(key, bytes) else str(key).encode("utf-8")
+
+
+def _age_bucket(birth_date, observation_date):
+    try:
+        age = chronological_decimal_age(parse_iso_date(birth_date), parse_iso_date(observation_date))
+    except (TypeError, ValueError, AttributeError):
+        return None
+    # narrow buckets in the first two years, where the references change most and most measurements are
+    width = 0.1 if age < 2 else 1.0
+    lower = math.floor(age / width) * width
+    return f"{lower:.1f}-{lower + width:.1f}"
@@ -3,30 +3,34 @@ This module contains the Turner endpoints as Flask Blueprints
 """
 
 # standard imports
-from datetime import datetime
 import json
-from pprint import pprint
+import logging
 
 # third-party imports
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, request
 from marshmallow import ValidationError
 
 # rcpch imports
 from rcpchgrowth.rcpchgrowth.constants.parameter_constants import COLE_TWO_THIRDS_SDS_NINE_CENTILES, TURNERS
-from rcpchgrowth.rcpchgrowth.measurement import Measurement
+from rcpchgrowth.rcpchgrowth.result_cache import calculate_measurement
+from rcpchgrowth.rcpchgrowth.validation import validate_calculation_request
 from rcpchgrowth.rcpchgrowth.chart_functions import create_plottable_child_data, create_chart
-from schemas import CalculationRequestParameters
+from rcpchgrowth.rcpchgrowth.response_fields import PLOTTABLE_CHILD_DATA_RESPONSE_FIELDS, field_requested, select_fields, sub_fields
+from .bulk_calculations import compact_requested, requested_fields, csv_calculation_response, ndjson_calculation_response
+from .server_timing import timed_jsonify
 
 
 turners = Blueprint("turners", __name__)
 
+logger = logging.getLogger(__name__)
+
 
 @turners.route("/calculation", methods=["POST"])
 def turner_calculation():
     """
     Centile calculation.
     ---
-    POST:
+    post:
       summary: Turner's Syndrome centile and SDS calculation.
       description: |
         * This endpoint MUST ONLY be used for children with the chromosomal disorder Turner's Syndrome (45,XO karyotype).
@@ -35,6 +39,20 @@ def turner_calculation():
         * Available `measurement_method`s are: `height`, `weight`, `bmi`, or `ofc` (OFC = occipitofrontal circumference = 'head circumference').
         * Note that BMI must be precalculated for the `bmi` function.
 
+      parameters:
+        - in: query
+          name: compact
+          required: false
+          schema:
+            type: boolean
+          description: "If true, returns only the numbers and codes: no comments, calendar ages or date strings, and centile band codes (0-20) rather than messages."
+        - in: query
+          name: fields
+          required: false
+          schema:
+            type: string
+          description: "Comma separated dotted paths of the fields to return, eg `measurement_calculated_values.corrected_sds,measurement_dates.corrected_decimal_age`. Only these are calculated."
+
       requestBody:
         content:
           application/json:
@@ -58,57 +76,153 @@ def turner_calculation():
     if request.is_json:
         req = request.get_json()
 
-        # Dates will discard anything after first 'T' in YYYY-MM-DDTHH:MM:SS.milliseconds+TZ etc
         values = {
-            'birth_date': req["birth_date"].split('T', 1)[0],
+            'birth_date': req["birth_date"],
             'gestation_days': req["gestation_days"],
             'gestation_weeks': req["gestation_weeks"],
             'measurement_method': req["measurement_method"],
-            'observation_date':
-                req["observation_date"].split('T', 1)[0],
+            'observation_date': req["observation_date"],
             'observation_value': float(req["observation_value"]),
             'sex': req["sex"]
         }
 
-        # Validate the request with Marshmallow
         try:
-            CalculationRequestParameters().load(values)
+            fields = requested_fields()
+        except ValueError as err:
+            return json.dumps(err.args), 422
+
+        # Validate the request, with the messages of the CalculationRequestParameters schema
+        # Dates will discard anything after first 'T' in YYYY-MM-DDTHH:MM:SS.milliseconds+TZ etc
+        try:
+            validated_values = validate_calculation_request(values)
         except ValidationError as err:
-            pprint(err.messages)
+            logger.debug("request failed validation: %s", err.messages)
             return json.dumps(err.messages), 422
 
-         # Convert string dates to Python dates for the Measurement class
-        values['birth_date'] = datetime.strptime(
-            values['birth_date'], "%Y-%m-%d")
-        values['observation_date'] = datetime.strptime(
-            values['observation_date'], "%Y-%m-%d")
+        # validate_calculation_request has parsed the dates for the Measurement class
+        values['birth_date'] = validated_values['birth_date']
+        values['observation_date'] = validated_values['observation_date']
 
         # Send to calculation
         try:
-            calculation = Measurement(
+            calculation = calculate_measurement(
                 reference=TURNERS,
+                compact=compact_requested(),
+                fields=fields,
                 **values
-            ).measurement
+            )
         except ValueError as err:
-            pprint(err.args)
+            logger.debug("calculation failed: %s", err.args)
             return json.dumps(err.args), 422
 
-        return jsonify(calculation)
+        return timed_jsonify(calculation)
     else:
         return "Request body mimetype should be application/json", 400
 
 
+@turners.route("/bulk-calculation", methods=["POST"])
+def turner_bulk_calculation():
+    """
+    Bulk centile calculation.
+    ---
+    post:
+      summary: Turner's Syndrome centile and SDS calculation for a stream of measurements.
+      description: |
+        * Accepts newline-delimited JSON (NDJSON): one calculation request object per line, each with the same parameters as the `calculation` endpoint.
+        * Returns newline-delimited JSON, streamed back as each chunk of records is calculated. Every non-empty input line produces one output line, in the same order.
+        * Each output line is either a Measurement object, exactly as returned by the `calculation` endpoint, or an object containing the input `line` number and its validation `errors`.
+        * Invalid records do not fail the request.
+        * With `?compact=true` or `?fields=` each Measurement object is compact, or has only the selected fields, as from the `calculation` endpoint.
+
+      parameters:
+        - in: query
+          name: compact
+          required: false
+          schema:
+            type: boolean
+          description: "If true, each Measurement object has only the numbers and codes, as from the `calculation` endpoint with `compact`."
+        - in: query
+          name: fields
+          required: false
+          schema:
+            type: string
+          description: "Comma separated dotted paths of the fields to return for each record, eg `measurement_calculated_values.corrected_sds,measurement_dates.corrected_decimal_age`. Only these are calculated."
+
+      requestBody:
+        content:
+          application/x-ndjson:
+            schema: CalculationRequestParameters
+
+      responses:
+        200:
+          description: "Centile calculations (one per line) according to the supplied data were returned"
+          content:
+            application/x-ndjson:
+              schema: CalculationResponseSchema
+    """
+    return ndjson_calculation_response(reference=TURNERS)
+
+
+@turners.route("/bulk-calculation-csv", methods=["POST"])
+def turner_bulk_calculation_csv():
+    """
+    Bulk centile calculation from a CSV file.
+    ---
+    post:
+      summary: Turner's Syndrome centile and SDS calculation for a CSV file of measurements.
+      description: |
+        * Accepts a CSV file (`text/csv`) with a header row and the columns `birth_date`, `observation_date`, `sex`, `measurement_method` and `observation_value`. The columns `gestation_weeks` and `gestation_days` are optional and default to term.
+        * Dates are in `YYYY-MM-DD` format; anything after a 'T' is discarded. Any other columns are returned unchanged.
+        * Returns the same CSV, streamed back in chunks, with `chronological_decimal_age`, `corrected_decimal_age`, `chronological_sds`, `chronological_centile`, `chronological_centile_band`, `corrected_sds`, `corrected_centile`, `corrected_centile_band` and `error` columns appended.
+        * Rows that cannot be read are returned with an `error` and empty results. Results are empty where there is no reference data for the age.
+        * With `?compact=true` the centile band columns are band codes (0-20) rather than messages.
+
+      parameters:
+        - in: query
+          name: compact
+          required: false
+          schema:
+            type: boolean
+          description: "If true, the centile band columns are band codes (0-20) rather than messages."
+
+      requestBody:
+        content:
+          text/csv:
+            schema:
+              type: string
+
+      responses:
+        200:
+          description: "The supplied CSV was returned with centile calculations appended"
+          content:
+            text/csv:
+              schema:
+                type: string
+        422:
+          description: "The CSV is missing required columns"
+    """
+    return csv_calculation_response(reference=TURNERS)
+
+
 @turners.route("/plottable-child-data", methods=["POST"])
 def turner_plottable_child_data():
     """
     Child growth data in plottable format.
     ---
-    POST:
+    post:
       summary: Child growth data in plottable format.
       description: |
         * Requires results data parameters from a call to the calculation endpoint.
         * Returns child measurement data in a plottable format (x and y parameters), with centiles and ages for labels.
 
+      parameters:
+        - in: query
+          name: fields
+          required: false
+          schema:
+            type: string
+          description: "Comma separated dotted paths of the fields to return, eg `child_data.centile_data.x,child_data.centile_data.y`. Only these are created."
+
       requestBody:
         content:
           application/json:
@@ -125,16 +239,22 @@ def turner_plottable_child_data():
     if request.is_json:
         req = request.get_json()
         results = req["results"]
+        try:
+            fields = requested_fields(PLOTTABLE_CHILD_DATA_RESPONSE_FIELDS)
+        except ValueError as err:
+            return json.dumps(err.args), 422
 
         # data are serial data points for a single child
         # Prepare data from plotting
-        child_data = create_plottable_child_data(results)
+        child_data = None
+        if field_requested(fields, "child_data"):
+            child_data = create_plottable_child_data(results, fields=sub_fields(fields, "child_data"))
         # Retrieve sex of child to select correct centile charts
         sex = results[0]["birth_data"]["sex"]
-        return jsonify({
+        return timed_jsonify(select_fields({
             "sex": sex,
             "child_data": child_data,
-        })
+        }, fields))
     else:
         return "Request body mimetype should be application/json", 400
 
@@ -144,7 +264,7 @@ def turner_chart_coordinates():
     """
     Chart data.
     ---
-    GET:
+    get:
       summary: UK-WHO Chart coordinates in plottable format
         * Returns coordinates for constructing the lines of a traditional growth chart, in JSON format
 
@@ -165,9 +285,9 @@ def turner_chart_coordinates():
         chart_data = create_chart(
             TURNERS, centile_selection=COLE_TWO_THIRDS_SDS_NINE_CENTILES)
     except Exception as err:
-        print(err)
+        logger.exception("chart could not be created")
         return "Server error fetching chart data.", 400
-    return jsonify({
+    return timed_jsonify({
         "centile_data": chart_data
     })
 
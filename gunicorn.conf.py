@@ -0,0 +1,47 @@
+"""
+Production gunicorn settings for the RCPCH Growth Charts API Server
+gunicorn reads this file from the working directory (or pass --config gunicorn.conf.py): `gunicorn app:create_app()`
+Every setting can be overridden from the environment, so that each deployment can be sized without a rebuild.
+See benchmarks/server_benchmark.py to compare worker classes and thread counts on your own hardware.
+"""
+
+# standard imports
+import multiprocessing
+from os import environ
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(environ.get(name, default))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return environ.get(name, str(default)).lower() in ("true", "1", "yes")
+
+
+# PORT is set by most hosting platforms
+bind = environ.get("GUNICORN_BIND", f"0.0.0.0:{environ.get('PORT', '5000')}")
+
+# The calculations are CPU bound, so one process per core; WEB_CONCURRENCY is the usual platform override
+workers = _env_int("WEB_CONCURRENCY", multiprocessing.cpu_count())
+
+# gthread: each worker serves several requests at once, so slow clients and uploads do not hold a whole process.
+# sync: one request per worker process at a time.
+worker_class = environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = _env_int("GUNICORN_THREADS", 4)
+
+# The app is created (and warmed up, see create_app) once in the master process and inherited by every worker
+preload_app = _env_bool("GUNICORN_PRELOAD", True)
+
+# Workers are recycled after this many requests (with jitter so that they do not all restart together), bounding any memory growth
+max_requests = _env_int("GUNICORN_MAX_REQUESTS", 1000)
+max_requests_jitter = _env_int("GUNICORN_MAX_REQUESTS_JITTER", 100)
+
+# Seconds: a worker silent for longer than timeout is killed and replaced; bulk requests stream, so they stay alive
+timeout = _env_int("GUNICORN_TIMEOUT", 60)
+graceful_timeout = _env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+keepalive = _env_int("GUNICORN_KEEPALIVE", 5)
+
+# "-" is stdout; an empty GUNICORN_ACCESS_LOG turns the access log off
+accesslog = environ.get("GUNICORN_ACCESS_LOG", "-") or None
+errorlog = environ.get("GUNICORN_ERROR_LOG", "-")
+loglevel = environ.get("GUNICORN_LOG_LEVEL", "info")
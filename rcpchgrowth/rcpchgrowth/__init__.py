@@ -1,11 +1,17 @@
 from .date_calculations import decimal_age, chronological_decimal_age, corrected_decimal_age, chronological_calendar_age, estimated_date_delivery, corrected_gestational_age
+from .date_calculations import chronological_decimal_ages, corrected_decimal_ages, estimated_dates_delivery, corrected_gestational_ages, gestation_flags, parse_iso_date
 from .global_functions import centile, sds_for_measurement, measurement_from_sds, percentage_median_bmi
-from .centile_bands import centile_band_for_centile
+from .centile_bands import centile_band_for_centile, centile_band_code_for_centile, centile_bands_for_centiles, centile_band_codes_for_centiles
 from .bmi_functions import bmi_from_height_weight, weight_for_bmi_height
 from .growth_interpretations import comment_prematurity_correction
 from .uk_who import select_reference_data_for_uk_who_chart
 from .turner import select_reference_data_for_turner
 from .trisomy_21 import select_reference_data_for_trisomy_21
 from .measurement import Measurement
+from .cache_backends import CacheBackend, LRUCache, SQLiteCache, RedisCache, cache_backend
+from .result_cache import calculate_measurement, use_measurement_cache
+from .counters import counter_values, counter_value, reset_counters
 from .chart_functions import create_chart, create_plottable_child_data
+from .response_fields import parse_fields, field_requested, sub_fields, select_fields
+from .batch_calculations import calculate_measurement_columns, calculate_measurement_rows, calculate_csv, calculate_csv_file
 from .constants import *
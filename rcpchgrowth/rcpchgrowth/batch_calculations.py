@@ -0,0 +1,448 @@
+import csv
+import io
+from functools import lru_cache
+from itertools import islice
+
+import numpy as np
+import scipy.stats as stats
+from marshmallow import ValidationError
+
+from .centile_bands import NO_CENTILE_BAND_CODE, centile_band_codes_for_centiles, centile_bands_for_centiles
+from .counters import count
+from .date_calculations import chronological_decimal_ages, corrected_decimal_ages
+from .global_functions import cubic_interpolation
+from .uk_who import UK90_PRETERM_DATA, WHO_INFANTS_DATA, WHO_CHILD_DATA, UK90_CHILD_DATA, UK90_REFERENCE_LOWER_THRESHOLD, UK_WHO_INFANT_LOWER_THRESHOLD, WHO_CHILD_LOWER_THRESHOLD, WHO_CHILDREN_UPPER_THRESHOLD, UK90_UPPER_THRESHOLD
+from .trisomy_21 import TRISOMY_21_DATA
+from .validation import CALCULATION_REQUEST_FIELD_NAMES, validate_calculation_request
+from .turner import TURNER_DATA
+from .constants import *
+
+"""
+Array-based equivalents of the Measurement calculations, for bulk use.
+Measurements are processed as columns (numpy arrays) rather than as one Measurement object per row.
+The results match sds_for_measurement and centile for every row: the same reference selection,
+the same reference_data_absent rules and the same exact/cubic/linear LMS interpolation.
+Where a calculation is impossible (missing reference data, dates in the wrong order) the result is NaN.
+ - calculate_measurement_columns: ages, SDS and centiles for columns of measurements
+ - calculate_measurement_rows: the same calculations for a chunk of rows read from a CSV or JSON lines file
+ - measurement_columns_from_rows: validates a chunk of rows as calculation requests and reads them into columns
+ - calculate_csv: streams a CSV of measurements back with the calculated columns appended, in fixed-size chunks
+ - calculate_csv_file: as calculate_csv, between two files
+ - build_reference_arrays: builds the reference arrays used by all of these ahead of the first calculation
+"""
+
+CSV_CHUNK_SIZE = 10000
+
+CSV_REQUIRED_COLUMNS = ["birth_date", "observation_date", "sex", "measurement_method", "observation_value"]
+CSV_OPTIONAL_COLUMNS = ["gestation_weeks", "gestation_days"]
+CSV_RESULT_COLUMNS = [
+    "chronological_decimal_age",
+    "corrected_decimal_age",
+    "chronological_sds",
+    "chronological_centile",
+    "chronological_centile_band",
+    "corrected_sds",
+    "corrected_centile",
+    "corrected_centile_band",
+    "error"
+]
+
+BIRTH_AFTER_OBSERVATION_MESSAGE = "Birth date cannot be after the date of observation."
+
+# the UK-WHO segments in order of age, as selected by uk_who_reference
+UK_WHO_SEGMENT_DATA = [UK90_PRETERM_DATA, WHO_INFANTS_DATA, WHO_CHILD_DATA, UK90_CHILD_DATA]
+UK_WHO_SEGMENT_LOWER_THRESHOLDS = [UK90_REFERENCE_LOWER_THRESHOLD, UK_WHO_INFANT_LOWER_THRESHOLD, WHO_CHILD_LOWER_THRESHOLD, WHO_CHILDREN_UPPER_THRESHOLD]
+
+# public functions
+
+
+def calculate_measurement_columns(
+    reference: str,
+    birth_dates: np.ndarray,
+    observation_dates: np.ndarray,
+    sexes: np.ndarray,
+    measurement_methods: np.ndarray,
+    observation_values: np.ndarray,
+    gestation_weeks: np.ndarray,
+    gestation_days: np.ndarray
+) -> dict:
+    """
+    Calculates decimal ages, SDS and centiles for columns of measurements against one reference.
+    Dates are numpy datetime64 arrays (NaT for a missing date), sexes and measurement_methods are string arrays,
+    observation_values and gestations are numeric arrays of the same length. A gestation_weeks of 0 means term.
+    Returns a dict of float arrays keyed as in the Measurement object:
+    chronological_decimal_age, corrected_decimal_age, chronological_sds, chronological_centile, corrected_sds, corrected_centile
+    """
+
+    birth_dates = np.asarray(birth_dates, dtype="datetime64[D]")
+    observation_dates = np.asarray(observation_dates, dtype="datetime64[D]")
+    sexes = np.asarray(sexes)
+    measurement_methods = np.asarray(measurement_methods)
+    observation_values = np.asarray(observation_values, dtype=float)
+    gestation_weeks = np.asarray(gestation_weeks, dtype=float)
+    gestation_days = np.asarray(gestation_days, dtype=float)
+
+    chronological_ages, corrected_ages = _decimal_ages(
+        birth_dates=birth_dates,
+        observation_dates=observation_dates,
+        gestation_weeks=gestation_weeks,
+        gestation_days=gestation_days)
+
+    chronological_sds = sds_for_measurement_columns(
+        reference=reference, ages=chronological_ages, measurement_methods=measurement_methods, observation_values=observation_values, sexes=sexes)
+    corrected_sds = sds_for_measurement_columns(
+        reference=reference, ages=corrected_ages, measurement_methods=measurement_methods, observation_values=observation_values, sexes=sexes)
+
+    return {
+        "chronological_decimal_age": chronological_ages,
+        "corrected_decimal_age": corrected_ages,
+        "chronological_sds": chronological_sds,
+        "chronological_centile": stats.norm.cdf(chronological_sds) * 100,
+        "corrected_sds": corrected_sds,
+        "corrected_centile": stats.norm.cdf(corrected_sds) * 100
+    }
+
+
+def sds_for_measurement_columns(
+    reference: str,
+    ages: np.ndarray,
+    measurement_methods: np.ndarray,
+    observation_values: np.ndarray,
+    sexes: np.ndarray
+) -> np.ndarray:
+    """
+    Array equivalent of sds_for_measurement. Rows are grouped by measurement_method and sex
+    so that each group is interpolated against its reference in one pass.
+    """
+    sds = np.full(len(ages), np.nan)
+    for measurement_method in MEASUREMENT_METHODS:
+        for sex in SEXES:
+            rows = np.flatnonzero((measurement_methods == measurement_method) & (sexes == sex))
+            if rows.size == 0:
+                continue
+            sds[rows] = _sds_for_ages(
+                reference=reference,
+                ages=ages[rows],
+                measurement_method=measurement_method,
+                sex=sex,
+                observation_values=observation_values[rows])
+    return sds
+
+
+def lms_for_ages(ages: np.ndarray, reference_ages: np.ndarray, l: np.ndarray, m: np.ndarray, s: np.ndarray):
+    """
+    Array equivalent of fetch_lms for a single reference array.
+    Exact matches return the reference L, M and S, otherwise cubic interpolation is used
+    except at the fringes of the reference, where linear interpolation is used.
+    Ages outside the reference return NaN.
+    The interpolation branches are counted (see counters) as fetch_lms counts them, once for the whole array.
+    """
+    number_of_ages = len(reference_ages)
+    lowest_index = np.searchsorted(reference_ages, ages, side="right") - 1  # the exact match or the lowest nearest age
+    one_below = np.clip(lowest_index, 0, number_of_ages - 1)
+    exact = (lowest_index >= 0) & (reference_ages[one_below] == ages)
+    cubic = ~exact & (lowest_index >= 1) & (lowest_index < number_of_ages - 2)
+    linear = ~exact & ~cubic & (lowest_index >= 0) & (lowest_index < number_of_ages - 1)
+    for branch, selected in (("exact", exact), ("cubic", cubic), ("linear", linear)):
+        _count_rows("lms_interpolations", (branch,), selected)
+
+    two_below = np.clip(lowest_index - 1, 0, number_of_ages - 1)
+    one_above = np.clip(lowest_index + 1, 0, number_of_ages - 1)
+    two_above = np.clip(lowest_index + 2, 0, number_of_ages - 1)
+
+    results = []
+    # clipped indices make the unused branches divide by zero: those values are discarded below
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for parameter in (l, m, s):
+            cubic_values = cubic_interpolation(
+                age=ages,
+                age_one_below=reference_ages[one_below],
+                age_two_below=reference_ages[two_below],
+                age_one_above=reference_ages[one_above],
+                age_two_above=reference_ages[two_above],
+                parameter_two_below=parameter[two_below],
+                parameter_one_below=parameter[one_below],
+                parameter_one_above=parameter[one_above],
+                parameter_two_above=parameter[two_above])
+            linear_values = parameter[one_below] + (ages - reference_ages[one_below]) * (
+                parameter[one_above] - parameter[one_below]) / (reference_ages[one_above] - reference_ages[one_below])
+            results.append(np.select(
+                [exact, cubic, linear],
+                [parameter[one_below], cubic_values, linear_values],
+                default=np.nan))
+    return results
+
+
+def calculate_measurement_rows(rows: list, reference: str = UK_WHO, band_codes: bool = False) -> list:
+    """
+    Calculates a list of measurement rows (dicts, as read from a CSV or JSON lines file) in one array pass.
+    Each row needs birth_date, observation_date, sex, measurement_method and observation_value,
+    and may have gestation_weeks and gestation_days. Dates are YYYY-MM-DD; anything after a 'T' is discarded.
+    Each row is updated in place with the CSV_RESULT_COLUMNS and returned: results are None where they cannot be calculated,
+    and rows that cannot be read have an error and no results.
+    If band_codes is True the centile bands are band codes (see centile_bands) rather than messages.
+    """
+    columns, errors = measurement_columns_from_rows(rows)
+    results = calculate_measurement_columns(reference=reference, **columns)
+    for age_type in ("chronological", "corrected"):
+        results[f"{age_type}_centile_band"] = centile_band_column(
+            sds=results[f"{age_type}_sds"], measurement_methods=columns["measurement_methods"], band_codes=band_codes)
+
+    for index, row in enumerate(rows):
+        if errors[index] is None:
+            for column, values in results.items():
+                row[column] = _value_or_none(values[index])
+        else:
+            for column in CSV_RESULT_COLUMNS:
+                row[column] = None
+        row["error"] = errors[index]
+    return rows
+
+
+def measurement_columns_from_rows(rows: list):
+    """
+    Validates each row (a dict) as a calculation request (see validate_calculation_request) and reads the chunk into
+    the columns of calculate_measurement_columns. Empty strings and None are missing values.
+    Returns (columns, errors): errors has the reason each row cannot be read, or None. Rows which cannot be read have NaN/NaT values.
+    """
+    size = len(rows)
+    columns = {
+        "birth_dates": np.full(size, np.datetime64("NaT"), dtype="datetime64[D]"),
+        "observation_dates": np.full(size, np.datetime64("NaT"), dtype="datetime64[D]"),
+        "sexes": np.empty(size, dtype=object),
+        "measurement_methods": np.empty(size, dtype=object),
+        "observation_values": np.full(size, np.nan),
+        "gestation_weeks": np.zeros(size),
+        "gestation_days": np.zeros(size)
+    }
+    errors = [None] * size
+    for index, row in enumerate(rows):
+        # empty cells are missing values
+        values = {key: row[key] for key in CALCULATION_REQUEST_FIELD_NAMES if row.get(key) not in ("", None)}
+        try:
+            values = validate_calculation_request(values)
+        except ValidationError as err:
+            errors[index] = "; ".join(f"{field}: {' '.join(messages)}" for field, messages in err.messages.items())
+            continue
+        if values["birth_date"] > values["observation_date"]:
+            errors[index] = BIRTH_AFTER_OBSERVATION_MESSAGE
+            continue
+        columns["sexes"][index] = values["sex"]
+        columns["measurement_methods"][index] = values["measurement_method"]
+        columns["birth_dates"][index] = values["birth_date"]
+        columns["observation_dates"][index] = values["observation_date"]
+        columns["observation_values"][index] = values["observation_value"]
+        columns["gestation_weeks"][index] = values.get("gestation_weeks", 0)
+        columns["gestation_days"][index] = values.get("gestation_days", 0)
+    return columns, errors
+
+
+def build_reference_arrays() -> int:
+    """
+    Builds the reference arrays for every reference, measurement_method and sex with reference data,
+    so that the first calculation does not have to. Returns the number built.
+    """
+    built = 0
+    for reference in REFERENCES:
+        segments = range(1, len(UK_WHO_SEGMENT_DATA) + 1) if reference == UK_WHO else [1]
+        for segment in segments:
+            for measurement_method in MEASUREMENT_METHODS:
+                for sex in SEXES:
+                    try:
+                        _reference_arrays(reference=reference, segment=segment, measurement_method=measurement_method, sex=sex)
+                    except (KeyError, ValueError):
+                        # no reference data (Turner's boys), or none usable (preterm BMI): never calculated
+                        continue
+                    built += 1
+    return built
+
+
+def centile_band_column(sds: np.ndarray, measurement_methods: np.ndarray, band_codes: bool = False) -> np.ndarray:
+    """
+    Returns the centile band messages for a column of SDS, or their band codes if band_codes is True.
+    Missing bands are None, or NO_CENTILE_BAND_CODE.
+    """
+    if band_codes:
+        return centile_band_codes_for_centiles(sds)
+    return centile_bands_for_centiles(sds=sds, measurement_methods=measurement_methods)
+
+
+def csv_reader(lines):
+    """
+    Returns a csv.DictReader for an iterable of CSV text lines, and the fieldnames of the calculated output:
+    the input columns followed by CSV_RESULT_COLUMNS.
+    Raises ValueError if required columns are missing.
+    """
+    reader = csv.DictReader(lines)
+    fieldnames = reader.fieldnames or []
+    if fieldnames and fieldnames[0].startswith("\ufeff"):
+        # spreadsheet exports often begin with a byte order mark
+        fieldnames[0] = fieldnames[0][1:]
+        reader.fieldnames = fieldnames
+    missing_columns = [column for column in CSV_REQUIRED_COLUMNS if column not in fieldnames]
+    if missing_columns:
+        raise ValueError(f"The CSV is missing the required columns: {', '.join(missing_columns)}")
+
+    output_fieldnames = fieldnames + [column for column in CSV_RESULT_COLUMNS if column not in fieldnames]
+    return reader, output_fieldnames
+
+
+def csv_text(rows: list, fieldnames: list, header: bool = False) -> str:
+    """
+    Returns calculated rows as CSV text. Missing results are written as empty cells.
+    """
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction="ignore", lineterminator="\n")
+    if header:
+        writer.writeheader()
+    writer.writerows({key: _csv_value(value) for key, value in row.items()} for row in rows)
+    return output.getvalue()
+
+
+def calculate_csv(lines, reference: str = UK_WHO, chunk_size: int = CSV_CHUNK_SIZE, band_codes: bool = False):
+    """
+    Accepts an iterable of CSV text lines (a text file or stream) with birth_date, observation_date, sex,
+    measurement_method and observation_value columns, and optionally gestation_weeks and gestation_days.
+    Returns a generator of CSV text, one block per chunk of chunk_size rows, with the input columns followed by CSV_RESULT_COLUMNS.
+    Rows that cannot be read are returned with an error and no results; they do not stop the calculation.
+    Raises ValueError immediately if required columns are missing.
+    If band_codes is True the centile bands are band codes rather than messages.
+    """
+    reader, output_fieldnames = csv_reader(lines)
+    return _calculate_csv_chunks(reader=reader, reference=reference, chunk_size=chunk_size, output_fieldnames=output_fieldnames, band_codes=band_codes)
+
+
+def calculate_csv_file(input_path: str, output_path: str, reference: str = UK_WHO, chunk_size: int = CSV_CHUNK_SIZE, band_codes: bool = False):
+    """
+    Reads a CSV of measurements from input_path and writes it with the calculated columns to output_path (see calculate_csv)
+    """
+    with open(input_path, newline="") as input_file, open(output_path, "w", newline="") as output_file:
+        for block in calculate_csv(lines=input_file, reference=reference, chunk_size=chunk_size, band_codes=band_codes):
+            output_file.write(block)
+
+
+"""
+private functions
+"""
+
+
+def _decimal_ages(birth_dates: np.ndarray, observation_dates: np.ndarray, gestation_weeks: np.ndarray, gestation_days: np.ndarray):
+    # no age can be calculated if birth is after observation, so neither age is returned
+    corrected_ages = corrected_decimal_ages(
+        birth_dates=birth_dates, observation_dates=observation_dates, gestation_weeks=gestation_weeks, gestation_days=gestation_days)
+    chronological_ages = chronological_decimal_ages(birth_dates=birth_dates, observation_dates=observation_dates)
+    chronological_ages[np.isnan(corrected_ages)] = np.nan
+    return chronological_ages, corrected_ages
+
+
+def _sds_for_ages(reference: str, ages: np.ndarray, measurement_method: str, sex: str, observation_values: np.ndarray) -> np.ndarray:
+    # SDS for one measurement_method and sex
+    sds = np.full(len(ages), np.nan)
+    available = ~_reference_data_absent(reference=reference, ages=ages, measurement_method=measurement_method, sex=sex)
+
+    if reference == UK_WHO:
+        # segment 0 is below the reference, 1-4 are UK_WHO_SEGMENT_DATA
+        segments = np.searchsorted(UK_WHO_SEGMENT_LOWER_THRESHOLDS, ages, side="right")
+        segments[~(ages <= UK90_UPPER_THRESHOLD)] = 0
+    else:
+        segments = np.ones(len(ages), dtype=int)
+
+    for segment in np.unique(segments[available]):
+        if segment == 0:
+            continue
+        rows = np.flatnonzero(available & (segments == segment))
+        # counted as sds_for_measurement counts them, once for all the rows of each segment
+        _count_rows("reference_lookups", (reference, measurement_method), rows)
+        if reference == UK_WHO:
+            _count_rows("uk_who_segments", (UK_WHO_REFERENCES[segment - 1],), rows)
+        reference_ages, l, m, s = _reference_arrays(
+            reference=reference, segment=int(segment), measurement_method=measurement_method, sex=sex)
+        if reference_ages.size == 0:
+            continue
+        lms = lms_for_ages(ages=ages[rows], reference_ages=reference_ages, l=l, m=m, s=s)
+        sds[rows] = _z_scores(l=lms[0], m=lms[1], s=lms[2], observations=observation_values[rows])
+    return sds
+
+
+def _z_scores(l: np.ndarray, m: np.ndarray, s: np.ndarray, observations: np.ndarray) -> np.ndarray:
+    # array equivalent of z_score
+    with np.errstate(divide="ignore", invalid="ignore"):
+        box_cox = (np.power(observations / m, l) - 1) / (l * s)
+        log_normal = np.log(observations / m) / s
+    return np.where(l != 0.0, box_cox, log_normal)
+
+
+def _reference_data_absent(reference: str, ages: np.ndarray, measurement_method: str, sex: str) -> np.ndarray:
+    # array equivalent of reference_data_absent for each reference: True where there is no reference data
+    # NaN ages are always absent
+    if reference == UK_WHO:
+        absent = ~((ages >= TWENTY_THREE_WEEKS_GESTATION) & (ages <= TWENTY_YEARS))
+        if measurement_method == "height":
+            absent |= ages < TWENTY_FIVE_WEEKS_GESTATION
+        elif measurement_method == "bmi":
+            absent |= ages < FORTY_TWO_WEEKS_GESTATION
+        elif measurement_method == "ofc":
+            absent |= ages > (EIGHTEEN_YEARS if sex == "male" else SEVENTEEN_YEARS)
+    elif reference == TRISOMY_21:
+        absent = ~((ages >= 0) & (ages <= TWENTY_YEARS))
+        if measurement_method == "bmi":
+            absent |= ages > 18.82
+        elif measurement_method == "ofc":
+            absent |= ages > EIGHTEEN_YEARS
+    elif reference == TURNERS:
+        absent = ~((ages >= 1) & (ages <= TWENTY_YEARS))
+        if measurement_method != "height" or sex == "male":
+            absent[:] = True
+    else:
+        raise ValueError("Incorrect reference supplied")
+    return absent
+
+
+@lru_cache(maxsize=None)
+def _reference_arrays(reference: str, segment: int, measurement_method: str, sex: str):
+    # the decimal ages and L, M and S of a reference as float arrays, built once per reference, measurement_method and sex
+    if reference == UK_WHO:
+        reference_data = UK_WHO_SEGMENT_DATA[segment - 1]
+    elif reference == TRISOMY_21:
+        reference_data = TRISOMY_21_DATA
+    else:
+        reference_data = TURNER_DATA
+    lms_array = reference_data["measurement"][measurement_method][sex]
+    return tuple(
+        np.array([lms_element[key] for lms_element in lms_array], dtype=float)
+        for key in ("decimal_age", "L", "M", "S"))
+
+
+def _calculate_csv_chunks(reader, reference: str, chunk_size: int, output_fieldnames: list, band_codes: bool):
+    yield csv_text(rows=[], fieldnames=output_fieldnames, header=True)
+    while True:
+        rows = list(islice(reader, chunk_size))
+        if not rows:
+            break
+        yield csv_text(rows=calculate_measurement_rows(rows=rows, reference=reference, band_codes=band_codes), fieldnames=output_fieldnames)
+
+
+def _count_rows(name: str, labels: tuple, rows: np.ndarray):
+    # counts the rows selected (a boolean mask or their indices), if there are any
+    number_of_rows = int(np.count_nonzero(rows)) if rows.dtype == bool else rows.size
+    if number_of_rows:
+        count(name, labels, amount=number_of_rows)
+
+
+def _value_or_none(value):
+    # numpy results as Python values for CSV and JSON, with None for anything missing
+    if value is None:
+        return None
+    if isinstance(value, np.integer):
+        return None if value == NO_CENTILE_BAND_CODE else int(value)
+    if isinstance(value, str):
+        return value
+    if np.isnan(value):
+        return None
+    return float(value)
+
+
+def _csv_value(value) -> str:
+    if value is None:
+        return ""
+    return value
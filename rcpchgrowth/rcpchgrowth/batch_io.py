@@ -0,0 +1,364 @@
+import json
+from itertools import islice
+
+import numpy as np
+
+from .batch_calculations import BIRTH_AFTER_OBSERVATION_MESSAGE, CSV_REQUIRED_COLUMNS, CSV_RESULT_COLUMNS, calculate_measurement_columns, calculate_measurement_rows, centile_band_column, csv_reader, csv_text
+from .centile_bands import NO_CENTILE_BAND_CODE
+from .validation import CALCULATION_REQUEST_FIELD_NAMES, REQUIRED_MESSAGE, validate_calculation_field
+from .constants import *
+
+"""
+File formats for batch calculation. Each format reads a file in chunks, calculates a chunk (in any process)
+and writes the calculated chunks in order:
+ - csv: CSV text, with the results appended as columns
+ - jsonl: JSON lines, with the results added to each object
+ - parquet and arrow (Arrow IPC / Feather v2): columnar record batches, with the results appended as typed columns.
+   These need pyarrow, which is optional: it is imported only when one of these formats is used.
+Further formats can be added with register_batch_format.
+"""
+
+
+class BatchFormat:
+    """
+    A file format for batch calculation. Subclasses implement:
+     - read_chunks(input_file, chunk_size): returns an iterator of chunks of input. Called once, before calculate.
+     - calculate(chunk, reference, band_codes): returns (number of rows, calculated chunk). Must be picklable to run in a worker process.
+     - write_chunk(output_file, chunk): writes a calculated chunk; close(output_file) is called after the last one.
+    binary is True if the format reads and writes bytes rather than text.
+    """
+    binary = False
+
+    def read_chunks(self, input_file, chunk_size: int):
+        raise NotImplementedError
+
+    def calculate(self, chunk, reference: str, band_codes: bool = False):
+        raise NotImplementedError
+
+    def write_chunk(self, output_file, chunk):
+        output_file.write(chunk)
+
+    def close(self, output_file):
+        pass
+
+
+class CsvFormat(BatchFormat):
+
+    def __init__(self):
+        self.fieldnames = None
+
+    def read_chunks(self, input_file, chunk_size: int):
+        reader, self.fieldnames = csv_reader(input_file)
+        self._header_written = False
+        return _chunks(reader, chunk_size)
+
+    def calculate(self, chunk: list, reference: str, band_codes: bool = False):
+        rows = calculate_measurement_rows(rows=chunk, reference=reference, band_codes=band_codes)
+        return len(rows), csv_text(rows=rows, fieldnames=self.fieldnames)
+
+    def write_chunk(self, output_file, chunk: str):
+        if not self._header_written:
+            output_file.write(csv_text(rows=[], fieldnames=self.fieldnames, header=True))
+            self._header_written = True
+        output_file.write(chunk)
+
+    def close(self, output_file):
+        # an input with no rows still has a header
+        self.write_chunk(output_file, "")
+
+
+class JsonLinesFormat(BatchFormat):
+
+    def read_chunks(self, input_file, chunk_size: int):
+        return _chunks((line for line in input_file if line.strip()), chunk_size)
+
+    def calculate(self, chunk: list, reference: str, band_codes: bool = False):
+        rows = []
+        for line in chunk:
+            try:
+                row = json.loads(line)
+            except ValueError as err:
+                row = {"error": f"Invalid JSON: {err}"}
+            rows.append(row if isinstance(row, dict) else {"error": "Invalid input type."})
+        calculate_measurement_rows(rows=[row for row in rows if "error" not in row], reference=reference, band_codes=band_codes)
+        return len(rows), "".join(json.dumps(row) + "\n" for row in rows)
+
+
+class ArrowFormat(BatchFormat):
+    """
+    Arrow IPC files. Dates may be date, timestamp or YYYY-MM-DD string columns.
+    Results are float64 and string columns; where a result cannot be calculated it is null.
+    Rows which cannot be read (an unknown sex, a missing date) have null results, and the reason in the error column.
+    """
+    binary = True
+
+    def read_chunks(self, input_file, chunk_size: int):
+        pa = _import_pyarrow()
+        reader = pa.ipc.open_file(input_file)
+        _check_required_columns(reader.schema)
+        return _record_batch_chunks(reader, chunk_size)
+
+    def calculate(self, chunk, reference: str, band_codes: bool = False):
+        return chunk.num_rows, calculate_record_batch(record_batch=chunk, reference=reference, band_codes=band_codes)
+
+    def write_chunk(self, output_file, chunk):
+        if getattr(self, "_writer", None) is None:
+            self._writer = self._new_writer(output_file, chunk.schema)
+        self._writer.write_batch(chunk)
+
+    def close(self, output_file):
+        if getattr(self, "_writer", None) is not None:
+            self._writer.close()
+
+    def _new_writer(self, output_file, schema):
+        return _import_pyarrow().ipc.new_file(output_file, schema)
+
+    def __getstate__(self):
+        # the format is sent to worker processes with each chunk; the open writer stays in this process
+        state = self.__dict__.copy()
+        state.pop("_writer", None)
+        return state
+
+
+class ParquetFormat(ArrowFormat):
+    """
+    Parquet files, read and written in record batches of chunk_size rows (see ArrowFormat)
+    """
+
+    def read_chunks(self, input_file, chunk_size: int):
+        _import_pyarrow()
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(input_file)
+        _check_required_columns(parquet_file.schema_arrow)
+        return parquet_file.iter_batches(batch_size=chunk_size)
+
+    def _new_writer(self, output_file, schema):
+        _import_pyarrow()
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(output_file, schema)
+
+
+BATCH_FORMATS = {
+    "csv": CsvFormat,
+    "jsonl": JsonLinesFormat,
+    "parquet": ParquetFormat,
+    "arrow": ArrowFormat
+}
+
+FORMAT_EXTENSIONS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow"
+}
+
+
+def register_batch_format(name: str, batch_format: type, extensions: tuple = ()):
+    """
+    Makes a BatchFormat subclass available to the command line tool as --format name, and for files with the given extensions
+    """
+    BATCH_FORMATS[name] = batch_format
+    for extension in extensions:
+        FORMAT_EXTENSIONS[extension] = name
+
+
+def format_for_path(path: str) -> str:
+    """
+    Returns the name of the batch format for a file path from its extension. Anything unrecognised is treated as CSV.
+    """
+    for extension, name in FORMAT_EXTENSIONS.items():
+        if path.lower().endswith(extension):
+            return name
+    return "csv"
+
+
+def calculate_record_batch(record_batch, reference: str = UK_WHO, band_codes: bool = False):
+    """
+    Returns an Arrow RecordBatch (or Table) with CSV_RESULT_COLUMNS appended.
+    Centile bands are string columns, or int8 band codes if band_codes is True.
+    Each record is validated as an API request would be (see validate_calculation_request), with the same messages,
+    but column by column with pyarrow.compute: date and timestamp columns stay typed, and only the distinct values
+    of other columns (eg dates as YYYY-MM-DD strings, parsed by parse_iso_date) are read one at a time.
+    Nulls and empty strings are missing values. A record which cannot be read has null results and the reason
+    in the string error column, which is null for the others.
+    """
+    pa = _import_pyarrow()
+
+    _check_required_columns(record_batch.schema)
+
+    columns, errors = _record_batch_columns(pa, record_batch)
+    results = calculate_measurement_columns(reference=reference, **columns)
+    for age_type in ("chronological", "corrected"):
+        results[f"{age_type}_centile_band"] = centile_band_column(
+            sds=results[f"{age_type}_sds"], measurement_methods=columns["measurement_methods"], band_codes=band_codes)
+
+    for name in CSV_RESULT_COLUMNS:
+        if name == "error":
+            result_type = pa.string()
+            values = errors
+        elif name not in results:
+            continue
+        elif not name.endswith("_centile_band"):
+            result_type = pa.float64()
+            # NaN results become nulls
+            values = pa.array(results[name], type=result_type, from_pandas=True)
+        elif band_codes:
+            result_type = pa.int8()
+            values = pa.array(results[name], type=result_type, mask=results[name] == NO_CENTILE_BAND_CODE)
+        else:
+            result_type = pa.string()
+            values = pa.array(results[name], type=result_type)
+        record_batch = record_batch.append_column(pa.field(name, result_type), values)
+    return record_batch
+
+
+"""
+private functions
+"""
+
+
+def _chunks(iterable, chunk_size: int):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _record_batch_columns(pa, record_batch):
+    # the validated columns of calculate_measurement_columns, and the string array of the reason each record cannot be read
+    pc = pa.compute
+    typed_columns = {}
+    errors = pa.nulls(record_batch.num_rows, type=pa.string())
+    # the messages of each field in the order of validate_calculation_request, joined as in measurement_columns_from_rows
+    for field_name in CALCULATION_REQUEST_FIELD_NAMES:
+        typed_columns[field_name], messages = _validated_column(pa, record_batch, field_name)
+        if messages is not None:
+            errors = pc.coalesce(pc.binary_join_element_wise(errors, messages, "; "), errors, messages)
+    birth_after_observation = pc.fill_null(pc.and_kleene(
+        errors.is_null(), pc.greater(typed_columns["birth_date"], typed_columns["observation_date"])), False)
+    errors = pc.if_else(birth_after_observation, BIRTH_AFTER_OBSERVATION_MESSAGE, errors)
+
+    # records which cannot be read have no dates, so no results
+    unreadable = errors.is_valid()
+    dates = {
+        name: pc.if_else(unreadable, pa.scalar(None, pa.date32()), typed_columns[field_name]).to_numpy(zero_copy_only=False)
+        for name, field_name in (("birth_dates", "birth_date"), ("observation_dates", "observation_date"))
+    }
+    return {
+        **dates,
+        "sexes": _choice_column(pa, typed_columns["sex"], SEXES),
+        "measurement_methods": _choice_column(pa, typed_columns["measurement_method"], MEASUREMENT_METHODS),
+        "observation_values": typed_columns["observation_value"].to_numpy(zero_copy_only=False),
+        "gestation_weeks": _gestation_column(pa, typed_columns["gestation_weeks"]),
+        "gestation_days": _gestation_column(pa, typed_columns["gestation_days"])
+    }, errors
+
+
+def _validated_column(pa, record_batch, field_name: str):
+    # returns the column of a request field (date32, float64 or string), null where it is missing or invalid,
+    # and a string array of its messages ("field_name: message"), null where it is valid. Both are None for an absent optional column.
+    pc = pa.compute
+    index = record_batch.schema.get_field_index(field_name)
+    if index < 0:
+        return None, None
+    values = record_batch.column(index)
+    if pa.types.is_dictionary(values.type):
+        values = values.cast(values.type.value_type)
+    if pa.types.is_string(values.type) or pa.types.is_large_string(values.type):
+        # empty strings (eg empty CSV cells) are missing values
+        values = pc.if_else(pc.equal(values, ""), pa.scalar(None, values.type), values)
+
+    if field_name in ("birth_date", "observation_date"):
+        result_type = pa.date32()
+        typed = pa.types.is_date(values.type) or pa.types.is_timestamp(values.type)
+    elif field_name in ("sex", "measurement_method"):
+        result_type = pa.string()
+        typed = pa.types.is_string(values.type) or pa.types.is_large_string(values.type)
+    else:
+        result_type = pa.float64()
+        typed = pa.types.is_integer(values.type) or pa.types.is_floating(values.type) or pa.types.is_decimal(values.type)
+
+    if typed:
+        # timestamps are truncated to their dates, as the time after a 'T' is discarded from a date string
+        parsed = pc.cast(values, result_type, safe=False)
+        if field_name == "sex":
+            invalid = pc.invert(pc.is_in(parsed, value_set=pa.array(SEXES)))
+        elif field_name == "measurement_method":
+            invalid = pc.invert(pc.is_in(parsed, value_set=pa.array(MEASUREMENT_METHODS)))
+        elif field_name == "observation_value":
+            invalid = pc.invert(pc.is_finite(parsed))
+        elif field_name == "gestation_weeks":
+            invalid = pc.or_(pc.less(parsed, MINIMUM_GESTATION_WEEKS), pc.greater(parsed, MAXIMUM_GESTATION_WEEKS))
+        else:
+            invalid = None
+        # only the invalid values are validated one at a time, for their messages
+        if invalid is not None:
+            invalid = pc.fill_null(invalid, False)
+            _, messages = _validate_distinct_values(pa, pc.if_else(invalid, values, pa.scalar(None, values.type)), field_name, result_type)
+            parsed = pc.if_else(invalid, pa.scalar(None, result_type), parsed)
+        else:
+            messages = pa.nulls(len(values), type=pa.string())
+    else:
+        parsed, messages = _validate_distinct_values(pa, values, field_name, result_type)
+
+    if field_name in ("gestation_weeks", "gestation_days"):
+        return parsed, messages
+    missing_message = pa.scalar(f"{field_name}: {REQUIRED_MESSAGE}")
+    return parsed, pc.if_else(values.is_null(), missing_message, messages)
+
+
+def _validate_distinct_values(pa, values, field_name: str, result_type):
+    # validates each distinct value (eg each birth date, which repeats through a batch) once, with validate_calculation_field
+    pc = pa.compute
+    distinct_values = pc.unique(values.drop_null())
+    parsed = []
+    messages = []
+    for value in distinct_values.to_pylist():
+        try:
+            parsed.append(validate_calculation_field(field_name, value))
+            messages.append(None)
+        except ValueError as err:
+            parsed.append(None)
+            messages.append(f"{field_name}: {err}")
+    positions = pc.index_in(values, value_set=distinct_values)
+    return pc.take(pa.array(parsed, type=result_type), positions), pc.take(pa.array(messages, type=pa.string()), positions)
+
+
+def _choice_column(pa, values, choices: list) -> np.ndarray:
+    # the values of a validated string column as a numpy string array, without a Python object for each row
+    positions = pa.compute.index_in(values, value_set=pa.array(choices))
+    return np.array(choices + [""])[pa.compute.fill_null(positions, len(choices)).to_numpy(zero_copy_only=False)]
+
+
+def _gestation_column(pa, values) -> np.ndarray:
+    # an absent or missing gestation is term
+    if values is None:
+        return 0
+    return pa.compute.fill_null(values, 0).to_numpy(zero_copy_only=False)
+
+
+def _record_batch_chunks(reader, chunk_size: int):
+    # reads the record batches of an Arrow IPC file one at a time, in slices of at most chunk_size rows
+    for index in range(reader.num_record_batches):
+        record_batch = reader.get_batch(index)
+        for offset in range(0, record_batch.num_rows, chunk_size):
+            yield record_batch.slice(offset, chunk_size)
+
+
+def _check_required_columns(schema):
+    missing_columns = [name for name in CSV_REQUIRED_COLUMNS if schema.get_field_index(name) < 0]
+    if missing_columns:
+        raise ValueError(f"The input is missing the required columns: {', '.join(missing_columns)}")
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+    except ImportError:
+        raise ImportError("The parquet and arrow batch formats need pyarrow: pip install pyarrow") from None
+    return pyarrow
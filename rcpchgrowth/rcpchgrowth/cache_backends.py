@@ -0,0 +1,420 @@
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from urllib.parse import unquote, urlparse
+
+"""
+Cache backends: where cached results are kept. All have the same interface (get, set, clear, stats), so a cache
+can be moved from one process to every worker on a node, or to every replica, without changing the code that uses it.
+ - LRUCache: in-process, a bounded least-recently-used cache
+ - SQLiteCache: an SQLite file, shared by the processes on one node (eg the workers of a gunicorn server)
+ - RedisCache: a Redis server (or anything which speaks its protocol), shared by every replica
+ - cache_backend: returns the named backend
+A shared backend that cannot be reached counts as a miss, not an error: whatever was to be cached is calculated instead.
+Shared backends store their values as JSON (with dates and datetimes kept as such, see _encode), never as pickles,
+so nothing read from a shared file or server is run as code. Values must be made of dicts, lists, strings, numbers,
+booleans, None, dates and datetimes.
+"""
+
+# the default number of entries kept by the bounded backends
+DEFAULT_CACHE_SIZE = 4096
+
+DEFAULT_REDIS_URL = "redis://localhost:6379/0"
+
+
+class CacheBackend:
+    """
+    A store of cached values, with hit and miss counters. Subclasses implement:
+     - _get(key): returns the value for a key, or raises KeyError
+     - _set(key, value)
+     - clear(): discards the cached entries
+     - size(): the number of entries, or None if it is not known
+    Errors in unavailable_errors (eg a lost connection) are counted in errors and treated as misses.
+    """
+    maxsize = None
+    unavailable_errors = ()
+
+    def __init__(self):
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self._get(key)
+        except KeyError:
+            self._count("misses")
+            return default
+        except self.unavailable_errors:
+            self._count("errors")
+            self._count("misses")
+            return default
+        self._count("hits")
+        return value
+
+    def set(self, key, value):
+        try:
+            self._set(key, value)
+        except self.unavailable_errors:
+            self._count("errors")
+
+    def clear(self):
+        raise NotImplementedError
+
+    def size(self):
+        return None
+
+    def stats(self) -> dict:
+        with self._counter_lock:
+            stats = {"hits": self.hits, "misses": self.misses, "errors": self.errors}
+        stats.update({"size": self.size(), "maxsize": self.maxsize})
+        return stats
+
+    def reset_stats(self):
+        with self._counter_lock:
+            self.hits = 0
+            self.misses = 0
+            self.errors = 0
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value):
+        raise NotImplementedError
+
+    def _count(self, counter: str):
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+class LRUCache(CacheBackend):
+    """
+    A bounded least-recently-used cache in this process. When full, the least recently used entry is discarded.
+    All operations hold a lock, so one cache can be shared by the threads of a server worker.
+    maxsize 0 disables the cache: nothing is stored and every get is a miss.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        super().__init__()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.maxsize = maxsize
+
+    def resize(self, maxsize: int):
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._entries) > max(maxsize, 0):
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self.reset_stats()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key):
+        with self._lock:
+            value = self._entries[key]
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        with self._lock:
+            if self.maxsize <= 0:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    A cache in an SQLite file, shared by every process on the node which opens the same path.
+    It keeps about maxsize entries: the least recently stored are discarded, in batches, as new entries are stored.
+    Entries are stored under a digest of the namespace and key, so processes running different versions
+    (given different namespaces) can share a file without sharing results.
+    clear discards the entries of every namespace.
+    Each thread of each process has its own connection, opened when first used, so the cache can be created before forking.
+    There is no default path: the file should be in a directory which only the server's user can write to,
+    as anyone who can write to it can change the results served.
+    """
+    unavailable_errors = (sqlite3.Error, ValueError, TypeError)
+
+    def __init__(self, path: str, maxsize: int = DEFAULT_CACHE_SIZE, namespace: str = "", timeout: float = 5.0):
+        super().__init__()
+        if not path:
+            raise ValueError("An SQLiteCache needs the path of its file (CALCULATION_CACHE_LOCATION)")
+        self.path = path
+        self.maxsize = maxsize
+        self.namespace = namespace
+        self.timeout = timeout
+        self._local = threading.local()
+        self._sets = 0
+        self._trim_every = max(1, maxsize // 16)
+
+    def clear(self):
+        try:
+            self._connection().execute("DELETE FROM cache")
+        except self.unavailable_errors:
+            self._count("errors")
+        self.reset_stats()
+
+    def size(self):
+        try:
+            return self._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        except self.unavailable_errors:
+            return None
+
+    def _get(self, key):
+        row = self._connection().execute("SELECT value FROM cache WHERE key = ?", (_digest(self.namespace, key),)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return _decode(row[0])
+
+    def _set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)",
+            (_digest(self.namespace, key), _encode(value)))
+        # trimming walks maxsize rows, so it is done every few sets rather than on every one
+        self._sets += 1
+        if self._sets % self._trim_every == 0:
+            connection.execute(
+                "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,))
+
+    def _connection(self) -> sqlite3.Connection:
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            # autocommit: every statement is its own transaction
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+
+class RedisError(Exception):
+    """
+    An error reply from a Redis server
+    """
+    pass
+
+
+class RedisCache(CacheBackend):
+    """
+    A cache on a Redis server, shared by every replica which uses it. Redis bounds it (with its maxmemory policy),
+    and entries expire after ttl seconds if a ttl is given. Keys are the prefix, a digest of the namespace and a digest of the key,
+    so clear discards only the entries of this namespace.
+    The url is redis://[:password@]host[:port][/db]. Only the Redis protocol (RESP) is used, so no client library is needed.
+    After a failure nothing is sent to the server for retry_interval seconds, so an unreachable server adds no latency.
+    """
+    unavailable_errors = (OSError, RedisError, ValueError, TypeError)
+
+    def __init__(self, url: str = DEFAULT_REDIS_URL, ttl: int = None, namespace: str = "", prefix: str = "rcpchgrowth:",
+                 socket_timeout: float = 1.0, retry_interval: float = 5.0):
+        super().__init__()
+        parsed_url = urlparse(url)
+        if parsed_url.scheme != "redis":
+            raise ValueError(f"{url} is not a redis:// url")
+        self.host = parsed_url.hostname or "localhost"
+        self.port = parsed_url.port or 6379
+        self.password = unquote(parsed_url.password) if parsed_url.password else None
+        self.db = int(parsed_url.path.strip("/") or 0)
+        self.ttl = ttl
+        self.namespace = namespace
+        self.key_prefix = f"{prefix}{_digest(namespace, None)[:16]}:"
+        self.socket_timeout = socket_timeout
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        self._retry_at = 0.0
+
+    def command(self, *arguments):
+        """
+        Sends a command to the server and returns its reply. Raises RedisError for an error reply,
+        and OSError if the server cannot be reached.
+        """
+        with self._lock:
+            if time.monotonic() < self._retry_at:
+                raise ConnectionError(f"redis at {self.host}:{self.port} was unavailable")
+            try:
+                if self._connection is None or self._pid != os.getpid():
+                    self._connect()
+                return self._connection.command(*arguments)
+            except OSError:
+                self._disconnect()
+                self._retry_at = time.monotonic() + self.retry_interval
+                raise
+
+    def clear(self):
+        try:
+            cursor = b"0"
+            while True:
+                cursor, keys = self.command("SCAN", cursor, "MATCH", self.key_prefix + "*", "COUNT", 1000)
+                if keys:
+                    self.command("DEL", *keys)
+                if cursor == b"0":
+                    break
+        except self.unavailable_errors:
+            self._count("errors")
+        self.reset_stats()
+
+    def _get(self, key):
+        value = self.command("GET", self.key_prefix + _digest("", key))
+        if value is None:
+            raise KeyError(key)
+        return _decode(value)
+
+    def _set(self, key, value):
+        arguments = ["SET", self.key_prefix + _digest("", key), _encode(value)]
+        if self.ttl:
+            arguments += ["EX", self.ttl]
+        self.command(*arguments)
+
+    def _connect(self):
+        self._disconnect()
+        connection = _RespConnection(self.host, self.port, self.socket_timeout)
+        if self.password:
+            connection.command("AUTH", self.password)
+        if self.db:
+            connection.command("SELECT", self.db)
+        self._connection = connection
+        self._pid = os.getpid()
+
+    def _disconnect(self):
+        if self._connection is not None:
+            # after a fork the socket belongs to the parent: it is dropped, not closed
+            if self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+
+CACHE_BACKENDS = {
+    "memory": LRUCache,
+    "sqlite": SQLiteCache,
+    "redis": RedisCache
+}
+
+
+def cache_backend(name: str = "memory", location: str = None, maxsize: int = DEFAULT_CACHE_SIZE, namespace: str = "", ttl: int = None) -> CacheBackend:
+    """
+    Returns a new cache backend:
+     - memory: an LRUCache of maxsize entries
+     - sqlite: an SQLiteCache of about maxsize entries, in the file at location, which must be given
+     - redis: a RedisCache on the server at the location url (by default on localhost), whose entries expire after ttl seconds
+    Results calculated by different versions should be given different namespaces.
+    """
+    if name == "memory":
+        return LRUCache(maxsize=maxsize)
+    if name == "sqlite":
+        return SQLiteCache(path=location, maxsize=maxsize, namespace=namespace)
+    if name == "redis":
+        return RedisCache(url=location or DEFAULT_REDIS_URL, ttl=ttl, namespace=namespace)
+    raise ValueError(f"{name} is not a cache backend. The backends are {', '.join(CACHE_BACKENDS)}.")
+
+
+"""
+private functions
+"""
+
+
+def _encode(value) -> bytes:
+    # JSON, with dates and datetimes as {"__date__": "YYYY-MM-DD"} and {"__datetime__": ISO 8601}. Raises TypeError for anything else.
+    return json.dumps(value, default=_encode_date, separators=(",", ":")).encode("utf-8")
+
+
+def _encode_date(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"A {type(value).__name__} cannot be stored in a shared cache")
+
+
+def _decode(data: bytes):
+    # raises ValueError if the data is not JSON
+    return json.loads(data, object_hook=_decode_date)
+
+
+def _decode_date(value: dict):
+    if len(value) == 1:
+        if "__date__" in value:
+            return date.fromisoformat(value["__date__"])
+        if "__datetime__" in value:
+            return datetime.fromisoformat(value["__datetime__"])
+    return value
+
+
+def _digest(namespace: str, key) -> str:
+    # keys are tuples of simple values (see result_cache.measurement_key), whose repr is stable between processes
+    return hashlib.sha256(repr((namespace, key)).encode("utf-8")).hexdigest()
+
+
+class _RespConnection:
+    # a connection to a server speaking the Redis protocol (RESP 2)
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.socket = socket.create_connection((host, port), timeout=timeout)
+        self.reader = self.socket.makefile("rb")
+
+    def command(self, *arguments):
+        self.socket.sendall(_encode_command(arguments))
+        return self._read_reply()
+
+    def close(self):
+        self.reader.close()
+        self.socket.close()
+
+    def _read_reply(self):
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("the redis connection was closed")
+        kind, value = line[:1], line[1:-2]
+        if kind == b"+":
+            return value
+        if kind == b"-":
+            raise RedisError(value.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(value)
+        if kind == b"$":
+            length = int(value)
+            if length == -1:
+                return None
+            data = self.reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("the redis connection was closed")
+            return data[:-2]
+        if kind == b"*":
+            length = int(value)
+            if length == -1:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RedisError(f"unexpected reply from redis: {line!r}")
+
+
+def _encode_command(arguments) -> bytes:
+    encoded = [b"*%d\r\n" % len(arguments)]
+    for argument in arguments:
+        if not isinstance(argument, bytes):
+            argument = str(argument).encode("utf-8")
+        encoded.append(b"$%d\r\n%s\r\n" % (len(argument), argument))
+    return b"".join(encoded)
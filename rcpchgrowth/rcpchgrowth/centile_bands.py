@@ -1,3 +1,9 @@
+from bisect import bisect_left
+from functools import lru_cache
+import sys
+
+import numpy as np
+
 # Recommendations from Project board for reporting Centiles
 
 # Lower limit	Upper limit	Centile band	Weight,  Height, Head	BMI
@@ -23,61 +29,99 @@
 # 2.84	6.00	Above 99.6th	Above normal range	Severely obese
 # 	>6.00		Probable error	Probable error
 
-def centile_band_for_centile(sds: float, measurement_method: str)->str:
+"""
+The band for an SDS is the first whose upper limit (CENTILE_BAND_UPPER_SDS_LIMITS) the SDS is at or below, found by bisection.
+Band messages are formatted once per measurement method and interned, so every measurement shares the same strings.
+Bands can also be returned as their code: the index of the band, 0 (well below the normal range) to 20 (well above).
+ - centile_band_for_centile: the band message for an SDS
+ - centile_band_code_for_centile: the band code for an SDS
+ - centile_band_codes_for_centiles, centile_bands_for_centiles: the same for arrays of SDS, as used by the batch calculations
+"""
+
+CENTILE_BAND_UPPER_SDS_LIMITS = [-6, -2.84, -2.5, -2.17, -1.83, -1.5, -1.16, -0.84, -0.5, -0.17, 0.17, 0.5, 0.84, 1.16, 1.5, 1.83, 2.17, 2.5, 2.84, 6]
+
+# one message per band, in order; the last is for an SDS above the last limit
+CENTILE_BAND_MESSAGES = [
+    "This {measurement_method} measurement is well below the normal range. Please review its accuracy.",
+    "This {measurement_method} measurement is on or near the 0.4th centile.",
+    "This {measurement_method} measurement is below the normal range.",
+    "This {measurement_method} measurement is between the 0.4th and 2nd centiles.",
+    "This {measurement_method} measurement is on or near the 2nd centile.",
+    "This {measurement_method} measurement is between the 2nd and 9th centiles.",
+    "This {measurement_method} measurement is on or near the 9th centile.",
+    "This {measurement_method} measurement is between the 9th and 25th centiles.",
+    "This {measurement_method} measurement is on or near the 25th centile.",
+    "This {measurement_method} measurement is between the 25th and 50th centiles.",
+    "This {measurement_method} measurement is on or near the 50th centile.",
+    "This {measurement_method} measurement is between the 50th and 75th centiles.",
+    "This {measurement_method} measurement is on or near the 75th centile.",
+    "This {measurement_method} measurement is between the 75th and 91st centiles.",
+    "This {measurement_method} measurement is on or near the 91st centile.",
+    "This {measurement_method} measurement is between the 91st and 98th centiles.",
+    "This {measurement_method} measurement is on or near the 98th centile.",
+    "This {measurement_method} measurement is between the 98th and 99.6th centiles.",
+    "This {measurement_method} measurement is on or near the 99.6th centile.",
+    "This {measurement_method} measurement is above the normal range.",
+    "This {measurement_method} measurement is well above the normal range. Please review its accuracy."
+]
+
+MEASUREMENT_METHOD_NAMES = {
+    "bmi": "body mass index",
+    "ofc": "head circumference"
+}
+
+# batch band code for a missing SDS
+NO_CENTILE_BAND_CODE = -1
+
+_upper_sds_limits_array = np.array(CENTILE_BAND_UPPER_SDS_LIMITS, dtype=float)
+
+
+def centile_band_for_centile(sds: float, measurement_method: str) -> str:
     ## this function returns a centile band into which the sds falls
     ## params: accepts a sds: float
     ## params: accepts a measurement_method as string
 
-    centile_band=""
-
-    if measurement_method=="bmi":
-        measurement_method="body mass index"
-    if measurement_method=="ofc":
-        measurement_method="head circumference"
-
-    if sds <=-6:
-        centile_band = 'This ' + measurement_method + ' measurement is well below the normal range. Please review its accuracy.'
-    elif sds <=-2.84:
-        centile_band = "This " + measurement_method + " measurement is on or near the 0.4th centile."
-    elif sds <=-2.5:
-        centile_band = "This " + measurement_method + " measurement is below the normal range."
-    elif sds <=-2.17: 
-        centile_band = "This " + measurement_method + " measurement is between the 0.4th and 2nd centiles."
-    elif sds <=-2.17: 
-        centile_band = "This " + measurement_method + " measurement is between the 0.4th and 2nd centiles."
-    elif sds <=-1.83:
-        centile_band = "This " + measurement_method + " measurement is on or near the 2nd centile."
-    elif sds <=-1.5:
-        centile_band = "This " + measurement_method + " measurement is between the 2nd and 9th centiles."
-    elif sds <=-1.16:
-        centile_band = "This " + measurement_method + " measurement is on or near the 9th centile."
-    elif sds <=-0.84:
-        centile_band = "This " + measurement_method + " measurement is between the 9th and 25th centiles."
-    elif sds <=-0.5:
-        centile_band = "This " + measurement_method + " measurement is on or near the 25th centile."
-    elif sds <=-0.17:
-        centile_band = "This " + measurement_method + " measurement is between the 25th and 50th centiles."
-    elif sds <=0.17:
-        centile_band = "This " + measurement_method + " measurement is on or near the 50th centile."
-    elif sds <=0.5:
-        centile_band = "This " + measurement_method + " measurement is between the 50th and 75th centiles."
-    elif sds <=0.84:
-        centile_band = "This " + measurement_method + " measurement is on or near the 75th centile."
-    elif sds <=1.16:
-        centile_band = "This " + measurement_method + " measurement is between the 75th and 91st centiles."
-    elif sds <=1.5:
-        centile_band = "This " + measurement_method + " measurement is on or near the 91st centile."
-    elif sds <=1.83:
-        centile_band = "This " + measurement_method + " measurement is between the 91st and 98th centiles."
-    elif sds <=2.17:
-        centile_band = "This " + measurement_method + " measurement is on or near the 98th centile."
-    elif sds <=2.5:
-        centile_band = "This " + measurement_method + " measurement is between the 98th and 99.6th centiles."
-    elif sds <=2.84:
-        centile_band = "This " + measurement_method + " measurement is on or near the 99.6th centile."
-    elif sds <=6:
-        centile_band= "This " + measurement_method + " measurement is above the normal range."
-    else:
-        centile_band="This " + measurement_method + " measurement is well above the normal range. Please review its accuracy."
-
-    return centile_band
+    return _band_messages(measurement_method)[centile_band_code_for_centile(sds)]
+
+
+def centile_band_code_for_centile(sds: float) -> int:
+    ## returns the code (index) of the centile band into which the sds falls
+    if sds != sds:
+        # NaN is at or below no limit
+        return len(CENTILE_BAND_UPPER_SDS_LIMITS)
+    return bisect_left(CENTILE_BAND_UPPER_SDS_LIMITS, sds)
+
+
+def centile_band_codes_for_centiles(sds: np.ndarray) -> np.ndarray:
+    """
+    Array equivalent of centile_band_code_for_centile. Returns int8 codes, NO_CENTILE_BAND_CODE where the SDS is NaN.
+    """
+    sds = np.asarray(sds, dtype=float)
+    codes = np.searchsorted(_upper_sds_limits_array, sds, side="left").astype(np.int8)
+    codes[np.isnan(sds)] = NO_CENTILE_BAND_CODE
+    return codes
+
+
+def centile_bands_for_centiles(sds: np.ndarray, measurement_methods: np.ndarray) -> np.ndarray:
+    """
+    Array equivalent of centile_band_for_centile. Returns an object array of the (shared) band messages, None where the SDS is NaN.
+    """
+    codes = centile_band_codes_for_centiles(sds)
+    measurement_methods = np.asarray(measurement_methods, dtype=object)
+    bands = np.full(len(codes), None, dtype=object)
+    for measurement_method in set(measurement_methods[codes != NO_CENTILE_BAND_CODE]):
+        rows = measurement_methods == measurement_method
+        # NO_CENTILE_BAND_CODE indexes the None appended to the messages
+        bands[rows] = _band_message_array(measurement_method)[codes[rows]]
+    return bands
+
+
+@lru_cache(maxsize=None)
+def _band_messages(measurement_method: str) -> tuple:
+    name = MEASUREMENT_METHOD_NAMES.get(measurement_method, measurement_method)
+    return tuple(sys.intern(message.format(measurement_method=name)) for message in CENTILE_BAND_MESSAGES)
+
+
+@lru_cache(maxsize=None)
+def _band_message_array(measurement_method: str) -> np.ndarray:
+    return np.array(_band_messages(measurement_method) + (None,), dtype=object)
@@ -3,12 +3,29 @@ from .uk_who import select_reference_data_for_uk_who_chart
 from .trisomy_21 import select_reference_data_for_trisomy_21
 from .turner import select_reference_data_for_turner
 from .constants.parameter_constants import UK_WHO, TURNERS, TRISOMY_21, COLE_TWO_THIRDS_SDS_NINE_CENTILES, COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION, THREE_PERCENT_CENTILE_COLLECTION, MEASUREMENT_METHODS, SEXES, UK_WHO_REFERENCES
-import pprint
+from .response_fields import PLOTTABLE_CHILD_DATA_FIELDS, field_requested, parse_fields, select_fields
+from .counters import uncounted
+from functools import lru_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+# charts for every reference, centile selection, measurement_method and sex
+CHART_CACHE_SIZE = 64
 
 def create_chart(reference:str, centile_selection:str, measurement_method: str="height", sex: str="female",):
     """
     Global method - return chart for measurement_method, sex and reference
+    Each chart is created once and then cached (see warm_up): the chart returned is shared, so must not be modified.
     """
+    if reference == TURNERS:
+        # there is only one Turner's chart, whatever the measurement_method and sex
+        measurement_method, sex = "height", "female"
+    return _cached_chart(reference, centile_selection, measurement_method, sex)
+
+
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def _cached_chart(reference: str, centile_selection: str, measurement_method: str, sex: str):
     if reference == UK_WHO:
         return create_uk_who_chart(measurement_method=measurement_method, sex=sex,centile_selection=centile_selection)
     elif reference == TURNERS:
@@ -16,15 +33,20 @@ def create_chart(reference:str, centile_selection:str, measurement_method: str="
     elif reference == TRISOMY_21:
         return create_trisomy_21_chart(measurement_method=measurement_method, sex=sex,centile_selection=centile_selection)
     else:
-        print("No reference data returned. Is there a spelling mistake in your reference?")
+        logger.warning("create_chart: no reference data for %s. Is there a spelling mistake in the reference?", reference)
 
-def create_plottable_child_data(child_results_array):
+def create_plottable_child_data(child_results_array, fields=None):
 
     """
     Global method - receives a measurement object and returns the data in plottable format - the ages as x, the measurements
     as y and the centile values as l (label)
+    fields: dotted paths within the result (eg 'centile_data.x,centile_data.y'): if given, only these are created and returned (see response_fields): a ValueError is raised for a field which it does not have
     """
 
+    fields = parse_fields(fields, PLOTTABLE_CHILD_DATA_FIELDS)
+    centile_data_requested = field_requested(fields, "centile_data")
+    sds_data_requested = field_requested(fields, "sds_data")
+
     centile_data = []
     sds_data = []
 
@@ -38,77 +60,81 @@ def create_plottable_child_data(child_results_array):
             ## which allows them to be plotted as pairs: this is because corrected and chronological values should be
             ## linked by a line, the chronological value denotes as a dot, the corrected value as a cross.
 
-            chronological_data_point = {
-                "measurement_method": child_result["child_observation_value"]["measurement_method"],
-                "x": child_result["measurement_dates"]["chronological_decimal_age"], 
-                "y": child_result["child_observation_value"]["observation_value"],
-                "observation_value_error": child_result["child_observation_value"]["observation_value_error"],
-                "centile_band": child_result["measurement_calculated_values"]["chronological_centile_band"],
-                "centile_value": child_result["measurement_calculated_values"]["chronological_centile"],
-                "sds": child_result["measurement_calculated_values"]["chronological_sds"],
-                "measurement_error":child_result["measurement_calculated_values"]["chronological_measurement_error"],
-                "age_error": child_result["measurement_dates"]["chronological_decimal_age_error"],
-                "age_type": "chronological_age",
-                "calendar_age": child_result["measurement_dates"]["chronological_calendar_age"],
-                "corrected_gestation_weeks": child_result["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_weeks"],
-                "corrected_gestation_days": child_result["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_days"],
-                "lay_chronological_decimal_age_comment": child_result["measurement_dates"]["comments"]["lay_chronological_decimal_age_comment"],
-                "clinician_chronological_decimal_age_comment": child_result["measurement_dates"]["comments"]["clinician_chronological_decimal_age_comment"]
-            }
-            corrected_data_point = {
-                "measurement_method": child_result["child_observation_value"]["measurement_method"],
-                "x": child_result["measurement_dates"]["corrected_decimal_age"], 
-                "y": child_result["child_observation_value"]["observation_value"],
-                "observation_value_error": child_result["child_observation_value"]["observation_value_error"],
-                "centile_band": child_result["measurement_calculated_values"]["corrected_centile_band"],
-                "centile_value": child_result["measurement_calculated_values"]["corrected_centile"],
-                "sds": child_result["measurement_calculated_values"]["corrected_sds"],
-                "measurement_error":child_result["measurement_calculated_values"]["corrected_measurement_error"],
-                "age_error": child_result["measurement_dates"]["corrected_decimal_age_error"],
-                "age_type": "corrected_age",
-                "calendar_age": child_result["measurement_dates"]["corrected_calendar_age"],
-                "corrected_gestation_weeks": child_result["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_weeks"],
-                "corrected_gestation_days": child_result["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_days"],
-                "lay_corrected_decimal_age_comment": child_result["measurement_dates"]["comments"]["lay_corrected_decimal_age_comment"],
-                "clinician_corrected_decimal_age_comment": child_result["measurement_dates"]["comments"]["clinician_corrected_decimal_age_comment"],
-            }
-            chronological_sds_data_point = {
-                "measurement_method": child_result["child_observation_value"]["measurement_method"],
-                "x": child_result["measurement_dates"]["chronological_decimal_age"], 
-                "y": child_result["measurement_calculated_values"]["chronological_sds"],
-                "observation_value_error": child_result["child_observation_value"]["observation_value_error"],
-                "sds": child_result["measurement_calculated_values"]["chronological_sds"],
-                "measurement_error":child_result["measurement_calculated_values"]["chronological_measurement_error"],
-                "age_error": child_result["measurement_dates"]["chronological_decimal_age_error"],
-                "age_type": "chronological_age",
-                "calendar_age": child_result["measurement_dates"]["chronological_calendar_age"],
-                "corrected_gestation_weeks": child_result["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_weeks"],
-                "corrected_gestation_days": child_result["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_days"],
-                "lay_chronological_decimal_age_comment": child_result["measurement_dates"]["comments"]["lay_chronological_decimal_age_comment"],
-                "clinician_chronological_decimal_age_comment": child_result["measurement_dates"]["comments"]["clinician_chronological_decimal_age_comment"]
-            }
-
-            corrected_sds_data_point = {
-                "measurement_method": child_result["child_observation_value"]["measurement_method"],
-                "x": child_result["measurement_dates"]["corrected_decimal_age"], 
-                "y": child_result["measurement_calculated_values"]["corrected_sds"],
-                "observation_value_error": child_result["child_observation_value"]["observation_value_error"],
-                "sds": child_result["measurement_calculated_values"]["corrected_sds"],
-                "measurement_error":child_result["measurement_calculated_values"]["corrected_measurement_error"],
-                "age_error": child_result["measurement_dates"]["corrected_decimal_age_error"],
-                "age_type": "corrected_age",
-                "calendar_age": child_result["measurement_dates"]["corrected_calendar_age"],
-                "corrected_gestation_weeks": child_result["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_weeks"],
-                "corrected_gestation_days": child_result["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_days"],
-                "lay_corrected_decimal_age_comment": child_result["measurement_dates"]["comments"]["lay_corrected_decimal_age_comment"],
-                "clinician_corrected_decimal_age_comment": child_result["measurement_dates"]["comments"]["clinician_corrected_decimal_age_comment"],
-            }
+            # a compact result (see Measurement) has no calendar ages or comments: they are left out of its data points
+            comments = child_result["measurement_dates"].get("comments", {})
+
+            if centile_data_requested:
+                chronological_data_point = {
+                    "measurement_method": child_result["child_observation_value"]["measurement_method"],
+                    "x": child_result["measurement_dates"]["chronological_decimal_age"], 
+                    "y": child_result["child_observation_value"]["observation_value"],
+                    "observation_value_error": child_result["child_observation_value"]["observation_value_error"],
+                    "centile_band": child_result["measurement_calculated_values"]["chronological_centile_band"],
+                    "centile_value": child_result["measurement_calculated_values"]["chronological_centile"],
+                    "sds": child_result["measurement_calculated_values"]["chronological_sds"],
+                    "measurement_error":child_result["measurement_calculated_values"]["chronological_measurement_error"],
+                    "age_error": child_result["measurement_dates"]["chronological_decimal_age_error"],
+                    "age_type": "chronological_age",
+                    "calendar_age": child_result["measurement_dates"].get("chronological_calendar_age"),
+                    "corrected_gestation_weeks": child_result["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_weeks"],
+                    "corrected_gestation_days": child_result["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_days"],
+                    "lay_chronological_decimal_age_comment": comments.get("lay_chronological_decimal_age_comment"),
+                    "clinician_chronological_decimal_age_comment": comments.get("clinician_chronological_decimal_age_comment")
+                }
+                corrected_data_point = {
+                    "measurement_method": child_result["child_observation_value"]["measurement_method"],
+                    "x": child_result["measurement_dates"]["corrected_decimal_age"], 
+                    "y": child_result["child_observation_value"]["observation_value"],
+                    "observation_value_error": child_result["child_observation_value"]["observation_value_error"],
+                    "centile_band": child_result["measurement_calculated_values"]["corrected_centile_band"],
+                    "centile_value": child_result["measurement_calculated_values"]["corrected_centile"],
+                    "sds": child_result["measurement_calculated_values"]["corrected_sds"],
+                    "measurement_error":child_result["measurement_calculated_values"]["corrected_measurement_error"],
+                    "age_error": child_result["measurement_dates"]["corrected_decimal_age_error"],
+                    "age_type": "corrected_age",
+                    "calendar_age": child_result["measurement_dates"].get("corrected_calendar_age"),
+                    "corrected_gestation_weeks": child_result["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_weeks"],
+                    "corrected_gestation_days": child_result["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_days"],
+                    "lay_corrected_decimal_age_comment": comments.get("lay_corrected_decimal_age_comment"),
+                    "clinician_corrected_decimal_age_comment": comments.get("clinician_corrected_decimal_age_comment"),
+                }
+                _drop_missing_text(child_result, corrected_data_point, chronological_data_point)
+                centile_data.append([corrected_data_point, chronological_data_point])
+
+            if sds_data_requested:
+                chronological_sds_data_point = {
+                    "measurement_method": child_result["child_observation_value"]["measurement_method"],
+                    "x": child_result["measurement_dates"]["chronological_decimal_age"], 
+                    "y": child_result["measurement_calculated_values"]["chronological_sds"],
+                    "observation_value_error": child_result["child_observation_value"]["observation_value_error"],
+                    "sds": child_result["measurement_calculated_values"]["chronological_sds"],
+                    "measurement_error":child_result["measurement_calculated_values"]["chronological_measurement_error"],
+                    "age_error": child_result["measurement_dates"]["chronological_decimal_age_error"],
+                    "age_type": "chronological_age",
+                    "calendar_age": child_result["measurement_dates"].get("chronological_calendar_age"),
+                    "corrected_gestation_weeks": child_result["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_weeks"],
+                    "corrected_gestation_days": child_result["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_days"],
+                    "lay_chronological_decimal_age_comment": comments.get("lay_chronological_decimal_age_comment"),
+                    "clinician_chronological_decimal_age_comment": comments.get("clinician_chronological_decimal_age_comment")
+                }
 
-            measurement_data_points=[corrected_data_point, chronological_data_point]
-            measurement_sds_data_points=[corrected_sds_data_point, chronological_sds_data_point]
-            
-            centile_data.append(measurement_data_points)
-            sds_data.append(measurement_sds_data_points)
+                corrected_sds_data_point = {
+                    "measurement_method": child_result["child_observation_value"]["measurement_method"],
+                    "x": child_result["measurement_dates"]["corrected_decimal_age"], 
+                    "y": child_result["measurement_calculated_values"]["corrected_sds"],
+                    "observation_value_error": child_result["child_observation_value"]["observation_value_error"],
+                    "sds": child_result["measurement_calculated_values"]["corrected_sds"],
+                    "measurement_error":child_result["measurement_calculated_values"]["corrected_measurement_error"],
+                    "age_error": child_result["measurement_dates"]["corrected_decimal_age_error"],
+                    "age_type": "corrected_age",
+                    "calendar_age": child_result["measurement_dates"].get("corrected_calendar_age"),
+                    "corrected_gestation_weeks": child_result["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_weeks"],
+                    "corrected_gestation_days": child_result["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_days"],
+                    "lay_corrected_decimal_age_comment": comments.get("lay_corrected_decimal_age_comment"),
+                    "clinician_corrected_decimal_age_comment": comments.get("clinician_corrected_decimal_age_comment"),
+                }
+                _drop_missing_text(child_result, corrected_sds_data_point, chronological_sds_data_point)
+                sds_data.append([corrected_sds_data_point, chronological_sds_data_point])
 
     result = {
         "measurement_method": child_result["child_observation_value"]["measurement_method"],
@@ -116,7 +142,7 @@ def create_plottable_child_data(child_results_array):
         "sds_data": sds_data
     }
     
-    return result
+    return select_fields(result, fields)
 
     """
     Return object structure
@@ -164,6 +190,18 @@ def create_plottable_child_data(child_results_array):
 private functions
 """
 
+def _drop_missing_text(child_result, corrected_data_point, chronological_data_point):
+    # leaves out the calendar ages and comments which are not in the child's result (eg a compact result)
+    measurement_dates = child_result["measurement_dates"]
+    for data_point in (corrected_data_point, chronological_data_point):
+        age_type = "corrected" if data_point["age_type"] == "corrected_age" else "chronological"
+        if f"{age_type}_calendar_age" not in measurement_dates:
+            data_point.pop("calendar_age")
+        if "comments" not in measurement_dates:
+            data_point.pop(f"lay_{age_type}_decimal_age_comment")
+            data_point.pop(f"clinician_{age_type}_decimal_age_comment")
+
+@uncounted
 def create_uk_who_chart(measurement_method: str, sex: str, centile_selection: str=COLE_TWO_THIRDS_SDS_NINE_CENTILES):
 
     ## user selects which centile collection they want, for sex and measurement_method
@@ -262,6 +300,7 @@ def create_uk_who_chart(measurement_method: str, sex: str, centile_selection: st
 
 
 
+@uncounted
 def create_turner_chart(centile_selection: str):
    ## user selects which centile collection they want
     ## If the Cole method is selected, conversion between centile and SDS
@@ -347,6 +386,7 @@ def create_turner_chart(centile_selection: str):
     }
     """
 
+@uncounted
 def create_trisomy_21_chart(measurement_method: str, sex: str, centile_selection: str):
    ## user selects which centile collection they want
     ## If the Cole method is selected, conversion between centile and SDS
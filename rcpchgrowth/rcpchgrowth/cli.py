@@ -0,0 +1,103 @@
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from functools import partial
+from multiprocessing import Pool
+
+from .batch_calculations import CSV_CHUNK_SIZE
+from .batch_io import BATCH_FORMATS, format_for_path
+from .constants import *
+
+"""
+The rcpchgrowth command line tool: calculates SDS and centiles for large files without the server,
+in any of the formats of batch_io (CSV, JSON lines, Parquet, Arrow).
+Chunks of rows are calculated by a pool of worker processes (one per core by default) and written out in input order.
+Only a bounded number of chunks are in flight at once, so memory use does not grow with the size of the file.
+Throughput is reported on stderr as rows per second.
+ eg: rcpchgrowth measurements.csv results.csv --reference trisomy-21
+"""
+
+# chunks queued per worker process, so that workers never wait for the reader
+CHUNKS_IN_FLIGHT_PER_PROCESS = 2
+
+
+def main(argv: list = None):
+    arguments = _parse_arguments(argv)
+    batch_format = BATCH_FORMATS[arguments.format or format_for_path(arguments.input)]()
+
+    input_file = _open(arguments.input, "r", batch_format.binary)
+    output_file = _open(arguments.output, "w", batch_format.binary)
+    try:
+        try:
+            chunks = batch_format.read_chunks(input_file, arguments.chunk_size)
+        except (ImportError, ValueError) as err:
+            sys.exit(f"rcpchgrowth: {err}")
+        calculate = partial(batch_format.calculate, reference=arguments.reference, band_codes=arguments.band_codes)
+
+        start = time.perf_counter()
+        row_count = 0
+        for row_total, chunk in _ordered_results(chunks, calculate, arguments.processes):
+            batch_format.write_chunk(output_file, chunk)
+            row_count += row_total
+        batch_format.close(output_file)
+        elapsed = time.perf_counter() - start
+    finally:
+        for file in (input_file, output_file):
+            if file not in (sys.stdin, sys.stdout, sys.stdin.buffer, sys.stdout.buffer):
+                file.close()
+
+    print(f"rcpchgrowth: {row_count} rows in {elapsed:.2f}s ({row_count / elapsed if elapsed else 0:.0f} rows/s)", file=sys.stderr)
+
+
+"""
+private functions
+"""
+
+
+def _parse_arguments(argv: list):
+    parser = argparse.ArgumentParser(
+        prog="rcpchgrowth", description="Calculate SDS and centiles for a file of measurements.")
+    parser.add_argument("input", help="input file, or - for stdin")
+    parser.add_argument("output", nargs="?", default="-", help="output file (default: stdout)")
+    parser.add_argument("--reference", choices=REFERENCES, default=UK_WHO)
+    parser.add_argument("--format", choices=list(BATCH_FORMATS),
+                        help="input and output format (default: from the input file extension, otherwise csv)")
+    parser.add_argument("--band-codes", action="store_true",
+                        help="write centile band codes (0-20, see rcpchgrowth.centile_bands) instead of band messages")
+    parser.add_argument("--chunk-size", type=int, default=CSV_CHUNK_SIZE, help="rows per chunk of work")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: one per core); 1 calculates in this process")
+    return parser.parse_args(argv)
+
+
+def _open(path: str, mode: str, binary: bool):
+    # - is stdin or stdout
+    if path == "-":
+        standard_file = sys.stdin if mode == "r" else sys.stdout
+        return standard_file.buffer if binary else standard_file
+    if binary:
+        return open(path, mode + "b")
+    return open(path, mode, newline="")
+
+
+def _ordered_results(chunks, calculate, processes: int):
+    # yields the results of calculate(chunk) in the order of chunks
+    if processes <= 1:
+        for chunk in chunks:
+            yield calculate(chunk)
+        return
+
+    with Pool(processes=processes) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.apply_async(calculate, (chunk,)))
+            if len(in_flight) >= processes * CHUNKS_IN_FLIGHT_PER_PROCESS:
+                yield in_flight.popleft().get()
+        while in_flight:
+            yield in_flight.popleft().get()
+
+
+if __name__ == "__main__":
+    main()
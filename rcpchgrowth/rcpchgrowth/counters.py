@@ -0,0 +1,82 @@
+from collections import Counter
+from contextvars import ContextVar
+from functools import wraps
+from threading import Lock
+
+"""
+Counters of the work done by the calculations (eg reference lookups), kept in memory by each process,
+so that a server can report where its time goes (see the /metrics endpoint).
+They count the work of calculations only: nothing is counted while a chart is built (see uncounted), at startup or in a request.
+A counter has a name and a tuple of label values, eg ("reference_lookups", ("uk-who", "height")). The counters are:
+ - reference_lookups: LMS arrays looked up, by reference and measurement_method
+ - lms_interpolations: LMS values found by fetch_lms, by branch: exact (an age in the reference), cubic or linear (at its ends)
+ - uk_who_segments: UK-WHO references selected for an age, by segment (uk90_preterm, uk_who_infant, uk_who_child or uk90_child)
+The functions are:
+ - count: adds to a counter
+ - counter_values: returns a copy of every counter
+ - counter_value: returns one counter
+ - reset_counters: sets every counter back to zero
+ - uncounted: a decorator for a function whose work is not counted, in the current context
+"""
+
+# the labels of each counter, in the order their values are given to count
+COUNTER_LABELS = {
+    "reference_lookups": ("reference", "measurement_method"),
+    "lms_interpolations": ("branch",),
+    "uk_who_segments": ("segment",)
+}
+
+_counts = Counter()
+_lock = Lock()
+
+# False in the context of an uncounted function
+_counting = ContextVar("counting", default=True)
+
+
+def count(name: str, labels: tuple = (), amount: int = 1):
+    """
+    Adds amount to the counter name with these label values
+    """
+    if not _counting.get():
+        return
+    with _lock:
+        _counts[(name, labels)] += amount
+
+
+def counter_values() -> dict:
+    """
+    Returns every counter as {name: {label values: count}}
+    """
+    with _lock:
+        counts = list(_counts.items())
+    values = {}
+    for (name, labels), value in counts:
+        values.setdefault(name, {})[labels] = value
+    return values
+
+
+def counter_value(name: str, labels: tuple = ()) -> int:
+    """
+    Returns the count of the counter name with these label values, eg counter_value("lms_interpolations", ("linear",))
+    """
+    with _lock:
+        return _counts.get((name, labels), 0)
+
+
+def reset_counters():
+    with _lock:
+        _counts.clear()
+
+
+def uncounted(function):
+    """
+    Decorates a function so that nothing is counted during its calls, eg the reference lookups of building a chart
+    """
+    @wraps(function)
+    def not_counted(*args, **kwargs):
+        token = _counting.set(False)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _counting.reset(token)
+    return not_counted
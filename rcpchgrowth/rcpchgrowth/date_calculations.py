@@ -1,8 +1,10 @@
 from datetime import date, datetime
 from datetime import timedelta
 from dateutil import relativedelta
+from functools import lru_cache
 import math
-from .constants import TERM_PREGNANCY_LENGTH_DAYS, TERM_LOWER_THRESHOLD_LENGTH_DAYS, EXTREME_PREMATURITY_THRESHOLD_LENGTH_DAYS
+import numpy as np
+from .constants import TERM_PREGNANCY_LENGTH_DAYS, TERM_LOWER_THRESHOLD_LENGTH_DAYS, EXTREME_PREMATURITY_THRESHOLD_LENGTH_DAYS, LOWER_THRESHOLD_PRETERM_REFERENCE_WEEKS
 
 """
 5 functions to calculate age related parameters
@@ -11,6 +13,12 @@ from .constants import TERM_PREGNANCY_LENGTH_DAYS, TERM_LOWER_THRESHOLD_LENGTH_D
  - corrected_decimal_age: returns a corrected decimal age accounting for prematurity (takes birth_date: date, observation_date: date, gestation_weeks: int, gestation_days: int, pregnancy_length_day [optional])
  - chronological_calendar_age: returns a calendar age as a string (takes birth_date or estimated_date_delivery and observation_date)
  - estimated_date_delivery: returns estimated date of delivery in a known premature infant (takes birth_date, gestation_weeks, gestation_days, pregnancy_length_days[optional])
+ - parse_iso_date: returns a date from a YYYY-MM-DD string, discarding anything after a 'T' (FHIR/ISO date times)
+
+Array equivalents, for columns of measurements: dates are numpy datetime64[D] arrays (NaT if missing), gestations are numeric arrays.
+Each returns the same values as the function above it would for each row, with NaN/NaT where that function would raise or return None.
+ - chronological_decimal_ages, corrected_decimal_ages, estimated_dates_delivery, corrected_gestational_ages
+ - gestation_flags: born_preterm, born_term and age_corrected for each row
 """
 
 def decimal_age(birth_date: date, observation_date: date, gestation_weeks: int, gestation_days: int):
@@ -168,6 +176,117 @@ def corrected_gestational_age(birth_date: date, observation_date: date, gestatio
         'corrected_gestation_days': corrected_supplementary_days
     }
 
+@lru_cache(maxsize=4096)
+def parse_iso_date(date_string: str) -> date:
+    """
+    Parses YYYY-MM-DD, or a FHIR/ISO YYYY-MM-DDTHH:MM:SS date time with any milliseconds and time zone,
+    of which everything after the T is discarded. Single digit months and days are accepted.
+    Raises ValueError if the string is not a valid date.
+    Results are cached, as the same birth dates recur through a batch of measurements.
+    """
+    date_part = date_string.split('T', 1)[0]
+    if len(date_part) == 10 and date_part[4] == '-' and date_part[7] == '-':
+        return date.fromisoformat(date_part)
+    # slower, but also accepts single digit months and days
+    return datetime.strptime(date_part, "%Y-%m-%d").date()
+
+
+def chronological_decimal_ages(birth_dates: np.ndarray, observation_dates: np.ndarray) -> np.ndarray:
+    """
+    Array equivalent of chronological_decimal_age. NaN where either date is NaT.
+    """
+    return _days_between(birth_dates, observation_dates) / 365.25
+
+
+def corrected_decimal_ages(birth_dates: np.ndarray, observation_dates: np.ndarray, gestation_weeks: np.ndarray, gestation_days: np.ndarray) -> np.ndarray:
+    """
+    Array equivalent of corrected_decimal_age: a gestation_weeks of 0 is 40 weeks.
+    NaN where either date is NaT or the birth date is after the date of observation.
+    """
+    birth_dates = _dates(birth_dates)
+    observation_dates = _dates(observation_dates)
+    gestation_weeks = np.asarray(gestation_weeks, dtype=float)
+    gestation_days = np.asarray(gestation_days, dtype=float)
+
+    pregnancy_length_days = np.where(gestation_weeks == 0, TERM_PREGNANCY_LENGTH_DAYS, (gestation_weeks * 7) + gestation_days)
+    correction_days = TERM_PREGNANCY_LENGTH_DAYS - pregnancy_length_days
+    corrected_ages = (_days_between(birth_dates, observation_dates) - correction_days) / 365.25
+    corrected_ages[birth_dates > observation_dates] = np.nan
+    return corrected_ages
+
+
+def estimated_dates_delivery(birth_dates: np.ndarray, gestation_weeks: np.ndarray, gestation_days: np.ndarray) -> np.ndarray:
+    """
+    Array equivalent of estimated_date_delivery. Returns datetime64[D], NaT where the birth date is NaT.
+    """
+    gestation_weeks = np.asarray(gestation_weeks, dtype=float)
+    gestation_days = np.asarray(gestation_days, dtype=float)
+    return _dates(birth_dates) + _prematurity_days(gestation_weeks, gestation_days).astype("timedelta64[D]")
+
+
+def corrected_gestational_ages(birth_dates: np.ndarray, observation_dates: np.ndarray, gestation_weeks: np.ndarray, gestation_days: np.ndarray) -> dict:
+    """
+    Array equivalent of corrected_gestational_age. Returns corrected_gestation_weeks and corrected_gestation_days float arrays,
+    which are NaN where no corrected gestational age is given: from 2 weeks after the estimated date of delivery, beyond 42 weeks,
+    or where a date is NaT.
+    """
+    birth_dates = _dates(birth_dates)
+    observation_dates = _dates(observation_dates)
+    gestation_weeks = np.asarray(gestation_weeks, dtype=float)
+    gestation_days = np.asarray(gestation_days, dtype=float)
+
+    forty_two_weeks_gestation_dates = estimated_dates_delivery(birth_dates, gestation_weeks, gestation_days) + np.timedelta64(14, "D")
+    days_since_conception = _days_between(birth_dates, observation_dates) + (gestation_weeks * 7) + gestation_days
+
+    corrected_weeks = np.floor(days_since_conception / 7)
+    corrected_supplementary_days = days_since_conception - (corrected_weeks * 7)
+
+    no_correction = (
+        ~(observation_dates < forty_two_weeks_gestation_dates)
+        | ((corrected_weeks == 42) & (corrected_supplementary_days > 0))
+        | (corrected_weeks > 42))
+    corrected_weeks[no_correction] = np.nan
+    corrected_supplementary_days[no_correction] = np.nan
+    return {
+        "corrected_gestation_weeks": corrected_weeks,
+        "corrected_gestation_days": corrected_supplementary_days
+    }
+
+
+def gestation_flags(gestation_weeks: np.ndarray, gestation_days: np.ndarray) -> dict:
+    """
+    Returns boolean arrays for gestations at birth:
+     - born_preterm: 23 to 36+6 weeks, as Measurement
+     - born_term: 37 weeks or more, or not given (0 weeks, taken as 40), as Measurement (which counts anything from 37 weeks as not preterm)
+     - age_corrected: corrected_decimal_ages differs from chronological_decimal_ages (any gestation other than 40+0)
+    """
+    gestation_weeks = np.asarray(gestation_weeks, dtype=float)
+    gestation_days = np.asarray(gestation_days, dtype=float)
+    pregnancy_length_days = (gestation_weeks * 7) + gestation_days
+    return {
+        "born_preterm": (gestation_weeks >= LOWER_THRESHOLD_PRETERM_REFERENCE_WEEKS) & (pregnancy_length_days < TERM_LOWER_THRESHOLD_LENGTH_DAYS),
+        "born_term": (gestation_weeks == 0) | (pregnancy_length_days >= TERM_LOWER_THRESHOLD_LENGTH_DAYS),
+        "age_corrected": (gestation_weeks != 0) & (pregnancy_length_days != TERM_PREGNANCY_LENGTH_DAYS)
+    }
+
+
+def _dates(dates) -> np.ndarray:
+    return np.asarray(dates, dtype="datetime64[D]")
+
+
+def _days_between(birth_dates: np.ndarray, observation_dates: np.ndarray) -> np.ndarray:
+    # whole days as floats, NaN where either date is NaT
+    time_alive = _dates(observation_dates) - _dates(birth_dates)
+    days_of_life = time_alive.astype(float)
+    days_of_life[np.isnat(time_alive)] = np.nan
+    return days_of_life
+
+
+def _prematurity_days(gestation_weeks: np.ndarray, gestation_days: np.ndarray) -> np.ndarray:
+    # as estimated_date_delivery: a gestation_weeks of 0 is term
+    pregnancy_length_days = np.where(gestation_weeks > 0, (gestation_weeks * 7) + gestation_days, TERM_PREGNANCY_LENGTH_DAYS)
+    return TERM_PREGNANCY_LENGTH_DAYS - pregnancy_length_days
+
 # def string_to_date(convert_string):
 #     return datetime.strptime(convert_string, '%d/%m/%Y')
 
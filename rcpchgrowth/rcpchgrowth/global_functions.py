@@ -4,6 +4,8 @@ from scipy.interpolate import interp1d
 from .uk_who import uk_who_lms_array_for_measurement_and_sex
 from .turner import turner_lms_array_for_measurement_and_sex
 from .trisomy_21 import trisomy_21_lms_array_for_measurement_and_sex
+from .counters import count
+from .stage_timing import timed_stage
 # from scipy import interpolate  #see below, comment back in if swapping interpolation method
 # from scipy.interpolate import CubicSpline #see below, comment back in if swapping interpolation method
 from .constants.parameter_constants import UK_WHO, TURNERS, TRISOMY_21, COLE_TWO_THIRDS_SDS_NINE_CENTILES, COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION, THREE_PERCENT_CENTILE_COLLECTION, MEASUREMENT_METHODS, SEXES, UK_WHO_REFERENCES
@@ -11,6 +13,8 @@ import logging
 import json
 import pkg_resources
 
+logger = logging.getLogger(__name__)
+
 
 def cubic_interpolation(age: float, age_one_below: float, age_two_below: float, age_one_above: float, age_two_above: float, parameter_two_below: float, parameter_one_below: float, parameter_one_above: float, parameter_two_above: float) -> float:
     """
@@ -94,6 +98,7 @@ def z_score(l: float, m: float, s: float, observation: float):
     return sds
 
 
+@timed_stage("centile")
 def centile(z_score: float):
     """
     Converts a Z Score to a p value (2-tailed) using the SciPy library, which it returns as a percentage
@@ -136,6 +141,7 @@ def nearest_lowest_index(
     return lowest_index
 
 
+@timed_stage("lms")
 def fetch_lms(age: float, lms_value_array_for_measurement: list):
     """
     Retuns the LMS for a given age. If there is no exact match in the reference
@@ -147,6 +153,7 @@ def fetch_lms(age: float, lms_value_array_for_measurement: list):
         lms_value_array_for_measurement, age)  # returns nearest LMS for age
     if round(lms_value_array_for_measurement[age_matched_index]["decimal_age"], 16) == round(age, 16):
         # there is an exact match in the data with the requested age
+        count("lms_interpolations", ("exact",))
         l = lms_value_array_for_measurement[age_matched_index]["L"]
         m = lms_value_array_for_measurement[age_matched_index]["M"]
         s = lms_value_array_for_measurement[age_matched_index]["S"]
@@ -163,6 +170,7 @@ def fetch_lms(age: float, lms_value_array_for_measurement: list):
 
         if age_matched_index >= 1 and age_matched_index < len(lms_value_array_for_measurement) - 2:
             # cubic interpolation is possible
+            count("lms_interpolations", ("cubic",))
             age_two_below = lms_value_array_for_measurement[age_matched_index - 1]["decimal_age"]
             age_two_above = lms_value_array_for_measurement[age_matched_index + 2]["decimal_age"]
             parameter_two_below = lms_value_array_for_measurement[age_matched_index - 1]
@@ -176,6 +184,7 @@ def fetch_lms(age: float, lms_value_array_for_measurement: list):
                                     parameter_two_below=parameter_two_below["S"], parameter_one_below=parameter_one_below["S"], parameter_one_above=parameter_one_above["S"], parameter_two_above=parameter_two_above["S"])
         else:
             # we are at the thresholds of this reference. Only linear interpolation is possible
+            count("lms_interpolations", ("linear",))
             l = linear_interpolation(age=age, age_one_below=age_one_below, age_one_above=age_one_above,
                                      parameter_one_below=parameter_one_below["L"], parameter_one_above=parameter_one_above["L"])
             m = linear_interpolation(age=age, age_one_below=age_one_below, age_one_above=age_one_above,
@@ -261,7 +270,7 @@ def percentage_median_bmi(reference: str, age: float, actual_bmi: float, sex: st
         lms = fetch_lms(
             age=age, lms_value_array_for_measurement=lms_value_array_for_measurement)
     except LookupError as err:
-        print(err)
+        logger.warning("percentage_median_bmi: no LMS for age %s: %s", age, err)
         return None
 
     m = lms["m"]  # this is the median BMI
@@ -286,7 +295,8 @@ def generate_centile(z: float, centile: float, measurement_method: str, sex: str
             measurement = measurement_from_sds(
                 reference=reference, measurement_method=measurement_method, requested_sds=z, sex=sex, age=age, born_preterm=True)
         except Exception as err:
-            print(err)
+            # expected where the reference has no data for the age
+            logger.debug("generate_centile: no %s for age %s: %s", measurement_method, age, err)
             measurement = None
 
         # creates a data point
@@ -334,6 +344,7 @@ def sds_for_centile(centile: float)->float:
     sds = stats.norm.ppf(centile/100)
     return sds
 
+@timed_stage("reference")
 def lms_value_array_for_measurement_for_reference(
     reference: str,
     age: float,
@@ -346,6 +357,8 @@ def lms_value_array_for_measurement_for_reference(
     It accepts the reference ('uk-who', 'turners-syndrome' or 'trisomy-21')
     """
 
+    count("reference_lookups", (reference, measurement_method))
+
     if reference == UK_WHO:
         try:
             lms_value_array_for_measurement = uk_who_lms_array_for_measurement_and_sex(
@@ -1,15 +1,18 @@
 from datetime import date
-from pprint import pprint
 
-from marshmallow import ValidationError
-
-from .centile_bands import centile_band_for_centile
+from .centile_bands import centile_band_for_centile, centile_band_code_for_centile
 from .date_calculations import chronological_decimal_age, corrected_decimal_age, chronological_calendar_age, estimated_date_delivery, corrected_gestational_age
 from .bmi_functions import bmi_from_height_weight, weight_for_bmi_height
 from .growth_interpretations import comment_prematurity_correction
 from .global_functions import sds_for_measurement, measurement_from_sds, centile
+from .response_fields import MEASUREMENT_FIELDS, field_requested, parse_fields, select_fields
+from .stage_timing import timed_stage
+from .validation import observation_value_error as implausible_observation_value_error
 from .constants import *
-from .schemas import *
+
+# the human-readable text left out of compact measurements: of measurement_dates, and of each plottable data point
+COMPACT_OMITTED_DATES = ("chronological_calendar_age", "corrected_calendar_age", "comments")
+COMPACT_OMITTED_PLOTTABLE_DATA = ("calendar_age", "lay_comment", "clinician_comment", "corrected_gestational_age")
 
 
 class Measurement:
@@ -23,7 +26,9 @@ class Measurement:
         observation_value: float,
         reference: str,
         gestation_weeks: int = 0,
-        gestation_days: int = 0
+        gestation_days: int = 0,
+        compact: bool = False,
+        fields=None
     ):
         """
         The Measurement Class is the gatekeeper to all the functions in the RCPCHGrowth package, although the public
@@ -42,6 +47,11 @@ class Measurement:
         `gestation_weeks`: (integer) gestation at birth in weeks.
         `gestation_days`: (integer) supplemental days in addition to gestation_weeks at birth.
         `reference`: ENUM refering to which reference dataset to use: ['uk-who', 'turners-syndrome', 'trisomy-21']
+        `compact`: (boolean) if True, the human-readable text is neither generated nor returned: the comments, calendar ages,
+            estimated date of delivery string and corrected gestational age string are left out, and centile bands are
+            returned as band codes (see centile_bands) rather than messages.
+        `fields`: dotted paths (a comma separated string or a list), eg 'measurement_calculated_values.corrected_sds':
+            if given, only these parts of the measurement are calculated and returned (see response_fields). Raises a ValueError for a field which a measurement does not have.
         """
 
         self.sex = sex
@@ -52,28 +62,22 @@ class Measurement:
         self.gestation_weeks = gestation_weeks
         self.gestation_days = gestation_days
         self.reference = reference
-
-        # Validate using the Marshmallow Schema
-        try:
-            MeasurementClassSchema().load({
-                sex,
-                birth_date,
-                observation_date,
-                measurement_method,
-                observation_value,
-                gestation_weeks,
-                gestation_days,
-                reference
-            })
-        except ValidationError as err:
-            pass  # pprint(err.messages)
-
-        try:
-            self.__validate_measurement_method(
-                measurement_method=measurement_method, observation_value=observation_value)
-            observation_value_error=None
-        except Exception as err:
-            observation_value_error = f"{err}"
+        self.compact = compact
+        self.fields = parse_fields(fields, MEASUREMENT_FIELDS)
+
+        # the parts of the measurement which are calculated: the text is left out in compact mode, and anything not selected by fields
+        self._plottable_data = field_requested(self.fields, "plottable_data")
+        self._centiles = self._plottable_data or field_requested(self.fields, "measurement_calculated_values")
+        self._calendar_ages = not compact and (
+            self._plottable_data
+            or field_requested(self.fields, "measurement_dates.chronological_calendar_age")
+            or field_requested(self.fields, "measurement_dates.corrected_calendar_age"))
+        self._comments = not compact and (self._plottable_data or field_requested(self.fields, "measurement_dates.comments"))
+        self._estimated_date_delivery_string = not compact and field_requested(self.fields, "birth_data.estimated_date_delivery_string")
+
+        # Requests have already been validated (see validation.validate_calculation_request); here the observation_value is checked for plausibility
+        observation_value_error = implausible_observation_value_error(
+            measurement_method=measurement_method, observation_value=observation_value)
 
         if gestation_weeks < 37 and gestation_weeks >= 23:
             self.born_preterm = True
@@ -89,87 +93,44 @@ class Measurement:
             gestation_days=self.gestation_days)
 
         # the calculate_measurements_object receives the child_observation_value and measurement_calculated_values objects
-        self.calculated_measurements_object = self.sds_and_centile_for_measurement_method(
-            sex=self.sex,
-            corrected_age=self.ages_object['measurement_dates']['corrected_decimal_age'],
-            chronological_age=self.ages_object['measurement_dates']['chronological_decimal_age'],
-            measurement_method=self.measurement_method,
-            observation_value=self.observation_value,
-            observation_value_error=observation_value_error,
-            born_preterm=self.born_preterm,
-            reference=self.reference
-        )
-
-        corrected_gestational_age=""
-        if (self.ages_object["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_weeks"] is not None):
-            corrected_gestational_age =  f'{ self.ages_object["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_weeks"] } + { self.ages_object["measurement_dates"]["corrected_gestational_age"]["corrected_gestation_days"]} weeks'
-
-        self.plottable_centile_data = {
-            "chronological_decimal_age_data":{
-                "x": self.ages_object['measurement_dates']['chronological_decimal_age'],
-                "y": self.observation_value,
-                "observation_error": self.calculated_measurements_object['child_observation_value']["observation_value_error"],
-                "age_type": "chronological_age",
-                "calendar_age": self.ages_object["measurement_dates"]["chronological_calendar_age"],
-                "lay_comment": self.ages_object["measurement_dates"]["comments"]["lay_chronological_decimal_age_comment"],
-                "clinician_comment": self.ages_object["measurement_dates"]["comments"]["clinician_chronological_decimal_age_comment"],
-                "age_error": self.ages_object["measurement_dates"]["corrected_decimal_age_error"],
-                "centile_band": self.calculated_measurements_object['measurement_calculated_values']["chronological_centile_band"],
-                "observation_value_error": self.calculated_measurements_object["measurement_calculated_values"]["chronological_measurement_error"]
-
-            },
-            "corrected_decimal_age_data":{
-                "x": self.ages_object['measurement_dates']['corrected_decimal_age'],
-                "y": self.observation_value,
-                "observation_error": self.calculated_measurements_object['child_observation_value']["observation_value_error"],
-                "age_type": "corrected_age",
-                "corrected_gestational_age": corrected_gestational_age, 
-                "calendar_age": self.ages_object["measurement_dates"]["corrected_calendar_age"], 
-                "lay_comment": self.ages_object["measurement_dates"]["comments"]["lay_corrected_decimal_age_comment"],
-                "clinician_comment": self.ages_object["measurement_dates"]["comments"]["clinician_corrected_decimal_age_comment"],
-                "age_error": self.ages_object["measurement_dates"]["corrected_decimal_age_error"],
-                "centile_band": self.calculated_measurements_object['measurement_calculated_values']["corrected_centile_band"],
-                "observation_value_error": self.calculated_measurements_object["measurement_calculated_values"]["corrected_measurement_error"]
+        if self._centiles:
+            self.calculated_measurements_object = self.sds_and_centile_for_measurement_method(
+                sex=self.sex,
+                corrected_age=self.ages_object['measurement_dates']['corrected_decimal_age'],
+                chronological_age=self.ages_object['measurement_dates']['chronological_decimal_age'],
+                measurement_method=self.measurement_method,
+                observation_value=self.observation_value,
+                observation_value_error=observation_value_error,
+                born_preterm=self.born_preterm,
+                reference=self.reference
+            )
+        else:
+            # no SDS or centiles are selected
+            self.calculated_measurements_object = {
+                "child_observation_value": {
+                    "measurement_method": self.measurement_method,
+                    "observation_value": self.observation_value,
+                    "observation_value_error": observation_value_error
+                }
             }
-        }
 
-        self.plottable_sds_data = {
-            "chronological_decimal_age_data":{
-                "x": self.ages_object['measurement_dates']['chronological_decimal_age'],
-                "y": self.calculated_measurements_object['measurement_calculated_values']["chronological_sds"],
-                "age_type": "chronological_age",
-                "calendar_age": self.ages_object["measurement_dates"]["chronological_calendar_age"],
-                "lay_comment": self.ages_object["measurement_dates"]["comments"]["lay_chronological_decimal_age_comment"],
-                "clinician_comment": self.ages_object["measurement_dates"]["comments"]["clinician_chronological_decimal_age_comment"],
-                "age_error": self.ages_object["measurement_dates"]["corrected_decimal_age_error"],
-                "centile_band": self.calculated_measurements_object['measurement_calculated_values']["chronological_centile_band"],
-                "observation_value_error": self.calculated_measurements_object["measurement_calculated_values"]["chronological_measurement_error"] 
-            },
-            "corrected_decimal_age_data":{
-                "x": self.ages_object['measurement_dates']['corrected_decimal_age'],
-                "y": self.calculated_measurements_object['measurement_calculated_values']["corrected_sds"],
-                "age_type": "corrected_age",
-                "corrected_gestational_age": corrected_gestational_age, 
-                "calendar_age": self.ages_object["measurement_dates"]["corrected_calendar_age"], 
-                "lay_comment": self.ages_object["measurement_dates"]["comments"]["lay_corrected_decimal_age_comment"],
-                "clinician_comment": self.ages_object["measurement_dates"]["comments"]["clinician_corrected_decimal_age_comment"],
-                "age_error": self.ages_object["measurement_dates"]["corrected_decimal_age_error"],
-                "centile_band": self.calculated_measurements_object['measurement_calculated_values']["corrected_centile_band"],
-                "observation_value_error": self.calculated_measurements_object["measurement_calculated_values"]["corrected_measurement_error"]
-            },
-        }
+        if self._plottable_data:
+            self.__create_plottable_data()
 
-        # the final object is made up of these five components
-        self.measurement = {
+        # the final object is made up of these five components, of which only those selected by fields are returned
+        measurement = {
             'birth_data': self.ages_object['birth_data'],
             'measurement_dates': self.ages_object['measurement_dates'],
-            'child_observation_value': self.calculated_measurements_object['child_observation_value'],
-            'measurement_calculated_values': self.calculated_measurements_object['measurement_calculated_values'],
-            'plottable_data': {
+            'child_observation_value': self.calculated_measurements_object['child_observation_value']
+        }
+        if self._centiles:
+            measurement['measurement_calculated_values'] = self.calculated_measurements_object['measurement_calculated_values']
+        if self._plottable_data:
+            measurement['plottable_data'] = {
                 "centile_data": self.plottable_centile_data,
                 "sds_data": self.plottable_sds_data
             }
-        }
+        self.measurement = select_fields(measurement, self.fields)
 
 
     """
@@ -235,7 +196,7 @@ class Measurement:
                 chronological_measurement_error="Not possible to calculate centile"
                 chronological_measurement_centile = None
             try:    
-                chronological_centile_band = centile_band_for_centile(
+                chronological_centile_band = self.__centile_band(
                 sds=chronological_measurement_sds, measurement_method=measurement_method)
             except TypeError as err:
                 chronological_measurement_error="Not possible to calculate centile"
@@ -253,7 +214,7 @@ class Measurement:
                 corrected_measurement_centile = None
             
             try:
-                corrected_centile_band = centile_band_for_centile(
+                corrected_centile_band = self.__centile_band(
                 sds=corrected_measurement_sds, measurement_method=measurement_method)
             except TypeError as err:
                 corrected_measurement_error="Not possible to calculate centile"
@@ -279,6 +240,7 @@ class Measurement:
     These are all private class methods and are only accessed by this class on initialisation
     """
 
+    @timed_stage("ages")
     def __calculate_ages(
             self,
             sex: str,
@@ -291,6 +253,14 @@ class Measurement:
             # if gestation not specified, set to 40 weeks
             gestation_weeks = 40
         # calculate ages from dates and gestational ages at birth
+        # (the calendar ages, comments and estimated date of delivery string stay None unless they are calculated)
+        self.chronological_calendar_age = None
+        self.corrected_calendar_age = None
+        self.estimated_date_delivery_string = None
+        self.lay_corrected_decimal_age_comment = None
+        self.clinician_corrected_decimal_age_comment = None
+        self.lay_chronological_decimal_age_comment = None
+        self.clinician_chronological_decimal_age_comment = None
 
         try:
             self.corrected_decimal_age = corrected_decimal_age(
@@ -314,6 +284,9 @@ class Measurement:
             self._age_comments = None
             self.lay_corrected_decimal_age_comment = None
             self.clinician_corrected_decimal_age_comment = None
+        elif not self._comments:
+            # the comments are not generated in compact mode, or if they are not selected
+            corrected_decimal_age_error=None
         else:
             corrected_decimal_age_error=None
             try:
@@ -347,26 +320,28 @@ class Measurement:
             self.estimated_date_delivery_string=None
         else:
             chronological_decimal_age_error=None
-            try:
-                self.chronological_calendar_age = chronological_calendar_age(
-                    birth_date=birth_date,
-                    observation_date=observation_date)
-            except:
-                self.chronological_calendar_age=None
-                chronological_decimal_age_error="Chronological age calculation error."
-            
-            try:
-                self.lay_chronological_decimal_age_comment = self.age_comments['lay_chronological_comment']
-            except:
-                self.lay_chronological_decimal_age_comment = None
-                chronological_decimal_age_error = "Chronological age calculation error."
+            if self._calendar_ages:
+                try:
+                    self.chronological_calendar_age = chronological_calendar_age(
+                        birth_date=birth_date,
+                        observation_date=observation_date)
+                except:
+                    self.chronological_calendar_age=None
+                    chronological_decimal_age_error="Chronological age calculation error."
+
+            if self._comments:
+                try:
+                    self.lay_chronological_decimal_age_comment = self.age_comments['lay_chronological_comment']
+                except:
+                    self.lay_chronological_decimal_age_comment = None
+                    chronological_decimal_age_error = "Chronological age calculation error."
+
+                try:
+                    self.clinician_chronological_decimal_age_comment = self.age_comments['clinician_chronological_comment']
+                except:
+                    self.clinician_chronological_decimal_age_comment=None
+                    chronological_decimal_age_error = "Chronological age calculation error."
 
-            try:
-                self.clinician_chronological_decimal_age_comment = self.age_comments['clinician_chronological_comment']
-            except:
-                self.clinician_chronological_decimal_age_comment=None
-                chronological_decimal_age_error = "Chronological age calculation error."
-            
             try:
                 self.corrected_gestational_age = corrected_gestational_age(
                     birth_date=birth_date,
@@ -385,22 +360,24 @@ class Measurement:
                 self.estimated_date_delivery_string=None
                 chronological_decimal_age_error="Estimated date of delivery calculation error."
             
-            try:
-                self.corrected_calendar_age = chronological_calendar_age(
-                    self.estimated_date_delivery, observation_date)
-            except:
-                self.corrected_calendar_age=None
-                if self.estimated_date_delivery > observation_date:
-                    chronological_decimal_age_error="The due date is after the observation date - a calendar age cannot be calculated."
-                else:
-                    chronological_decimal_age_error="A calendar age cannot be calculated."
-            
-            try:
-                self.estimated_date_delivery_string = self.estimated_date_delivery.strftime(
-                    '%a %d %B, %Y')
-            except:
-                self.estimated_date_delivery_string=None
-                chronological_decimal_age_error="Estimated date of delivery calculation error."
+            if self._calendar_ages:
+                try:
+                    self.corrected_calendar_age = chronological_calendar_age(
+                        self.estimated_date_delivery, observation_date)
+                except:
+                    self.corrected_calendar_age=None
+                    if self.estimated_date_delivery > observation_date:
+                        chronological_decimal_age_error="The due date is after the observation date - a calendar age cannot be calculated."
+                    else:
+                        chronological_decimal_age_error="A calendar age cannot be calculated."
+
+            if self._estimated_date_delivery_string:
+                try:
+                    self.estimated_date_delivery_string = self.estimated_date_delivery.strftime(
+                        '%a %d %B, %Y')
+                except:
+                    self.estimated_date_delivery_string=None
+                    chronological_decimal_age_error="Estimated date of delivery calculation error."
 
         birth_data = {
             "birth_date": birth_date,
@@ -431,12 +408,95 @@ class Measurement:
             "chronological_decimal_age_error": chronological_decimal_age_error
         }
 
+        if self.compact:
+            # only the dates and numbers: no estimated date of delivery string, calendar ages or comments
+            del birth_data["estimated_date_delivery_string"]
+            for key in COMPACT_OMITTED_DATES:
+                del measurement_dates[key]
+
         child_age_calculations = {
             "birth_data": birth_data,
             "measurement_dates": measurement_dates
         }
         return child_age_calculations
 
+    @timed_stage("plottable")
+    def __create_plottable_data(self):
+        measurement_dates = self.ages_object["measurement_dates"]
+        # in compact mode there are no calendar ages or comments: they are left out below
+        comments = measurement_dates.get("comments", {})
+        corrected_gestational_age=""
+        if not self.compact and measurement_dates["corrected_gestational_age"]["corrected_gestation_weeks"] is not None:
+            corrected_gestational_age =  f'{ measurement_dates["corrected_gestational_age"]["corrected_gestation_weeks"] } + { measurement_dates["corrected_gestational_age"]["corrected_gestation_days"]} weeks'
+
+        self.plottable_centile_data = {
+            "chronological_decimal_age_data":{
+                "x": measurement_dates['chronological_decimal_age'],
+                "y": self.observation_value,
+                "observation_error": self.calculated_measurements_object['child_observation_value']["observation_value_error"],
+                "age_type": "chronological_age",
+                "calendar_age": measurement_dates.get("chronological_calendar_age"),
+                "lay_comment": comments.get("lay_chronological_decimal_age_comment"),
+                "clinician_comment": comments.get("clinician_chronological_decimal_age_comment"),
+                "age_error": measurement_dates["corrected_decimal_age_error"],
+                "centile_band": self.calculated_measurements_object['measurement_calculated_values']["chronological_centile_band"],
+                "observation_value_error": self.calculated_measurements_object["measurement_calculated_values"]["chronological_measurement_error"]
+
+            },
+            "corrected_decimal_age_data":{
+                "x": measurement_dates['corrected_decimal_age'],
+                "y": self.observation_value,
+                "observation_error": self.calculated_measurements_object['child_observation_value']["observation_value_error"],
+                "age_type": "corrected_age",
+                "corrected_gestational_age": corrected_gestational_age, 
+                "calendar_age": measurement_dates.get("corrected_calendar_age"), 
+                "lay_comment": comments.get("lay_corrected_decimal_age_comment"),
+                "clinician_comment": comments.get("clinician_corrected_decimal_age_comment"),
+                "age_error": measurement_dates["corrected_decimal_age_error"],
+                "centile_band": self.calculated_measurements_object['measurement_calculated_values']["corrected_centile_band"],
+                "observation_value_error": self.calculated_measurements_object["measurement_calculated_values"]["corrected_measurement_error"]
+            }
+        }
+
+        self.plottable_sds_data = {
+            "chronological_decimal_age_data":{
+                "x": measurement_dates['chronological_decimal_age'],
+                "y": self.calculated_measurements_object['measurement_calculated_values']["chronological_sds"],
+                "age_type": "chronological_age",
+                "calendar_age": measurement_dates.get("chronological_calendar_age"),
+                "lay_comment": comments.get("lay_chronological_decimal_age_comment"),
+                "clinician_comment": comments.get("clinician_chronological_decimal_age_comment"),
+                "age_error": measurement_dates["corrected_decimal_age_error"],
+                "centile_band": self.calculated_measurements_object['measurement_calculated_values']["chronological_centile_band"],
+                "observation_value_error": self.calculated_measurements_object["measurement_calculated_values"]["chronological_measurement_error"] 
+            },
+            "corrected_decimal_age_data":{
+                "x": measurement_dates['corrected_decimal_age'],
+                "y": self.calculated_measurements_object['measurement_calculated_values']["corrected_sds"],
+                "age_type": "corrected_age",
+                "corrected_gestational_age": corrected_gestational_age, 
+                "calendar_age": measurement_dates.get("corrected_calendar_age"), 
+                "lay_comment": comments.get("lay_corrected_decimal_age_comment"),
+                "clinician_comment": comments.get("clinician_corrected_decimal_age_comment"),
+                "age_error": measurement_dates["corrected_decimal_age_error"],
+                "centile_band": self.calculated_measurements_object['measurement_calculated_values']["corrected_centile_band"],
+                "observation_value_error": self.calculated_measurements_object["measurement_calculated_values"]["corrected_measurement_error"]
+            },
+        }
+
+        if self.compact:
+            # only the numbers and codes: no calendar ages, comments or corrected gestational age string
+            for data_point in [*self.plottable_centile_data.values(), *self.plottable_sds_data.values()]:
+                for key in COMPACT_OMITTED_PLOTTABLE_DATA:
+                    data_point.pop(key, None)
+
+    @timed_stage("centile")
+    def __centile_band(self, sds: float, measurement_method: str):
+        # the band message, or in compact mode only the band code
+        if self.compact:
+            return centile_band_code_for_centile(sds=sds)
+        return centile_band_for_centile(sds=sds, measurement_method=measurement_method)
+
     def __create_measurement_object(
         self,
         measurement_method: str,
@@ -497,67 +557,3 @@ class Measurement:
             "child_observation_value": child_observation_value,
             "measurement_calculated_values": measurement_calculated_values,
         }
-
-    def __validate_measurement_method(
-            self,
-            measurement_method: str,
-            observation_value: float):
-
-        # Private method which accepts a measurement_method (height, weight, bmi or ofc) and
-        # and returns True if valid
-
-        is_valid = False
-
-        if measurement_method == 'bmi':
-            if observation_value is None:
-                raise ValueError(
-                    'Missing observation_value for Body Mass Index. Please pass a Body Mass Index in kilograms per metre squared (kg/m2)')
-            else:
-                is_valid = True
-
-        elif measurement_method == 'height':
-            if observation_value is None:
-                raise ValueError(
-                    'Missing observation_value for height/length. Please pass a height/length in cm.')
-            elif observation_value < 2:
-                # most likely metres passed instead of cm.
-                raise ValueError(
-                    'Height/length must be passed in cm, not metres')
-            elif observation_value < MINIMUM_LENGTH_CM:
-                # a baby is unlikely to be < 30 cm long - probably a data entry error
-                raise ValueError(
-                    f'The height/length you have entered is very low and likely to be an error. Are you sure you meant a height of {observation_value} centimetres?')
-            elif observation_value > MAXIMUM_HEIGHT_CM:
-                raise ValueError(
-                    f'The height/length you have entered is very high and likely to be an error. Are you sure you meant a height of {observation_value} centimetres?')
-            else:
-                is_valid = True
-
-        elif measurement_method == 'weight':
-            if observation_value is None:
-                raise ValueError(
-                    'Missing observation_value for weight. Please pass a weight in kilograms.')
-            elif observation_value < MINIMUM_WEIGHT_KG:
-                raise ValueError(
-                    f'Error. {observation_value} kilograms is very low. Please pass an accurate weight in kilograms')
-            elif observation_value > MAXIMUM_WEIGHT_KG:
-                # it is likely the weight is passed in grams, not kg.
-                raise ValueError(
-                    f'{observation_value} kilograms is very high. Weight must be passed in kilograms.')
-            else:
-                is_valid = True
-
-        elif measurement_method == 'ofc':
-            if observation_value is None:
-                raise ValueError(
-                    'Missing observation_value for head circumference. Please pass a head circumference in centimetres.')
-            elif observation_value < MINIMUM_OFC_CM:
-                raise ValueError(
-                    f'Please check this value: {observation_value}. A head circumference less than 5 centimetres is likely an error. Please pass an accurate head circumference in centimetres.')
-            elif observation_value > MAXIMUM_OFC_CM:
-                raise ValueError(
-                    f'Please check this value: {observation_value}. A head circumference > 150 centimetres is likely an error. Please pass an accurate head circumference in cm.')
-            else:
-                is_valid = True
-
-        return is_valid
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from .batch_calculations import calculate_measurement_columns, centile_band_column
+from .constants import *
+
+"""
+A pandas DataFrame accessor for cohort tables, registered as `rcpch` when this module is imported:
+    import rcpchgrowth.pandas_accessor
+    results = df.rcpch.sds(reference="uk-who")
+Whole columns are calculated at once by calculate_measurement_columns, with the same results as the Measurement class row by row.
+pandas is not a dependency of rcpchgrowth, so the accessor is only available where pandas is installed.
+"""
+
+
+@pd.api.extensions.register_dataframe_accessor("rcpch")
+class GrowthAccessor:
+
+    def __init__(self, data_frame: pd.DataFrame):
+        self._data_frame = data_frame
+
+    def sds(
+        self,
+        reference: str = UK_WHO,
+        birth_date: str = "birth_date",
+        observation_date: str = "observation_date",
+        sex: str = "sex",
+        measurement_method: str = "measurement_method",
+        observation_value: str = "observation_value",
+        gestation_weeks: str = "gestation_weeks",
+        gestation_days: str = "gestation_days",
+        centile_bands: bool = True,
+        band_codes: bool = False
+    ) -> pd.DataFrame:
+        """
+        Returns a copy of the DataFrame with chronological_decimal_age, corrected_decimal_age, chronological_sds, chronological_centile,
+        corrected_sds and corrected_centile columns, and chronological_centile_band and corrected_centile_band if centile_bands is True:
+        band messages, or int8 band codes (see centile_bands, -1 where there is no SDS) if band_codes is True.
+        The other parameters name the input columns. The gestation columns are optional; a missing column or value is treated as term.
+        Dates may be datetimes or date strings. Results are NaN where they cannot be calculated, as for missing reference data.
+        """
+        data_frame = self._data_frame
+
+        results = calculate_measurement_columns(
+            reference=reference,
+            birth_dates=self._dates(birth_date),
+            observation_dates=self._dates(observation_date),
+            sexes=data_frame[sex].to_numpy(dtype=object),
+            measurement_methods=data_frame[measurement_method].to_numpy(dtype=object),
+            observation_values=pd.to_numeric(data_frame[observation_value], errors="coerce").to_numpy(dtype=float),
+            gestation_weeks=self._gestation(gestation_weeks),
+            gestation_days=self._gestation(gestation_days))
+
+        if centile_bands:
+            measurement_methods = data_frame[measurement_method].to_numpy(dtype=object)
+            for age_type in ("chronological", "corrected"):
+                results[f"{age_type}_centile_band"] = centile_band_column(
+                    sds=results[f"{age_type}_sds"], measurement_methods=measurement_methods, band_codes=band_codes)
+
+        return data_frame.assign(**results)
+
+    def _dates(self, column: str) -> np.ndarray:
+        # anything after the date (times, time zones) is discarded, as in the API
+        dates = self._data_frame[column]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates.astype(str).str.split("T").str[0], errors="coerce")
+        if getattr(dates.dt, "tz", None) is not None:
+            dates = dates.dt.tz_localize(None)
+        return dates.to_numpy(dtype="datetime64[D]")
+
+    def _gestation(self, column: str) -> np.ndarray:
+        if column not in self._data_frame:
+            return np.zeros(len(self._data_frame))
+        return pd.to_numeric(self._data_frame[column], errors="coerce").fillna(0).to_numpy(dtype=float)
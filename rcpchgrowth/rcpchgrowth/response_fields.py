@@ -0,0 +1,160 @@
+"""
+Sparse fieldsets: selection of the parts of a result (a Measurement object, plottable child data) that a client needs.
+Fields are dotted paths, comma separated, eg: "measurement_calculated_values.corrected_sds,measurement_dates.corrected_decimal_age".
+A selection is parsed once into a tree of nested dicts, in which None selects everything below that key:
+    {"measurement_calculated_values": {"corrected_sds": None}, "measurement_dates": {"corrected_decimal_age": None}}
+The selection None selects the whole result.
+ - parse_fields: returns the selection tree for a fields string or list of dotted paths, checked against the fields of the result if given
+ - field_requested: whether anything at (or below) a dotted path is selected, so that the work for it can be skipped if not
+ - sub_fields: the selection within a key
+ - select_fields: returns only the selected parts of a result
+The fields of each result are trees of the same form, with None for a field which has nothing to select below it:
+ - MEASUREMENT_FIELDS: the Measurement object (Measurement.measurement)
+ - PLOTTABLE_CHILD_DATA_FIELDS: the plottable child data (create_plottable_child_data)
+ - PLOTTABLE_CHILD_DATA_RESPONSE_FIELDS: the response of the plottable-child-data endpoints
+"""
+
+
+def parse_fields(fields, known_fields: dict = None) -> dict:
+    """
+    Returns the selection tree for a fields string ("a.b,c"), a list of dotted paths, or an already parsed tree.
+    None (no selection) is returned unchanged, as is an already parsed tree (it was checked when it was parsed).
+    Raises a ValueError for an empty selection or a malformed path, or, if the known_fields of the result are given,
+    for a path which is not one of them (so that a misspelled field is not silently left out of the result).
+    """
+    if fields is None or isinstance(fields, dict):
+        return fields
+    if isinstance(fields, str):
+        fields = fields.split(",")
+
+    tree = {}
+    for field in fields:
+        field = field.strip()
+        if not field:
+            continue
+        keys = field.split(".")
+        if not all(keys):
+            raise ValueError(f"Invalid field: '{field}'. Fields are dotted paths such as measurement_calculated_values.corrected_sds")
+        branch = tree
+        for key in keys[:-1]:
+            if key in branch and branch[key] is None:
+                # the whole of this key is already selected
+                break
+            branch = branch.setdefault(key, {})
+        else:
+            branch[keys[-1]] = None
+
+    if not tree:
+        raise ValueError("No fields were requested.")
+    if known_fields is not None:
+        unknown_field = _unknown_field(tree, known_fields)
+        if unknown_field is not None:
+            raise ValueError(f"Unknown field: '{unknown_field}'. Fields are dotted paths such as measurement_calculated_values.corrected_sds")
+    return tree
+
+
+def field_requested(fields: dict, path: str) -> bool:
+    """
+    Returns True if the selection includes anything at or below the dotted path
+    """
+    branch = fields
+    for key in path.split("."):
+        if branch is None:
+            return True
+        if key not in branch:
+            return False
+        branch = branch[key]
+    return True
+
+
+def sub_fields(fields: dict, key: str):
+    """
+    Returns the selection within key: None (everything) if the selection is None or selects the whole of key
+    """
+    if fields is None:
+        return None
+    return fields.get(key)
+
+
+def select_fields(result, fields: dict):
+    """
+    Returns the selected parts of a result, keeping its order. Lists are selected item by item.
+    Selected keys which the result does not have are left out.
+    """
+    if fields is None:
+        return result
+    if isinstance(result, list):
+        return [select_fields(item, fields) for item in result]
+    if isinstance(result, dict):
+        return {key: select_fields(value, fields[key]) for key, value in result.items() if key in fields}
+    return result
+
+
+"""
+private functions
+"""
+
+
+def _unknown_field(fields: dict, known_fields: dict, path: str = ""):
+    # returns the dotted path of the first selected field which is not in known_fields, or None if they are all known
+    for key, branch in fields.items():
+        key_path = f"{path}{key}"
+        if known_fields is None or key not in known_fields:
+            return key_path
+        if branch is not None:
+            unknown_field = _unknown_field(branch, known_fields[key], f"{key_path}.")
+            if unknown_field is not None:
+                return unknown_field
+    return None
+
+
+def _leaves(*keys) -> dict:
+    return dict.fromkeys(keys)
+
+
+# the data points of the plottable data within a Measurement object
+_PLOTTABLE_DATA_POINT_FIELDS = ("x", "y", "age_type", "calendar_age", "lay_comment", "clinician_comment", "age_error", "centile_band", "observation_value_error")
+
+MEASUREMENT_FIELDS = {
+    "birth_data": _leaves("birth_date", "gestation_weeks", "gestation_days", "estimated_date_delivery", "estimated_date_delivery_string", "sex"),
+    "measurement_dates": {
+        **_leaves("observation_date", "chronological_decimal_age", "corrected_decimal_age", "chronological_calendar_age", "corrected_calendar_age"),
+        "corrected_gestational_age": _leaves("corrected_gestation_weeks", "corrected_gestation_days"),
+        "comments": _leaves(
+            "clinician_corrected_decimal_age_comment", "lay_corrected_decimal_age_comment",
+            "clinician_chronological_decimal_age_comment", "lay_chronological_decimal_age_comment"),
+        **_leaves("corrected_decimal_age_error", "chronological_decimal_age_error")
+    },
+    "child_observation_value": _leaves("measurement_method", "observation_value", "observation_value_error"),
+    "measurement_calculated_values": _leaves(
+        "corrected_sds", "corrected_centile", "corrected_centile_band", "chronological_sds", "chronological_centile", "chronological_centile_band",
+        "corrected_measurement_error", "chronological_measurement_error"),
+    "plottable_data": {
+        "centile_data": {
+            "chronological_decimal_age_data": _leaves("observation_error", *_PLOTTABLE_DATA_POINT_FIELDS),
+            "corrected_decimal_age_data": _leaves("observation_error", "corrected_gestational_age", *_PLOTTABLE_DATA_POINT_FIELDS)
+        },
+        "sds_data": {
+            "chronological_decimal_age_data": _leaves(*_PLOTTABLE_DATA_POINT_FIELDS),
+            "corrected_decimal_age_data": _leaves("corrected_gestational_age", *_PLOTTABLE_DATA_POINT_FIELDS)
+        }
+    }
+}
+
+# the data points of the plottable child data (a list of them in each of centile_data and sds_data)
+_PLOTTABLE_CHILD_DATA_POINT_FIELDS = (
+    "measurement_method", "x", "y", "observation_value_error", "sds", "measurement_error", "age_error", "age_type", "calendar_age",
+    "corrected_gestation_weeks", "corrected_gestation_days",
+    "lay_corrected_decimal_age_comment", "clinician_corrected_decimal_age_comment",
+    "lay_chronological_decimal_age_comment", "clinician_chronological_decimal_age_comment")
+
+PLOTTABLE_CHILD_DATA_FIELDS = {
+    "measurement_method": None,
+    "centile_data": _leaves("centile_band", "centile_value", *_PLOTTABLE_CHILD_DATA_POINT_FIELDS),
+    "sds_data": _leaves(*_PLOTTABLE_CHILD_DATA_POINT_FIELDS)
+}
+
+PLOTTABLE_CHILD_DATA_RESPONSE_FIELDS = {
+    "sex": None,
+    "child_data": PLOTTABLE_CHILD_DATA_FIELDS
+}
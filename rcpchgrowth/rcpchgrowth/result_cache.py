@@ -0,0 +1,117 @@
+from datetime import date
+
+from .cache_backends import CacheBackend, DEFAULT_CACHE_SIZE, LRUCache
+from .measurement import Measurement
+from .constants import *
+
+"""
+A cache of Measurement results. A result is a pure function of its inputs (reference, sex, dates, gestation, measurement_method,
+observation_value and the compact and fields options), so clients which request the same measurements again
+(eg every time a chart is opened) are answered from the cache rather than recalculated.
+ - calculate_measurement: returns the Measurement result for the inputs, from measurement_cache if it has been calculated before
+ - use_measurement_cache: replaces measurement_cache, eg with a backend shared between processes (see cache_backends)
+ - measurement_key: the normalised cache key for a calculation
+"""
+
+# the default number of results kept by measurement_cache
+MEASUREMENT_CACHE_SIZE = DEFAULT_CACHE_SIZE
+
+
+measurement_cache = LRUCache(maxsize=MEASUREMENT_CACHE_SIZE)
+
+
+def use_measurement_cache(cache: CacheBackend):
+    """
+    Makes cache the cache used by calculate_measurement
+    """
+    global measurement_cache
+    measurement_cache = cache
+
+
+def calculate_measurement(
+    reference: str,
+    sex: str,
+    birth_date: date,
+    observation_date: date,
+    measurement_method: str,
+    observation_value: float,
+    gestation_weeks: int = 0,
+    gestation_days: int = 0,
+    compact: bool = False,
+    fields=None,
+    cache: CacheBackend = None
+) -> dict:
+    """
+    Returns Measurement(...).measurement for these inputs, from the cache (by default measurement_cache) if they have been calculated before.
+    The result returned is shared with later callers, so must not be modified.
+    Errors are raised as by Measurement, and are not cached.
+    """
+    key = measurement_key(
+        reference=reference, sex=sex, birth_date=birth_date, observation_date=observation_date, measurement_method=measurement_method,
+        observation_value=observation_value, gestation_weeks=gestation_weeks, gestation_days=gestation_days, compact=compact, fields=fields)
+    if cache is None:
+        cache = measurement_cache
+    result = cache.get(key)
+    if result is None:
+        result = Measurement(
+            reference=reference,
+            sex=sex,
+            birth_date=birth_date,
+            observation_date=observation_date,
+            measurement_method=measurement_method,
+            observation_value=observation_value,
+            gestation_weeks=gestation_weeks,
+            gestation_days=gestation_days,
+            compact=compact,
+            fields=fields
+        ).measurement
+        cache.set(key, result)
+    return result
+
+
+def measurement_key(
+    reference: str,
+    sex: str,
+    birth_date: date,
+    observation_date: date,
+    measurement_method: str,
+    observation_value: float,
+    gestation_weeks: int = 0,
+    gestation_days: int = 0,
+    compact: bool = False,
+    fields=None
+) -> tuple:
+    """
+    Returns the cache key for a calculation.
+    Numbers are keyed with their type as well as their value, as the result repeats them: 40 and 40.0 are different keys.
+    """
+    return (
+        reference,
+        sex,
+        birth_date,
+        observation_date,
+        measurement_method,
+        _number(observation_value),
+        _number(gestation_weeks),
+        _number(gestation_days),
+        bool(compact),
+        _frozen(fields)
+    )
+
+
+"""
+private functions
+"""
+
+
+def _number(value):
+    return type(value), value
+
+
+def _frozen(fields):
+    # a hashable form of a fields selection (a string, list of dotted paths or parsed tree)
+    if isinstance(fields, dict):
+        return tuple(sorted((key, _frozen(value)) for key, value in fields.items()))
+    if isinstance(fields, list):
+        return tuple(fields)
+    return fields
@@ -0,0 +1,93 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+"""
+Stage timing: where the time of a calculation goes, eg for a server's Server-Timing header.
+Timing is off unless start_stage_timing has been called in the current context (eg by the server, for this request),
+and then the time spent in each stage is added up. A stage within another is not counted in the outer one,
+so the stages never overlap and add up to the time spent in them. When timing is off a stage costs one context lookup.
+ - start_stage_timing: starts timing stages in the current context, returning a token for stop_stage_timing
+ - stop_stage_timing: stops timing, returning the seconds spent in each stage
+ - stage: a context manager timing a block as a stage
+ - timed_stage: a decorator timing every call of a function as a stage
+"""
+
+# the timings of the current context: (seconds by stage, stack of [stage, start] for the stages being timed)
+_timings = ContextVar("stage_timings", default=None)
+
+
+def start_stage_timing():
+    return _timings.set(({}, []))
+
+
+def stop_stage_timing(token) -> dict:
+    timings = _timings.get()
+    _timings.reset(token)
+    return timings[0] if timings is not None else {}
+
+
+def stage_timings() -> dict:
+    """
+    Returns the seconds spent in each stage so far in the current context, or None if timing is off
+    """
+    timings = _timings.get()
+    return dict(timings[0]) if timings is not None else None
+
+
+@contextmanager
+def stage(name: str):
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    _enter(timings, name)
+    try:
+        yield
+    finally:
+        _exit(timings)
+
+
+def timed_stage(name: str):
+    """
+    Decorates a function so that each call is timed as the stage name
+    """
+    def decorator(function):
+        @wraps(function)
+        def timed(*args, **kwargs):
+            timings = _timings.get()
+            if timings is None:
+                return function(*args, **kwargs)
+            _enter(timings, name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _exit(timings)
+        return timed
+    return decorator
+
+
+"""
+private functions
+"""
+
+
+def _enter(timings, name: str):
+    seconds, stack = timings
+    now = time.perf_counter()
+    if stack:
+        # the outer stage is paused
+        outer = stack[-1]
+        seconds[outer[0]] = seconds.get(outer[0], 0.0) + now - outer[1]
+    stack.append([name, now])
+
+
+def _exit(timings):
+    seconds, stack = timings
+    now = time.perf_counter()
+    name, start = stack.pop()
+    seconds[name] = seconds.get(name, 0.0) + now - start
+    if stack:
+        # the outer stage resumes
+        stack[-1][1] = now
@@ -0,0 +1,93 @@
+import json
+import logging
+import sys
+import time
+from threading import Lock
+
+"""
+Logging for rcpchgrowth and the server. Modules log with the standard library: logger = logging.getLogger(__name__),
+passing values as arguments (logger.debug("failed: %s", err)) or extra fields, so that nothing is formatted
+unless the level is enabled. rcpchgrowth adds no handlers of its own: nothing is written unless the application
+configures logging, eg with configure_logging.
+ - JsonFormatter: formats each record as one line of JSON, with its extra fields
+ - RepeatedMessageSampler: a filter passing only the first few of a repeated message in each interval
+ - configure_logging: sends the records of the level and above to stderr, sampled, as JSON (or text) lines
+"""
+
+# the attributes of every LogRecord: anything else on a record was passed in extra
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as a JSON object on one line: time, level, logger, message, then any extra fields and the exception
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES and not name.startswith("_"):
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RepeatedMessageSampler(logging.Filter):
+    """
+    Passes the first burst records of each message (its logger, level and unformatted text) in each interval of seconds,
+    and drops the rest. The first record passed in the next interval has the number dropped in its suppressed field.
+    """
+
+    def __init__(self, burst: int = 10, interval: float = 60.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._lock = Lock()
+        # message: [interval start, records passed, records dropped]
+        self._messages = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            seen = self._messages.get(key)
+            if seen is None or now - seen[0] >= self.interval:
+                dropped = seen[2] if seen is not None else 0
+                self._messages[key] = [now, 1, 0]
+                if dropped:
+                    record.suppressed = dropped
+                return True
+            if seen[1] < self.burst:
+                seen[1] += 1
+                return True
+            seen[2] += 1
+            return False
+
+
+def configure_logging(level="WARNING", structured: bool = True, burst: int = 10, interval: float = 60.0, stream=None) -> logging.Handler:
+    """
+    Sends records of level and above, from every logger, to stream (by default stderr), one per line: as JSON if structured,
+    otherwise as text. Repeated messages are sampled (see RepeatedMessageSampler). Calling it again replaces its handler.
+    Returns the handler.
+    """
+    handler = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    handler.set_name("rcpchgrowth")
+    handler.addFilter(RepeatedMessageSampler(burst=burst, interval=interval))
+    if structured:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        if existing.get_name() == "rcpchgrowth":
+            root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level if isinstance(level, int) else level.upper())
+    return handler
@@ -0,0 +1,126 @@
+import io
+import csv
+import math
+from datetime import date
+
+import numpy as np
+import pytest
+from rcpchgrowth import Measurement, cli, global_functions
+from rcpchgrowth.batch_calculations import calculate_csv, calculate_measurement_columns, calculate_measurement_rows, sds_for_measurement_columns
+
+from .test_measurement_class import load_valid_data_set, ACCURACY
+
+# ages either side of, and exactly on, the reference boundaries exercise the exact, cubic and linear branches
+BOUNDARY_AGES = [-0.33, -0.2874743326488706, -0.1, 0.0, 0.038329911019849415, 0.04, 1.0, 1.99, 2.0, 2.01, 3.99, 4.0, 4.01,
+                 17.0, 17.01, 18.0, 18.01, 18.82, 18.9, 19.99, 20.0, 20.01]
+
+
+def scalar_sds(reference, age, measurement_method, observation_value, sex):
+    try:
+        return float(global_functions.sds_for_measurement(reference, age, measurement_method, observation_value, sex, False))
+    except Exception:
+        return math.nan
+
+
+@pytest.mark.parametrize("reference", ["uk-who", "trisomy-21", "turners-syndrome"])
+def test_sds_columns_match_sds_for_measurement(reference):
+    rows = [(age, measurement_method, sex)
+            for age in BOUNDARY_AGES for measurement_method in ["height", "weight", "bmi", "ofc"] for sex in ["male", "female"]]
+    observation_values = {"height": 80.0, "weight": 10.0, "bmi": 16.0, "ofc": 45.0}
+
+    ages = np.array([row[0] for row in rows])
+    measurement_methods = np.array([row[1] for row in rows])
+    sexes = np.array([row[2] for row in rows])
+    values = np.array([observation_values[row[1]] for row in rows])
+
+    batch_sds = sds_for_measurement_columns(
+        reference=reference, ages=ages, measurement_methods=measurement_methods, observation_values=values, sexes=sexes)
+
+    for index, (age, measurement_method, sex) in enumerate(rows):
+        expected = scalar_sds(reference, age, measurement_method, values[index], sex)
+        if math.isnan(expected):
+            assert math.isnan(batch_sds[index])
+        else:
+            assert batch_sds[index] == pytest.approx(expected, abs=1e-9)
+
+
+def test_sds_columns_with_valid_data_set():
+    lines = [line for line in load_valid_data_set() if line["observation_value"] is not None and line["SDS"] is not None]
+    sds = sds_for_measurement_columns(
+        reference="uk-who",
+        ages=np.array([float(line["corrected_age"]) for line in lines]),
+        measurement_methods=np.array([line["measurement_method"] for line in lines]),
+        observation_values=np.array([float(line["observation_value"]) for line in lines]),
+        sexes=np.array([line["sex"] for line in lines]))
+    assert sds == pytest.approx([float(line["SDS"]) for line in lines], abs=ACCURACY)
+
+
+def test_measurement_columns_match_measurement_class():
+    results = calculate_measurement_columns(
+        reference="uk-who",
+        birth_dates=np.array(["2010-12-03", "2009-01-03"], dtype="datetime64[D]"),
+        observation_dates=np.array(["2010-12-20", "2013-11-20"], dtype="datetime64[D]"),
+        sexes=np.array(["female", "male"]),
+        measurement_methods=np.array(["weight", "height"]),
+        observation_values=np.array([1.2, 105.0]),
+        gestation_weeks=np.array([27, 0]),
+        gestation_days=np.array([0, 0]))
+
+    for index, (birth_date, observation_date, sex, measurement_method, observation_value, gestation_weeks) in enumerate([
+            (date(2010, 12, 3), date(2010, 12, 20), "female", "weight", 1.2, 27),
+            (date(2009, 1, 3), date(2013, 11, 20), "male", "height", 105.0, 0)]):
+        measurement = Measurement(sex=sex, birth_date=birth_date, observation_date=observation_date, measurement_method=measurement_method,
+                                  observation_value=observation_value, reference="uk-who", gestation_weeks=gestation_weeks).measurement
+        assert results["chronological_decimal_age"][index] == pytest.approx(measurement["measurement_dates"]["chronological_decimal_age"])
+        assert results["corrected_decimal_age"][index] == pytest.approx(measurement["measurement_dates"]["corrected_decimal_age"])
+        assert results["chronological_sds"][index] == pytest.approx(measurement["measurement_calculated_values"]["chronological_sds"])
+        assert results["corrected_sds"][index] == pytest.approx(measurement["measurement_calculated_values"]["corrected_sds"])
+
+
+def test_calculate_csv_appends_results_and_errors():
+    csv_text = (
+        "id,birth_date,observation_date,sex,measurement_method,observation_value,gestation_weeks,gestation_days\n"
+        "1,2010-12-03,2010-12-20T10:00:00,female,weight,1.2,27,0\n"
+        "2,2010-12-03,2010-12-20,female,weight,not a number,27,0\n"
+        "3,2010-12-30,2010-12-20,female,weight,1.2,27,0\n"
+        "4,2009-01-03,2013-11-20,male,height,105,,\n")
+
+    output = "".join(calculate_csv(lines=io.StringIO(csv_text), reference="uk-who", chunk_size=3))
+    rows = list(csv.DictReader(io.StringIO(output)))
+
+    assert [row["id"] for row in rows] == ["1", "2", "3", "4"]
+    assert float(rows[0]["corrected_sds"]) == pytest.approx(-0.306530560512087)
+    assert rows[0]["corrected_centile_band"] == "This weight measurement is between the 25th and 50th centiles."
+    assert rows[0]["error"] == ""
+    assert rows[1]["corrected_sds"] == "" and rows[1]["error"] != ""
+    assert rows[2]["error"] == "Birth date cannot be after the date of observation."
+    assert rows[3]["chronological_decimal_age"] == rows[3]["corrected_decimal_age"]
+
+
+def test_calculate_csv_rejects_missing_columns():
+    with pytest.raises(ValueError):
+        calculate_csv(lines=io.StringIO("birth_date,sex\n2020-01-01,male\n"))
+
+
+def test_calculate_measurement_rows_from_json_records():
+    rows = calculate_measurement_rows(rows=[
+        {"birth_date": "2010-12-03", "observation_date": "2010-12-20", "sex": "female",
+         "measurement_method": "weight", "observation_value": 1.2, "gestation_weeks": 27},
+        {"sex": "male"}])
+
+    assert rows[0]["corrected_sds"] == pytest.approx(-0.306530560512087)
+    assert rows[0]["error"] is None
+    assert rows[1]["corrected_sds"] is None and rows[1]["error"] is not None
+
+
+def test_cli_results_are_in_input_order(tmp_path):
+    input_path = tmp_path / "measurements.csv"
+    output_path = tmp_path / "results.csv"
+    input_path.write_text("id,birth_date,observation_date,sex,measurement_method,observation_value\n" +
+                          "".join(f"{index},2009-01-03,2013-11-20,male,height,{90 + index % 30}\n" for index in range(100)))
+
+    cli.main([str(input_path), str(output_path), "--chunk-size", "7", "--processes", "2"])
+
+    rows = list(csv.DictReader(io.StringIO(output_path.read_text())))
+    assert [row["id"] for row in rows] == [str(index) for index in range(100)]
+    assert all(row["chronological_sds"] != "" for row in rows)
@@ -0,0 +1,129 @@
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+from rcpchgrowth import cli
+from rcpchgrowth.batch_calculations import calculate_measurement_columns, calculate_measurement_rows
+from rcpchgrowth.batch_io import ArrowFormat, calculate_record_batch, format_for_path
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+MEASUREMENTS = {
+    "id": list(range(6)),
+    "birth_date": ["2010-12-03", "2009-01-03", "2009-01-03", "2009-01-03", "not a date", "2009-01-03"],
+    "observation_date": [date(2010, 12, 20), date(2013, 11, 20), date(2013, 11, 20), None, date(2013, 11, 20), date(2013, 11, 20)],
+    "sex": ["female", "male", "female", "male", "male", "male"],
+    "measurement_method": ["weight", "height", "bmi", "height", "height", "ofc"],
+    "observation_value": [1.2, 105.0, 15.5, 105.0, 105.0, 50.0],
+    "gestation_weeks": [27, None, 40, None, None, None]
+}
+
+
+def test_record_batch_results_are_typed_columns():
+    record_batch = pa.RecordBatch.from_pydict(MEASUREMENTS)
+
+    calculated = calculate_record_batch(record_batch=record_batch, reference="uk-who")
+
+    assert calculated.schema.field("corrected_sds").type == pa.float64()
+    assert calculated.schema.field("corrected_centile_band").type == pa.string()
+    expected = calculate_measurement_columns(
+        reference="uk-who",
+        birth_dates=np.array(["2010-12-03", "2009-01-03", "2009-01-03", "2009-01-03", "NaT", "2009-01-03"], dtype="datetime64[D]"),
+        observation_dates=np.array(["2010-12-20", "2013-11-20", "2013-11-20", "NaT", "2013-11-20", "2013-11-20"], dtype="datetime64[D]"),
+        sexes=np.array(MEASUREMENTS["sex"]),
+        measurement_methods=np.array(MEASUREMENTS["measurement_method"]),
+        observation_values=np.array(MEASUREMENTS["observation_value"]),
+        gestation_weeks=np.array([27, 0, 40, 0, 0, 0]),
+        gestation_days=np.zeros(6))
+    for name, values in expected.items():
+        results = calculated.column(name).to_pylist()
+        for result, value in zip(results, values):
+            if np.isnan(value):
+                assert result is None
+            else:
+                assert result == pytest.approx(value)
+
+
+def test_cli_parquet_results_are_in_input_order(tmp_path):
+    input_path = tmp_path / "measurements.parquet"
+    output_path = tmp_path / "results.parquet"
+    table = pa.Table.from_pydict({key: values * 20 for key, values in MEASUREMENTS.items()})
+    pq.write_table(table, input_path)
+
+    assert format_for_path(str(input_path)) == "parquet"
+    cli.main([str(input_path), str(output_path), "--chunk-size", "7", "--processes", "2"])
+
+    results = pq.read_table(output_path)
+    assert results.column("id").to_pylist() == table.column("id").to_pylist()
+    assert results.column("corrected_sds").to_pylist() == calculate_record_batch(table).column("corrected_sds").to_pylist()
+
+
+def test_record_batch_band_codes():
+    calculated = calculate_record_batch(record_batch=pa.RecordBatch.from_pydict(MEASUREMENTS), reference="uk-who", band_codes=True)
+
+    assert calculated.schema.field("corrected_centile_band").type == pa.int8()
+    codes = calculated.column("corrected_centile_band").to_pylist()
+    assert codes[0] == 9
+    assert codes[3] is None
+
+
+def test_arrow_chunks_are_read_one_record_batch_at_a_time(tmp_path):
+    input_path = tmp_path / "measurements.arrow"
+    record_batch = pa.RecordBatch.from_pydict(MEASUREMENTS)
+    with pa.ipc.new_file(str(input_path), record_batch.schema) as writer:
+        for _ in range(3):
+            writer.write_batch(record_batch)
+
+    with pa.memory_map(str(input_path)) as input_file:
+        chunks = ArrowFormat().read_chunks(input_file, chunk_size=4)
+        assert [chunk.num_rows for chunk in chunks] == [4, 2, 4, 2, 4, 2]
+
+
+def test_record_batch_records_are_validated_as_requests():
+    measurements = {
+        "birth_date": ["2009-1-3", "2009-01-03", "2009-01-03", "2013-11-21"],
+        "observation_date": ["2013-11-20", "2013-11-20T10:30:00Z", "2013-11-20", "2013-11-20"],
+        "sex": ["male", "male", "unknown", "male"],
+        "measurement_method": ["height", "height", "height", "height"],
+        "observation_value": [105.0, 105.0, 105.0, 105.0],
+        "gestation_weeks": [40, 40, 40, 40]
+    }
+
+    calculated = calculate_record_batch(record_batch=pa.RecordBatch.from_pydict(measurements), reference="uk-who")
+
+    # the same dates, with and without zero padding or a time, give the same results
+    corrected_sds = calculated.column("corrected_sds").to_pylist()
+    assert corrected_sds[0] is not None
+    assert corrected_sds[0] == corrected_sds[1]
+    # the errors of the CSV and JSON lines formats
+    rows = calculate_measurement_rows(rows=[dict(zip(measurements, row)) for row in zip(*measurements.values())], reference="uk-who")
+    assert calculated.column("error").to_pylist() == [row["error"] for row in rows]
+    assert calculated.column("error").to_pylist()[:2] == [None, None]
+    assert calculated.column("error").to_pylist()[2].startswith("sex: ")
+    assert corrected_sds[2] is None and corrected_sds[3] is None
+
+
+def test_typed_and_text_record_batch_columns_give_the_same_results():
+    text = pa.RecordBatch.from_pydict({
+        "birth_date": ["2009-01-03", "2009-01-03", "2012-01-01"],
+        "observation_date": ["2013-11-20", "2013-11-20", "2013-11-20"],
+        "sex": ["male", "female", "unknown"],
+        "measurement_method": ["height", "weight", "ofc"],
+        "observation_value": ["105", "20", "50"]
+    })
+    typed = pa.RecordBatch.from_arrays([
+        pa.array([date(2009, 1, 3)] * 2 + [date(2012, 1, 1)]),
+        pa.array([datetime(2013, 11, 20, 10, 30)] * 3, type=pa.timestamp("ms")),
+        pa.array(["male", "female", "unknown"]).dictionary_encode(),
+        pa.array(["height", "weight", "ofc"]),
+        pa.array([105, 20, 50], type=pa.int32())
+    ], names=text.schema.names)
+
+    text_results = calculate_record_batch(record_batch=text, reference="uk-who")
+    typed_results = calculate_record_batch(record_batch=typed, reference="uk-who")
+
+    for name in ("corrected_decimal_age", "corrected_sds", "corrected_centile_band", "error"):
+        assert typed_results.column(name).to_pylist() == text_results.column(name).to_pylist()
+    assert typed_results.column("corrected_sds").to_pylist()[1] is not None
+    assert typed_results.column("error").to_pylist()[2] == "sex: Must be one of: male, female."
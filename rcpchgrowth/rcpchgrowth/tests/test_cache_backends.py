@@ -0,0 +1,164 @@
+import fnmatch
+import pickle
+import socketserver
+import sqlite3
+import threading
+from datetime import date, datetime
+
+import pytest
+
+from ..cache_backends import LRUCache, RedisCache, SQLiteCache, cache_backend
+
+VALUE = {"birth_data": {"birth_date": date(2020, 4, 12)}, "measurement_calculated_values": {"corrected_sds": -0.5}}
+
+
+class Planted:
+    # run if a cached value were unpickled
+    def __reduce__(self):
+        return (exec, ("raise AssertionError('a cached value was unpickled')",))
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    # the commands RedisCache sends, answered from the server's dictionary
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            arguments = [self._read_bulk() for _ in range(int(line[1:]))]
+            self.wfile.write(self.server.reply(arguments))
+
+    def _read_bulk(self):
+        length = int(self.rfile.readline()[1:])
+        return self.rfile.read(length + 2)[:-2]
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeRedisHandler)
+        self.data = {}
+        self.commands = []
+
+    def reply(self, arguments) -> bytes:
+        command = arguments[0].upper()
+        self.commands.append(arguments)
+        if command == b"GET":
+            value = self.data.get(arguments[1])
+            return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+        if command == b"SET":
+            self.data[arguments[1]] = arguments[2]
+            return b"+OK\r\n"
+        if command == b"DEL":
+            deleted = sum(self.data.pop(key, None) is not None for key in arguments[1:])
+            return b":%d\r\n" % deleted
+        if command == b"SCAN":
+            keys = [key for key in self.data if fnmatch.fnmatchcase(key.decode(), arguments[3].decode())]
+            return b"*2\r\n$1\r\n0\r\n*%d\r\n" % len(keys) + b"".join(b"$%d\r\n%s\r\n" % (len(key), key) for key in keys)
+        if command in (b"AUTH", b"SELECT"):
+            return b"+OK\r\n"
+        return b"-ERR unknown command\r\n"
+
+
+@pytest.fixture
+def fake_redis():
+    server = FakeRedisServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_redis_cache(fake_redis):
+    host, port = fake_redis.server_address
+    cache = RedisCache(url=f"redis://:secret@{host}:{port}/2", ttl=60, namespace="v1")
+    assert cache.get(("a", 1)) is None
+    cache.set(("a", 1), VALUE)
+    assert cache.get(("a", 1)) == VALUE
+    assert [b"AUTH", b"secret"] in fake_redis.commands
+    assert [b"SELECT", b"2"] in fake_redis.commands
+    assert fake_redis.commands[-2][-2:] == [b"EX", b"60"]
+
+    # another namespace (eg another version of the server) shares the server but not the results
+    other_version = RedisCache(url=f"redis://{host}:{port}", namespace="v2")
+    assert other_version.get(("a", 1)) is None
+    other_version.set(("a", 1), VALUE)
+    cache.clear()
+    assert cache.get(("a", 1)) is None
+    assert other_version.get(("a", 1)) == VALUE
+    assert cache.stats() == {"hits": 0, "misses": 1, "errors": 0, "size": None, "maxsize": None}
+
+    # a value on the server which is not JSON is a miss, and is never run
+    for key in fake_redis.data:
+        fake_redis.data[key] = pickle.dumps(Planted())
+    assert other_version.get(("a", 1), "missing") == "missing"
+
+
+def test_unreachable_redis_is_a_miss(fake_redis):
+    host, port = fake_redis.server_address
+    fake_redis.shutdown()
+    fake_redis.server_close()
+
+    cache = RedisCache(url=f"redis://{host}:{port}", socket_timeout=0.1, retry_interval=60)
+    cache.set("a", VALUE)
+    assert cache.get("a", "missing") == "missing"
+    assert cache.stats()["errors"] == 2
+
+
+def test_sqlite_cache_is_shared(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteCache(path=path, namespace="v1")
+    cache.set(("a", 1), VALUE)
+    assert cache.get(("a", 1)) == VALUE
+    # as it would be from another process on the node
+    assert SQLiteCache(path=path, namespace="v1").get(("a", 1)) == VALUE
+    assert SQLiteCache(path=path, namespace="v2").get(("a", 1)) is None
+
+    cache.clear()
+    assert cache.get(("a", 1)) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_sqlite_cache_is_bounded(tmp_path):
+    cache = SQLiteCache(path=str(tmp_path / "cache.sqlite3"), maxsize=32)
+    for i in range(100):
+        cache.set(i, i)
+    assert cache.size() <= 32
+    assert cache.get(99) == 99
+    assert cache.get(0) is None
+
+
+def test_sqlite_cache_values_are_json(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteCache(path=path)
+    value = {"dates": [date(2020, 4, 12), datetime(2020, 4, 12, 10, 30)], "sds": -0.5, "band": None}
+    cache.set("a", value)
+    assert cache.get("a") == value
+
+    # a value written by anyone else which is not JSON is a miss, and is never run
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("UPDATE cache SET value = ?", (pickle.dumps(Planted()),))
+    assert cache.get("a", "missing") == "missing"
+    assert cache.stats()["errors"] == 1
+
+    # values which cannot be stored as JSON are not cached
+    cache.set("b", {1, 2})
+    assert cache.get("b") is None
+
+
+def test_cache_backend(tmp_path):
+    assert isinstance(cache_backend("memory", maxsize=10), LRUCache)
+    assert cache_backend("sqlite", location=str(tmp_path / "cache.sqlite3")).path == str(tmp_path / "cache.sqlite3")
+    with pytest.raises(ValueError):
+        # there is no default file: it could be created by anyone
+        cache_backend("sqlite")
+    assert cache_backend("redis", location="redis://cache:6380/1").port == 6380
+    with pytest.raises(ValueError):
+        cache_backend("memcached")
+    with pytest.raises(ValueError):
+        cache_backend("redis", location="http://cache:6380")
@@ -0,0 +1,38 @@
+import math
+
+import numpy as np
+import pytest
+
+from ..centile_bands import CENTILE_BAND_UPPER_SDS_LIMITS, NO_CENTILE_BAND_CODE, centile_band_code_for_centile, centile_band_codes_for_centiles, centile_band_for_centile, centile_bands_for_centiles
+
+
+@pytest.mark.parametrize("sds, measurement_method, centile_band", [
+    (-6.5, "height", "This height measurement is well below the normal range. Please review its accuracy."),
+    (-6, "height", "This height measurement is well below the normal range. Please review its accuracy."),
+    (-2.84, "weight", "This weight measurement is on or near the 0.4th centile."),
+    (-2.17, "weight", "This weight measurement is between the 0.4th and 2nd centiles."),
+    (-2.16, "weight", "This weight measurement is on or near the 2nd centile."),
+    (0, "bmi", "This body mass index measurement is on or near the 50th centile."),
+    (2.9, "ofc", "This head circumference measurement is above the normal range."),
+    (6.01, "ofc", "This head circumference measurement is well above the normal range. Please review its accuracy.")])
+def test_centile_band_for_centile(sds, measurement_method, centile_band):
+    assert centile_band_for_centile(sds=sds, measurement_method=measurement_method) == centile_band
+
+
+def test_centile_band_messages_are_shared():
+    assert centile_band_for_centile(sds=0.1, measurement_method="height") is centile_band_for_centile(sds=-0.1, measurement_method="height")
+
+
+def test_array_bands_match_scalar_bands():
+    sds = np.array(CENTILE_BAND_UPPER_SDS_LIMITS + [limit + 0.001 for limit in CENTILE_BAND_UPPER_SDS_LIMITS] + [-10, 10, math.nan])
+    measurement_methods = np.array(["height", "weight", "bmi", "ofc"] * (len(sds) // 4) + ["height"] * (len(sds) % 4), dtype=object)
+
+    codes = centile_band_codes_for_centiles(sds)
+    bands = centile_bands_for_centiles(sds=sds, measurement_methods=measurement_methods)
+
+    for index, value in enumerate(sds):
+        if math.isnan(value):
+            assert codes[index] == NO_CENTILE_BAND_CODE and bands[index] is None
+        else:
+            assert codes[index] == centile_band_code_for_centile(value)
+            assert bands[index] == centile_band_for_centile(sds=value, measurement_method=measurement_methods[index])
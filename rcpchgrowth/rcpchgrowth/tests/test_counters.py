@@ -0,0 +1,71 @@
+from datetime import date
+
+from ..batch_calculations import calculate_measurement_rows
+from ..chart_functions import create_uk_who_chart
+from ..constants import TRISOMY_21, UK_WHO, UK90_CHILD, UK90_PRETERM, UK_WHO_CHILD, UK_WHO_INFANT
+from ..counters import count, counter_value, counter_values, reset_counters
+from ..global_functions import fetch_lms, sds_for_measurement
+from ..measurement import Measurement
+from ..uk_who import uk_who_reference
+
+
+def test_count():
+    reset_counters()
+    count("things", ("a",))
+    count("things", ("a",), amount=2)
+    count("things", ("b",))
+    assert counter_values() == {"things": {("a",): 3, ("b",): 1}}
+    reset_counters()
+    assert counter_values() == {}
+
+
+def test_reference_lookups_are_counted():
+    reset_counters()
+    sds_for_measurement(reference=UK_WHO, age=4.0, measurement_method="height", observation_value=100, sex="female")
+    sds_for_measurement(reference=UK_WHO, age=4.0, measurement_method="height", observation_value=101, sex="female")
+    sds_for_measurement(reference=TRISOMY_21, age=4.0, measurement_method="weight", observation_value=15, sex="male")
+    assert counter_values()["reference_lookups"] == {(UK_WHO, "height"): 2, (TRISOMY_21, "weight"): 1}
+
+
+def test_interpolation_branches_and_uk_who_segments_are_counted():
+    reset_counters()
+    lms_array = [{"decimal_age": age, "L": 1.0, "M": 10.0 + age, "S": 0.1} for age in (0.0, 1.0, 2.0, 3.0, 4.0)]
+    fetch_lms(age=2.0, lms_value_array_for_measurement=lms_array)
+    fetch_lms(age=1.5, lms_value_array_for_measurement=lms_array)
+    fetch_lms(age=3.5, lms_value_array_for_measurement=lms_array)
+    assert counter_values()["lms_interpolations"] == {("exact",): 1, ("cubic",): 1, ("linear",): 1}
+
+    for age in (-0.1, 0.5, 3.0, 10.0, 11.0):
+        uk_who_reference(age=age)
+    assert counter_values()["uk_who_segments"] == {
+        (UK90_PRETERM,): 1, (UK_WHO_INFANT,): 1, (UK_WHO_CHILD,): 1, (UK90_CHILD,): 2}
+    assert counter_value("uk_who_segments", (UK90_CHILD,)) == 2
+    assert counter_value("uk_who_segments", ("unknown",)) == 0
+
+
+def test_chart_building_is_not_counted():
+    reset_counters()
+    create_uk_who_chart(measurement_method="height", sex="male")
+    assert counter_values() == {}
+    # counting resumes after the chart
+    sds_for_measurement(reference=UK_WHO, age=4.0, measurement_method="height", observation_value=100, sex="female")
+    assert counter_value("reference_lookups", (UK_WHO, "height")) == 1
+
+
+def test_batch_calculations_are_counted_as_single_calculations():
+    rows = [
+        {"birth_date": "2010-01-01", "observation_date": observation_date, "sex": "female", "measurement_method": "weight",
+         "observation_value": 15.0, "gestation_weeks": gestation_weeks}
+        for observation_date in ("2010-01-01", "2010-06-01", "2012-06-01", "2016-01-01") for gestation_weeks in (30, 40)]
+    reset_counters()
+    calculate_measurement_rows(rows=[dict(row) for row in rows], reference=UK_WHO)
+    batch_counts = counter_values()
+
+    reset_counters()
+    for row in rows:
+        Measurement(
+            sex=row["sex"], birth_date=date.fromisoformat(row["birth_date"]), observation_date=date.fromisoformat(row["observation_date"]),
+            measurement_method=row["measurement_method"], observation_value=row["observation_value"],
+            gestation_weeks=row["gestation_weeks"], gestation_days=0, reference=UK_WHO)
+    assert batch_counts == counter_values()
+    assert sum(batch_counts["uk_who_segments"].values()) == 2 * len(rows)
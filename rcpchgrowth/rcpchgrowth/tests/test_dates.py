@@ -1,6 +1,9 @@
 import unittest
-from datetime import date
-from ..date_calculations import chronological_decimal_age, corrected_decimal_age, estimated_date_delivery
+from datetime import date, timedelta
+import numpy as np
+import pytest
+from ..date_calculations import chronological_decimal_age, corrected_decimal_age, estimated_date_delivery, corrected_gestational_age
+from ..date_calculations import chronological_decimal_ages, corrected_decimal_ages, estimated_dates_delivery, corrected_gestational_ages, gestation_flags, parse_iso_date
 
 
 # TODO: #92 TestDecimalAge needs to be converted to use PyTest
@@ -66,5 +69,93 @@ class TestDecimalAge(unittest.TestCase):
         self.assertEqual(edd, date(2011, 3, 4))
 
 
+# array date calculations, against the single date functions
+
+BIRTH_DATE = date(2010, 12, 3)
+GESTATIONS = [(0, 0), (23, 0), (27, 0), (36, 6), (37, 0), (40, 0), (41, 6), (42, 1)]
+DAYS_OF_LIFE = [-1, 0, 17, 90, 100, 101, 300, 1000]
+
+
+def date_rows():
+    return [(BIRTH_DATE, BIRTH_DATE + timedelta(days=days), weeks, days_of_gestation)
+            for days in DAYS_OF_LIFE for weeks, days_of_gestation in GESTATIONS]
+
+
+def date_columns(rows):
+    return (np.array([row[0] for row in rows], dtype="datetime64[D]"),
+            np.array([row[1] for row in rows], dtype="datetime64[D]"),
+            np.array([row[2] for row in rows]),
+            np.array([row[3] for row in rows]))
+
+
+def test_decimal_ages_match_single_date_functions():
+    rows = date_rows()
+    birth_dates, observation_dates, gestation_weeks, gestation_days = date_columns(rows)
+
+    chronological_ages = chronological_decimal_ages(birth_dates, observation_dates)
+    corrected_ages = corrected_decimal_ages(birth_dates, observation_dates, gestation_weeks, gestation_days)
+    edds = estimated_dates_delivery(birth_dates, gestation_weeks, gestation_days)
+
+    for index, (birth_date, observation_date, weeks, days) in enumerate(rows):
+        assert chronological_ages[index] == chronological_decimal_age(birth_date, observation_date)
+        assert edds[index] == np.datetime64(estimated_date_delivery(birth_date, weeks, days))
+        if birth_date > observation_date:
+            assert np.isnan(corrected_ages[index])
+        else:
+            assert corrected_ages[index] == corrected_decimal_age(birth_date, observation_date, weeks, days)
+
+
+def test_corrected_gestational_ages_match_single_date_function():
+    rows = [row for row in date_rows() if row[2] > 0]
+    corrected_gestations = corrected_gestational_ages(*date_columns(rows))
+
+    for index, row in enumerate(rows):
+        expected = corrected_gestational_age(*row)
+        for key in ("corrected_gestation_weeks", "corrected_gestation_days"):
+            if expected[key] is None:
+                assert np.isnan(corrected_gestations[key][index])
+            else:
+                assert corrected_gestations[key][index] == expected[key]
+
+
+def test_missing_dates_are_nan():
+    birth_dates = np.array(["NaT", "2010-12-03"], dtype="datetime64[D]")
+    observation_dates = np.array(["2010-12-20", "NaT"], dtype="datetime64[D]")
+    assert np.isnan(chronological_decimal_ages(birth_dates, observation_dates)).all()
+    assert np.isnan(corrected_decimal_ages(birth_dates, observation_dates, [27, 27], [0, 0])).all()
+
+
+@pytest.mark.parametrize("gestation_weeks, gestation_days, born_preterm, born_term, age_corrected", [
+    (0, 0, False, True, False),
+    (22, 6, False, False, True),
+    (23, 0, True, False, True),
+    (36, 6, True, False, True),
+    (37, 0, False, True, True),
+    (40, 0, False, True, False),
+    (41, 6, False, True, True),
+    (42, 0, False, True, True),
+    (43, 2, False, True, True)])
+def test_gestation_flags(gestation_weeks, gestation_days, born_preterm, born_term, age_corrected):
+    flags = gestation_flags([gestation_weeks], [gestation_days])
+    assert flags["born_preterm"][0] == born_preterm
+    assert flags["born_term"][0] == born_term
+    assert flags["age_corrected"][0] == age_corrected
+
+
+@pytest.mark.parametrize("date_string, expected", [
+    ("2020-04-12", date(2020, 4, 12)),
+    ("2020-4-2", date(2020, 4, 2)),
+    ("2020-04-12T10:20:30", date(2020, 4, 12)),
+    ("2020-04-12T10:20:30.123+01:00", date(2020, 4, 12))])
+def test_parse_iso_date(date_string, expected):
+    assert parse_iso_date(date_string) == expected
+
+
+@pytest.mark.parametrize("date_string", ["2020-13-12", "2020-02-30", "20200412", "12/04/2020", ""])
+def test_parse_iso_date_rejects_invalid_dates(date_string):
+    with pytest.raises(ValueError):
+        parse_iso_date(date_string)
+
+
 if __name__ == '__main__':
     unittest.main()
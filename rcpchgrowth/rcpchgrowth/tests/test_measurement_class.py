@@ -4,6 +4,8 @@ from datetime import datetime
 
 import pytest
 from rcpchgrowth import Measurement, global_functions
+from rcpchgrowth.centile_bands import centile_band_code_for_centile
+from rcpchgrowth.chart_functions import create_plottable_child_data
 
 # the ACCURACY constant defines the accuracy of the test comparisons
 # owing to variations in statistical calculations it's impossible to get exact
@@ -83,3 +85,69 @@ def test_sds_calculation(line):
 #     )
 
     # Should raise a ValueError (sex must be "male" OR "female")
+
+
+@pytest.mark.parametrize("gestation_weeks, observation_date", [
+    (40, "2020-06-12"),
+    (27, "2020-06-12"),
+    (40, "2030-01-01"),
+    (40, "2019-01-01")])
+def test_compact_measurement_has_the_same_numbers_without_text(gestation_weeks, observation_date):
+    arguments = dict(
+        sex="female",
+        birth_date=datetime.strptime("2020-04-12", "%Y-%m-%d").date(),
+        observation_date=datetime.strptime(observation_date, "%Y-%m-%d").date(),
+        measurement_method="weight",
+        observation_value=5.0,
+        gestation_weeks=gestation_weeks,
+        gestation_days=3,
+        reference="uk-who")
+    measurement = Measurement(**arguments).measurement
+    compact = Measurement(compact=True, **arguments).measurement
+
+    assert "estimated_date_delivery_string" not in compact["birth_data"]
+    for key in ("comments", "chronological_calendar_age", "corrected_calendar_age"):
+        assert key not in compact["measurement_dates"]
+    for key in ("chronological_decimal_age", "corrected_decimal_age", "corrected_gestational_age"):
+        assert compact["measurement_dates"][key] == measurement["measurement_dates"][key]
+
+    calculated_values = measurement["measurement_calculated_values"]
+    compact_calculated_values = compact["measurement_calculated_values"]
+    for age_type in ("chronological", "corrected"):
+        for key in (f"{age_type}_sds", f"{age_type}_centile"):
+            assert compact_calculated_values[key] == calculated_values[key]
+        band = compact_calculated_values[f"{age_type}_centile_band"]
+        if calculated_values[f"{age_type}_sds"] is None:
+            assert band is None
+        else:
+            assert band == centile_band_code_for_centile(calculated_values[f"{age_type}_sds"])
+
+    for plottable_data in compact["plottable_data"].values():
+        for age_data in plottable_data.values():
+            assert not {"calendar_age", "lay_comment", "clinician_comment", "corrected_gestational_age"} & set(age_data)
+
+
+def test_compact_measurement_is_plottable():
+    arguments = dict(
+        sex="female",
+        birth_date=datetime.strptime("2020-04-12", "%Y-%m-%d").date(),
+        observation_date=datetime.strptime("2020-06-12", "%Y-%m-%d").date(),
+        measurement_method="weight",
+        observation_value=5.0,
+        gestation_weeks=27,
+        gestation_days=3,
+        reference="uk-who")
+    # as posted back to /plottable-child-data, after a round trip through JSON
+    results = [json.loads(json.dumps(Measurement(**arguments, compact=True).measurement, default=str))]
+    full_results = [json.loads(json.dumps(Measurement(**arguments).measurement, default=str))]
+
+    plottable = create_plottable_child_data(results)
+    full_plottable = create_plottable_child_data(full_results)
+
+    for data in ("centile_data", "sds_data"):
+        for data_point, full_data_point in zip(plottable[data][0], full_plottable[data][0]):
+            assert "calendar_age" not in data_point
+            assert not [key for key in data_point if key.endswith("comment")]
+            assert data_point["x"] == full_data_point["x"]
+            assert data_point["y"] == full_data_point["y"]
+            assert data_point["corrected_gestation_weeks"] == full_data_point["corrected_gestation_weeks"]
@@ -0,0 +1,33 @@
+from datetime import date
+
+import pytest
+from rcpchgrowth import Measurement
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("rcpchgrowth.pandas_accessor")
+
+
+def test_accessor_matches_measurement_class():
+    data_frame = pd.DataFrame({
+        "birth_date": ["2010-12-03", "2009-01-03", "2009-01-03"],
+        "observation_date": ["2010-12-20T10:00:00", "2013-11-20", None],
+        "sex": ["female", "male", "male"],
+        "measurement_method": ["weight", "height", "height"],
+        "observation_value": [1.2, 105.0, 105.0],
+        "gestation_weeks": [27, None, None]})
+
+    results = data_frame.rcpch.sds(reference="uk-who")
+
+    for index, (birth_date, observation_date, sex, measurement_method, observation_value, gestation_weeks) in enumerate([
+            (date(2010, 12, 3), date(2010, 12, 20), "female", "weight", 1.2, 27),
+            (date(2009, 1, 3), date(2013, 11, 20), "male", "height", 105.0, 0)]):
+        measurement = Measurement(sex=sex, birth_date=birth_date, observation_date=observation_date, measurement_method=measurement_method,
+                                  observation_value=observation_value, reference="uk-who", gestation_weeks=gestation_weeks).measurement
+        calculated_values = measurement["measurement_calculated_values"]
+        assert results["corrected_decimal_age"][index] == pytest.approx(measurement["measurement_dates"]["corrected_decimal_age"])
+        assert results["chronological_sds"][index] == pytest.approx(calculated_values["chronological_sds"])
+        assert results["corrected_centile_band"][index] == calculated_values["corrected_centile_band"]
+
+    assert pd.isna(results["corrected_sds"][2]) and pd.isna(results["corrected_centile_band"][2])
+    assert list(data_frame.columns) == list(results.columns[:len(data_frame.columns)])
+    assert "corrected_sds" not in data_frame
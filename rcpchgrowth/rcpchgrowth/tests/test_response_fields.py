@@ -0,0 +1,97 @@
+from datetime import date
+
+import pytest
+
+from ..chart_functions import create_plottable_child_data
+from ..measurement import Measurement
+from ..response_fields import MEASUREMENT_FIELDS, PLOTTABLE_CHILD_DATA_FIELDS, field_requested, parse_fields, select_fields, sub_fields
+
+
+def test_parse_fields():
+    assert parse_fields("a.b, a.c,d") == {"a": {"b": None, "c": None}, "d": None}
+    assert parse_fields(["a.b", "a"]) == {"a": None}
+    assert parse_fields("a,a.b") == {"a": None}
+    assert parse_fields(None) is None
+
+
+@pytest.mark.parametrize("fields", ["", " , ", "a..b", ".a"])
+def test_parse_fields_rejects_malformed_fields(fields):
+    with pytest.raises(ValueError):
+        parse_fields(fields)
+
+
+def test_field_requested():
+    fields = parse_fields("a.b.c,d")
+    assert field_requested(fields, "a")
+    assert field_requested(fields, "a.b.c")
+    assert field_requested(fields, "d.e")
+    assert not field_requested(fields, "a.x")
+    assert not field_requested(fields, "e")
+    assert field_requested(None, "e")
+    assert sub_fields(fields, "a") == {"b": {"c": None}}
+    assert sub_fields(fields, "d") is None
+
+
+def test_select_fields():
+    result = {"a": {"b": 1, "c": 2}, "d": [{"e": 3, "f": 4}], "g": 5}
+    assert select_fields(result, parse_fields("d.e,a.c,x")) == {"a": {"c": 2}, "d": [{"e": 3}]}
+    assert select_fields(result, None) is result
+
+
+def test_measurement_fields():
+    arguments = dict(
+        sex="male",
+        birth_date=date(2020, 4, 12),
+        observation_date=date(2020, 6, 12),
+        measurement_method="height",
+        observation_value=60,
+        reference="uk-who",
+        gestation_weeks=30)
+    measurement = Measurement(**arguments).measurement
+
+    selected = Measurement(fields="measurement_calculated_values.corrected_sds,measurement_dates.corrected_decimal_age", **arguments)
+    assert selected.measurement == {
+        "measurement_dates": {"corrected_decimal_age": measurement["measurement_dates"]["corrected_decimal_age"]},
+        "measurement_calculated_values": {"corrected_sds": measurement["measurement_calculated_values"]["corrected_sds"]}}
+    # the text and plottable data are not created
+    assert selected.chronological_calendar_age is None and selected.estimated_date_delivery_string is None
+    assert not hasattr(selected, "plottable_centile_data")
+
+    assert Measurement(fields="measurement_dates", **arguments).measurement == {"measurement_dates": measurement["measurement_dates"]}
+    assert Measurement(fields="plottable_data", **arguments).measurement == {"plottable_data": measurement["plottable_data"]}
+
+
+@pytest.mark.parametrize("fields", ["a.x", "x", "d.x", "a.c.x"])
+def test_parse_fields_rejects_unknown_fields(fields):
+    with pytest.raises(ValueError, match=f"Unknown field: '{fields}'"):
+        parse_fields(f"a.b,{fields}", {"a": {"b": None, "c": None}, "d": None})
+
+
+def _key_tree(result):
+    # the fields of a result: the keys of its dicts, and of the items of its lists
+    if isinstance(result, list):
+        tree = {}
+        for item in result:
+            tree.update(_key_tree(item) or {})
+        return tree or None
+    if isinstance(result, dict):
+        return {key: _key_tree(value) for key, value in result.items()}
+    return None
+
+
+def test_known_fields_are_the_fields_of_the_results():
+    measurement = Measurement(
+        sex="male", birth_date=date(2020, 4, 12), observation_date=date(2020, 6, 12), measurement_method="height",
+        observation_value=60, reference="uk-who", gestation_weeks=30).measurement
+
+    assert _key_tree(measurement) == MEASUREMENT_FIELDS
+    assert _key_tree(create_plottable_child_data([measurement])) == PLOTTABLE_CHILD_DATA_FIELDS
+
+
+def test_unknown_measurement_and_plottable_child_data_fields_are_rejected():
+    with pytest.raises(ValueError, match="Unknown field: 'measurement_calculated_values.corected_sds'"):
+        Measurement(
+            sex="male", birth_date=date(2020, 4, 12), observation_date=date(2020, 6, 12), measurement_method="height",
+            observation_value=60, reference="uk-who", fields="measurement_calculated_values.corected_sds")
+    with pytest.raises(ValueError, match="Unknown field: 'centile_data.z'"):
+        create_plottable_child_data([], fields="centile_data.x,centile_data.z")
@@ -0,0 +1,90 @@
+from datetime import date
+from threading import Thread
+
+import pytest
+
+from ..constants import TURNERS, UK_WHO
+from ..measurement import Measurement
+from ..cache_backends import LRUCache
+from ..result_cache import calculate_measurement, measurement_key
+
+MEASUREMENT = {
+    "sex": "female",
+    "birth_date": date(2020, 4, 12),
+    "observation_date": date(2024, 6, 12),
+    "measurement_method": "height",
+    "observation_value": 100,
+    "gestation_weeks": 40,
+    "gestation_days": 0
+}
+
+
+def test_lru_cache_discards_the_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {"hits": 3, "misses": 1, "errors": 0, "size": 2, "maxsize": 2}
+
+    cache.resize(1)
+    assert len(cache) == 1
+    assert cache.get("c") == 3
+
+
+def test_lru_cache_of_size_zero_stores_nothing():
+    cache = LRUCache(maxsize=0)
+    cache.set("a", 1)
+    assert cache.get("a", "missing") == "missing"
+    assert len(cache) == 0
+
+
+def test_lru_cache_is_thread_safe():
+    cache = LRUCache(maxsize=50)
+
+    def use_cache(offset):
+        for i in range(1000):
+            cache.set((offset + i) % 100, i)
+            cache.get((offset + i + 1) % 100)
+
+    threads = [Thread(target=use_cache, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == 8000
+    assert stats["size"] == 50
+
+
+def test_calculate_measurement_is_cached():
+    cache = LRUCache()
+    result = calculate_measurement(reference=UK_WHO, cache=cache, **MEASUREMENT)
+    assert result == Measurement(reference=UK_WHO, **MEASUREMENT).measurement
+    assert calculate_measurement(reference=UK_WHO, cache=cache, **MEASUREMENT) is result
+    assert cache.stats()["hits"] == 1
+
+    # any change of input is a different calculation
+    assert calculate_measurement(reference=TURNERS, cache=cache, **MEASUREMENT) is not result
+    assert calculate_measurement(reference=UK_WHO, compact=True, cache=cache, **MEASUREMENT) is not result
+    assert calculate_measurement(reference=UK_WHO, fields="plottable_data", cache=cache, **MEASUREMENT) is not result
+    assert cache.stats() == {"hits": 1, "misses": 4, "errors": 0, "size": 4, "maxsize": cache.maxsize}
+
+
+def test_calculate_measurement_errors_are_not_cached():
+    cache = LRUCache()
+    with pytest.raises(ValueError):
+        calculate_measurement(reference=UK_WHO, cache=cache, **dict(MEASUREMENT, observation_value=-1))
+    assert len(cache) == 0
+
+
+def test_measurement_key():
+    assert measurement_key(reference=UK_WHO, fields="a,b", **MEASUREMENT) == measurement_key(reference=UK_WHO, fields="a,b", **MEASUREMENT)
+    assert measurement_key(reference=UK_WHO, fields={"a": {"b": None}, "c": None}, **MEASUREMENT) == \
+        measurement_key(reference=UK_WHO, fields={"c": None, "a": {"b": None}}, **MEASUREMENT)
+    # the result repeats the observation_value as it was given
+    assert measurement_key(reference=UK_WHO, **MEASUREMENT) != measurement_key(reference=UK_WHO, **dict(MEASUREMENT, observation_value=100.0))
@@ -0,0 +1,39 @@
+from datetime import date
+
+from ..constants import UK_WHO
+from ..measurement import Measurement
+from ..stage_timing import stage, stage_timings, start_stage_timing, stop_stage_timing, timed_stage
+
+
+def test_stages_are_not_timed_unless_started():
+    with stage("a"):
+        pass
+    assert stage_timings() is None
+
+
+def test_nested_stages_do_not_overlap():
+    @timed_stage("inner")
+    def inner():
+        return 1
+
+    token = start_stage_timing()
+    with stage("outer"):
+        assert inner() == 1
+        assert inner() == 1
+    timings = stop_stage_timing(token)
+    assert set(timings) == {"outer", "inner"}
+    assert stage_timings() is None
+
+
+def test_measurement_stages():
+    token = start_stage_timing()
+    Measurement(
+        reference=UK_WHO,
+        sex="female",
+        birth_date=date(2020, 4, 12),
+        observation_date=date(2024, 6, 12),
+        measurement_method="height",
+        observation_value=100)
+    timings = stop_stage_timing(token)
+    assert {"ages", "reference", "lms", "centile", "plottable"} <= set(timings)
+    assert all(seconds >= 0 for seconds in timings.values())
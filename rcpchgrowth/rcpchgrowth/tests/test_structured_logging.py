@@ -0,0 +1,40 @@
+import io
+import json
+import logging
+
+from ..structured_logging import RepeatedMessageSampler, configure_logging
+
+
+def test_json_lines_with_extra_fields():
+    stream = io.StringIO()
+    handler = configure_logging(level="INFO", stream=stream)
+    try:
+        logging.getLogger("rcpchgrowth.test").info("calculated %s rows", 3, extra={"reference": "uk-who"})
+        logging.getLogger("rcpchgrowth.test").debug("not logged")
+    finally:
+        logging.getLogger().removeHandler(handler)
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    entry = json.loads(lines[0])
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "rcpchgrowth.test"
+    assert entry["message"] == "calculated 3 rows"
+    assert entry["reference"] == "uk-who"
+
+
+def test_repeated_messages_are_sampled():
+    sampler = RepeatedMessageSampler(burst=2, interval=60)
+
+    def record(message, argument):
+        return logging.LogRecord("rcpchgrowth.test", logging.WARNING, __file__, 1, message, (argument,), None)
+
+    passed = [sampler.filter(record("no LMS for age %s", age)) for age in range(5)]
+    assert passed == [True, True, False, False, False]
+    # another message is counted separately
+    assert sampler.filter(record("no reference %s", "x"))
+
+    sampler.interval = 0
+    next_interval = record("no LMS for age %s", 6)
+    assert sampler.filter(next_interval)
+    assert next_interval.suppressed == 3
@@ -0,0 +1,58 @@
+from datetime import date
+
+import pytest
+from marshmallow import ValidationError
+
+from ..validation import observation_value_error, validate_calculation_request
+
+VALID_REQUEST = {
+    "birth_date": "2020-04-12T10:00:00.000Z",
+    "observation_date": "2020-06-12",
+    "observation_value": "60",
+    "measurement_method": "height",
+    "sex": "male",
+    "gestation_weeks": 40,
+    "gestation_days": 4
+}
+
+
+def test_valid_request_is_parsed():
+    assert validate_calculation_request(VALID_REQUEST) == {
+        "birth_date": date(2020, 4, 12),
+        "observation_date": date(2020, 6, 12),
+        "observation_value": 60.0,
+        "measurement_method": "height",
+        "sex": "male",
+        "gestation_weeks": 40.0,
+        "gestation_days": 4.0
+    }
+
+
+@pytest.mark.parametrize("changes, messages", [
+    ({"birth_date": "2020-13-12"}, {"birth_date": ["Not a valid date."]}),
+    ({"observation_date": None}, {"observation_date": ["Field may not be null."]}),
+    ({"sex": "Male", "measurement_method": 1}, {"sex": ["Must be one of: male, female."], "measurement_method": ["Not a valid string."]}),
+    ({"gestation_weeks": 21}, {"gestation_weeks": ["Must be greater than or equal to 22 and less than or equal to 44."]}),
+    ({"observation_value": float("nan")}, {"observation_value": ["Special numeric values (nan or infinity) are not permitted."]}),
+    ({"gestation_days": "four"}, {"gestation_days": ["Not a valid number."]})])
+def test_invalid_request_messages(changes, messages):
+    with pytest.raises(ValidationError) as error:
+        validate_calculation_request({**VALID_REQUEST, **changes})
+    assert error.value.messages == messages
+
+
+def test_missing_fields():
+    with pytest.raises(ValidationError) as error:
+        validate_calculation_request({"gestation_weeks": 40})
+    assert set(error.value.messages) == {"birth_date", "observation_date", "observation_value", "measurement_method", "sex"}
+
+
+@pytest.mark.parametrize("measurement_method, observation_value, message", [
+    ("height", 1.5, "Height/length must be passed in cm, not metres"),
+    ("height", 301, "The height/length you have entered is very high and likely to be an error. Are you sure you meant a height of 301 centimetres?"),
+    ("weight", 3500, "3500 kilograms is very high. Weight must be passed in kilograms."),
+    ("ofc", None, "Missing observation_value for head circumference. Please pass a head circumference in centimetres."),
+    ("bmi", 200, None),
+    ("weight", 3.5, None)])
+def test_observation_value_error(measurement_method, observation_value, message):
+    assert observation_value_error(measurement_method=measurement_method, observation_value=observation_value) == message
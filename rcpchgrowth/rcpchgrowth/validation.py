@@ -0,0 +1,183 @@
+import math
+from operator import gt, lt
+
+from marshmallow import ValidationError
+
+from .date_calculations import parse_iso_date
+from .stage_timing import timed_stage
+from .constants import *
+
+"""
+Validation of calculation requests, shared by the API endpoints (single and bulk), the batch calculations and the Measurement class.
+The checks are built once, at import, rather than instantiating a marshmallow Schema for every request,
+and return the same error messages as the CalculationRequestParameters schema.
+ - validate_calculation_request: returns the parsed values of a calculation request, or raises ValidationError with the messages for each field
+ - validate_calculation_field: returns the parsed value of a single field of a calculation request, or raises ValueError with its message
+ - observation_value_error: returns the error message for an implausible observation_value, or None
+"""
+
+REQUIRED_MESSAGE = "Missing data for required field."
+NULL_MESSAGE = "Field may not be null."
+INVALID_INPUT_MESSAGE = "Invalid input type."
+
+# public functions
+
+
+@timed_stage("validation")
+def validate_calculation_request(values) -> dict:
+    """
+    Validates a calculation request, as CalculationRequestParameters().load(values) would.
+    Returns the parsed values: dates as dates and numbers as floats, for the fields present.
+    Raises a marshmallow ValidationError, whose messages are keyed by field, if any field is invalid.
+    """
+    if not isinstance(values, dict):
+        raise ValidationError({"_schema": [INVALID_INPUT_MESSAGE]})
+
+    validated_values = {}
+    errors = {}
+    for field_name, required, deserialize, validate in CALCULATION_REQUEST_FIELDS:
+        if field_name not in values:
+            if required:
+                errors[field_name] = [REQUIRED_MESSAGE]
+            continue
+        value = values[field_name]
+        if value is None:
+            errors[field_name] = [NULL_MESSAGE]
+            continue
+        try:
+            value = deserialize(value)
+            if validate is not None:
+                validate(value)
+        except ValueError as error:
+            errors[field_name] = [f"{error}"]
+            continue
+        validated_values[field_name] = value
+
+    if errors:
+        raise ValidationError(errors)
+    return validated_values
+
+
+def validate_calculation_field(field_name: str, value):
+    """
+    Returns the parsed value of one (present, not null) field of a calculation request, as validate_calculation_request would.
+    Raises a ValueError with the message validate_calculation_request would give for the field if it is invalid.
+    """
+    deserialize, validate = CALCULATION_REQUEST_FIELD_CHECKS[field_name]
+    value = deserialize(value)
+    if validate is not None:
+        validate(value)
+    return value
+
+
+def observation_value_error(measurement_method: str, observation_value: float):
+    """
+    Returns the reason an observation_value is implausible for its measurement_method
+    (outside the validation_constants limits, or missing), or None if it is plausible.
+    """
+    if observation_value is None:
+        return MISSING_OBSERVATION_VALUE_MESSAGES.get(measurement_method)
+    for outside, limit, message in OBSERVATION_VALUE_LIMITS.get(measurement_method, ()):
+        if outside(observation_value, limit):
+            return message.format(observation_value=observation_value)
+    return None
+
+
+"""
+private functions
+"""
+
+
+def _string(value) -> str:
+    if isinstance(value, bytes):
+        try:
+            return value.decode("utf-8")
+        except UnicodeDecodeError:
+            raise ValueError("Not a valid utf-8 string.")
+    if not isinstance(value, str):
+        raise ValueError("Not a valid string.")
+    return value
+
+
+def _number(value) -> float:
+    if value is True or value is False:
+        raise ValueError("Not a valid number.")
+    try:
+        return float(value)
+    except OverflowError:
+        raise ValueError("Number too large.")
+    except (TypeError, ValueError):
+        raise ValueError("Not a valid number.")
+
+
+def _finite_number(value) -> float:
+    number = _number(value)
+    if math.isnan(number) or math.isinf(number):
+        raise ValueError("Special numeric values (nan or infinity) are not permitted.")
+    return number
+
+
+def _date(value):
+    if not isinstance(value, str):
+        raise ValueError("Not a valid date.")
+    try:
+        return parse_iso_date(value)
+    except ValueError:
+        raise ValueError("Not a valid date.")
+
+
+def _one_of(choices: list):
+    message = f"Must be one of: {', '.join(choices)}."
+    choices = frozenset(choices)
+
+    def validate(value):
+        if value not in choices:
+            raise ValueError(message)
+    return validate
+
+
+def _range(minimum: float, maximum: float):
+    message = f"Must be greater than or equal to {minimum} and less than or equal to {maximum}."
+
+    def validate(value):
+        if value < minimum or value > maximum:
+            raise ValueError(message)
+    return validate
+
+
+# (field name, required, deserialize, validate), in the order of the CalculationRequestParameters schema
+CALCULATION_REQUEST_FIELDS = (
+    ("birth_date", True, _date, None),
+    ("gestation_days", False, _number, None),
+    ("gestation_weeks", False, _number, _range(MINIMUM_GESTATION_WEEKS, MAXIMUM_GESTATION_WEEKS)),
+    ("measurement_method", True, _string, _one_of(["height", "weight", "bmi", "ofc"])),
+    ("observation_date", True, _date, None),
+    ("observation_value", True, _finite_number, None),
+    ("sex", True, _string, _one_of(["male", "female"]))
+)
+CALCULATION_REQUEST_FIELD_NAMES = [field[0] for field in CALCULATION_REQUEST_FIELDS]
+CALCULATION_REQUEST_FIELD_CHECKS = {field_name: (deserialize, validate) for field_name, _, deserialize, validate in CALCULATION_REQUEST_FIELDS}
+
+MISSING_OBSERVATION_VALUE_MESSAGES = {
+    "bmi": "Missing observation_value for Body Mass Index. Please pass a Body Mass Index in kilograms per metre squared (kg/m2)",
+    "height": "Missing observation_value for height/length. Please pass a height/length in cm.",
+    "weight": "Missing observation_value for weight. Please pass a weight in kilograms.",
+    "ofc": "Missing observation_value for head circumference. Please pass a head circumference in centimetres."
+}
+
+# (comparison, limit, message), checked in order: lt for a minimum, gt for a maximum
+OBSERVATION_VALUE_LIMITS = {
+    "height": (
+        # most likely metres passed instead of cm.
+        (lt, 2, "Height/length must be passed in cm, not metres"),
+        # a baby is unlikely to be < 30 cm long - probably a data entry error
+        (lt, MINIMUM_LENGTH_CM, "The height/length you have entered is very low and likely to be an error. Are you sure you meant a height of {observation_value} centimetres?"),
+        (gt, MAXIMUM_HEIGHT_CM, "The height/length you have entered is very high and likely to be an error. Are you sure you meant a height of {observation_value} centimetres?")),
+    "weight": (
+        (lt, MINIMUM_WEIGHT_KG, "Error. {observation_value} kilograms is very low. Please pass an accurate weight in kilograms"),
+        # it is likely the weight is passed in grams, not kg.
+        (gt, MAXIMUM_WEIGHT_KG, "{observation_value} kilograms is very high. Weight must be passed in kilograms.")),
+    "ofc": (
+        (lt, MINIMUM_OFC_CM, "Please check this value: {observation_value}. A head circumference less than 5 centimetres is likely an error. Please pass an accurate head circumference in centimetres."),
+        (gt, MAXIMUM_OFC_CM, "Please check this value: {observation_value}. A head circumference > 150 centimetres is likely an error. Please pass an accurate head circumference in cm."))
+}
@@ -0,0 +1,66 @@
+import time
+from datetime import date
+
+from .batch_calculations import build_reference_arrays
+from .chart_functions import create_chart
+from .counters import uncounted
+from .measurement import Measurement
+from .constants import *
+
+"""
+Warm-up for servers: everything that would otherwise be built by the first requests is built at once,
+so that it is built before a server forks its workers (eg gunicorn --preload) and shared by all of them.
+The reference tables themselves are loaded when rcpchgrowth is imported.
+ - warm_up: builds the reference arrays of the batch calculations and the charts, and runs a calculation for each reference
+"""
+
+
+@uncounted
+def warm_up(centile_selections: tuple = (COLE_TWO_THIRDS_SDS_NINE_CENTILES,)) -> dict:
+    """
+    Builds everything a first request would: the reference arrays of the batch calculations, the cached charts
+    for each reference, centile selection, measurement_method and sex, and the code paths of the Measurement class.
+    Returns the number of reference arrays and charts built, and how long it took in seconds.
+    Nothing it does is counted (see counters).
+    """
+    start = time.perf_counter()
+
+    reference_arrays = build_reference_arrays()
+
+    charts = 0
+    for reference in REFERENCES:
+        for centile_selection in centile_selections:
+            for measurement_method, sex in _chart_measurement_methods_and_sexes(reference):
+                try:
+                    create_chart(reference, centile_selection, measurement_method, sex)
+                except Exception:
+                    # not every reference has a chart for every measurement_method and sex
+                    continue
+                charts += 1
+
+    for reference in REFERENCES:
+        Measurement(
+            sex="female",
+            birth_date=date(2020, 4, 12),
+            observation_date=date(2024, 6, 12),
+            measurement_method="height",
+            observation_value=100,
+            reference=reference)
+
+    return {
+        "reference_arrays": reference_arrays,
+        "charts": charts,
+        "seconds": time.perf_counter() - start
+    }
+
+
+"""
+private functions
+"""
+
+
+def _chart_measurement_methods_and_sexes(reference: str) -> list:
+    if reference == TURNERS:
+        # there is only one Turner's chart
+        return [("height", "female")]
+    return [(measurement_method, sex) for measurement_method in MEASUREMENT_METHODS for sex in SEXES]
@@ -44,21 +44,22 @@ setup(
     package_dir={'': 'rcpchgrowth'},  # Optional
     packages=find_packages(where='rcpchgrowth'),  # Required
     python_requires='>=3.5, <4',
-    install_requires=['Flask', 'Numpy', 'SciPy'],  # Optional
+    install_requires=['Flask', 'Numpy', 'SciPy', 'marshmallow'],  # Optional
     extras_require={  # Optional
         'dev': ['check-manifest'],
         'test': ['coverage'],
+        'arrow': ['pyarrow'],
     },
     include_package_data=True,
     # package_data={  # Optional
     #     'sample': ['package_data.dat'],
     # },
     # data_files=[('my_data', ['data/data_file'])],  # Optional
-    # entry_points={  # Optional
-    #     'console_scripts': [
-    #         'sample=sample:main',
-    #     ],
-    # },
+    entry_points={  # Optional
+        'console_scripts': [
+            'rcpchgrowth=rcpchgrowth.cli:main',
+        ],
+    },
     project_urls={  # Optional
         'Bug Reports': 'https://github.com/rcpch/digital-growth-charts/issues',
         'API management': 'https://dev.rcpch.ac.uk',
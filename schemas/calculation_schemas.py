@@ -2,6 +2,7 @@
 from marshmallow import Schema, fields, validate
 
 # rcpch imports
+from .custom_fields import IsoDate
 from .measurement_schemas import MeasurementResponseSchema
 from rcpchgrowth.rcpchgrowth.constants.validation_constants import MINIMUM_GESTATION_WEEKS, MAXIMUM_GESTATION_WEEKS
 
@@ -11,7 +12,7 @@ class CalculationRequestParameters(Schema):
     Defines the schema that the API expects to receive. This is compiled into the openAPI spec, and used for data validation
     """
 
-    birth_date = fields.Date(
+    birth_date = IsoDate(
         required=True,
         description="Date of birth of the patient in `YYYY-MM-DD` format. Other formats such as the FHIR/ISO YYYY-MM-DDTHH:MM:SS and those that include milliseconds and timezones will be accepted but everything after the T will be discarded in processing. Time of day and time zone are not taken into account by the centile/SDS calculation")
     gestation_days = fields.Number(
@@ -25,7 +26,7 @@ class CalculationRequestParameters(Schema):
         enum=["height", "weight", "bmi", "ofc"],
         validate=validate.OneOf(["height", "weight", "bmi", "ofc"]),
         description="The type of measurement performed on the infant or child (`height`, `weight`, `bmi` or `ofc`). The value of this measurement is supplied as the `observation_value` parameter. The measurements represent height **in centimetres**, weight *in kilograms**, body mass index **in kilograms/metre²** and occipitofrontal circumference (head circumference, OFC) **in centimetres**.")
-    observation_date = fields.Date(
+    observation_date = IsoDate(
         required=True,
         description="The date that the measurement was taken, in `YYYY-MM-DD` format.  Other formats such as the FHIR/ISO YYYY-MM-DDTHH:MM:SS and those that include milliseconds and timezones will be accepted but everything after the T will be discarded in processing. Time of day and time zone are not taken into account by the centile/SDS calculation")
     observation_value = fields.Float(
@@ -0,0 +1,20 @@
+# third-party imports
+from marshmallow import fields
+
+# rcpch imports
+from rcpchgrowth.rcpchgrowth.date_calculations import parse_iso_date
+
+
+class IsoDate(fields.Date):
+    """
+    A Date field which accepts YYYY-MM-DD and FHIR/ISO date times, discarding everything after the T.
+    Each date is parsed once, by the shared parse_iso_date, and the loaded value is a date.
+    """
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        if not isinstance(value, str):
+            raise self.make_error("invalid", input=value, obj_type=self.OBJ_TYPE)
+        try:
+            return parse_iso_date(value)
+        except ValueError as error:
+            raise self.make_error("invalid", input=value, obj_type=self.OBJ_TYPE) from error
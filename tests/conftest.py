@@ -0,0 +1,17 @@
+"""
+Fixtures for the tests of the API server. Run them from the root of the repository: `python -m pytest tests`
+"""
+import pytest
+
+from app import create_app
+
+
+@pytest.fixture
+def app():
+    # the reference arrays and charts are built by the first requests which need them, not up front
+    return create_app(warm_up_caches=False)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
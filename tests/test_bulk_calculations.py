@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+
+import pytest
+
+CALCULATION = {
+    "birth_date": "2020-04-12",
+    "observation_date": "2021-06-12",
+    "observation_value": 75,
+    "measurement_method": "height",
+    "sex": "male",
+    "gestation_weeks": 40,
+    "gestation_days": 0
+}
+
+REFERENCE_PATHS = ["/uk-who", "/trisomy-21", "/turner"]
+
+
+def ndjson(*records) -> str:
+    return "".join((record if isinstance(record, str) else json.dumps(record)) + "\n" for record in records)
+
+
+def output_lines(response) -> list:
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def output_rows(response) -> list:
+    return list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+
+@pytest.mark.parametrize("reference_path", REFERENCE_PATHS)
+def test_one_output_line_per_input_line_in_order(client, reference_path):
+    records = [dict(CALCULATION, sex="female", observation_value=70 + index) for index in range(5)]
+
+    response = client.post(f"{reference_path}/bulk-calculation", data=ndjson(*records), content_type="application/x-ndjson")
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = output_lines(response)
+    assert [line["child_observation_value"]["observation_value"] for line in lines] == [70, 71, 72, 73, 74]
+    # the same results as the single calculation endpoint
+    single = client.post(f"{reference_path}/calculation", json=records[2]).get_json()
+    assert lines[2] == single
+
+
+def test_bad_json_and_invalid_records_are_reported_inline(client):
+    body = ndjson(CALCULATION, "{not json", dict(CALCULATION, sex="unknown"), "[1, 2]", CALCULATION)
+    # blank lines produce no output, but are still counted in the line numbers
+    body = body.replace("{not json\n", "{not json\n\n")
+
+    response = client.post("/uk-who/bulk-calculation", data=body, content_type="application/x-ndjson")
+
+    assert response.status_code == 200
+    lines = output_lines(response)
+    assert len(lines) == 5
+    assert "measurement_calculated_values" in lines[0]
+    assert "measurement_calculated_values" in lines[4]
+    assert lines[1]["line"] == 2
+    assert lines[1]["errors"]["_schema"][0].startswith("Invalid JSON")
+    assert lines[2] == {"line": 4, "errors": {"sex": ["Must be one of: male, female."]}}
+    assert lines[3] == {"line": 5, "errors": {"_schema": ["Invalid input type."]}}
+
+
+@pytest.mark.parametrize("path", ["/uk-who/bulk-calculation", "/uk-who/bulk-calculation-csv"])
+def test_wrong_mimetype_is_rejected(client, path):
+    response = client.post(path, json=CALCULATION)
+
+    assert response.status_code == 400
+    assert "mimetype" in response.get_data(as_text=True)
+
+
+def test_bulk_compact_and_fields(client):
+    body = ndjson(CALCULATION)
+
+    compact = output_lines(client.post("/uk-who/bulk-calculation?compact=true", data=body, content_type="application/x-ndjson"))[0]
+    assert "comments" not in compact["measurement_dates"]
+    assert isinstance(compact["measurement_calculated_values"]["corrected_centile_band"], int)
+
+    selected = output_lines(client.post(
+        "/uk-who/bulk-calculation?fields=measurement_calculated_values.corrected_sds", data=body, content_type="application/x-ndjson"))[0]
+    full = output_lines(client.post("/uk-who/bulk-calculation", data=body, content_type="application/x-ndjson"))[0]
+    assert selected == {"measurement_calculated_values": {"corrected_sds": full["measurement_calculated_values"]["corrected_sds"]}}
+
+
+def test_bulk_malformed_fields_are_rejected(client):
+    response = client.post("/uk-who/bulk-calculation?fields=measurement_calculated_values.", data=ndjson(CALCULATION),
+                           content_type="application/x-ndjson")
+
+    assert response.status_code == 422
+
+
+def test_csv_results_are_appended_in_order(client):
+    body = ("id,birth_date,observation_date,sex,measurement_method,observation_value\n"
+            "a,2020-04-12,2021-06-12,male,height,75\n"
+            "b,2020-04-12,2021-06-12,unknown,height,75\n"
+            "c,2020-04-12,2021-06-12,female,weight,9\n")
+
+    response = client.post("/uk-who/bulk-calculation-csv", data=body, content_type="text/csv")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    rows = output_rows(response)
+    assert list(rows[0])[:6] == ["id", "birth_date", "observation_date", "sex", "measurement_method", "observation_value"]
+    assert list(rows[0])[-1] == "error"
+    assert [row["id"] for row in rows] == ["a", "b", "c"]
+    single = client.post("/uk-who/calculation", json=CALCULATION).get_json()
+    assert float(rows[0]["corrected_sds"]) == pytest.approx(single["measurement_calculated_values"]["corrected_sds"])
+    assert rows[1]["corrected_sds"] == ""
+    assert rows[1]["error"] == "sex: Must be one of: male, female."
+    assert rows[2]["error"] == ""
+
+
+def test_csv_compact_band_codes(client):
+    body = "birth_date,observation_date,sex,measurement_method,observation_value\n2020-04-12,2021-06-12,male,height,75\n"
+
+    rows = output_rows(client.post("/uk-who/bulk-calculation-csv?compact=true", data=body, content_type="text/csv"))
+
+    assert rows[0]["corrected_centile_band"].isdigit()
+
+
+def test_csv_missing_columns_are_rejected(client):
+    body = "birth_date,sex,measurement_method\n2020-04-12,male,height\n"
+
+    response = client.post("/uk-who/bulk-calculation-csv", data=body, content_type="text/csv")
+
+    assert response.status_code == 422
+    assert "observation_date" in response.get_data(as_text=True)
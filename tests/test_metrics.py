@@ -0,0 +1,57 @@
+from rcpchgrowth.rcpchgrowth.counters import reset_counters
+
+CALCULATION = {
+    "birth_date": "2020-04-12",
+    "observation_date": "2021-06-12",
+    "observation_value": 75,
+    "measurement_method": "height",
+    "sex": "male",
+    "gestation_weeks": 40,
+    "gestation_days": 0
+}
+
+
+def samples(client) -> dict:
+    # {sample name with its labels: value} from the Prometheus text format
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    values = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line and not line.startswith("#"):
+            sample, value = line.rsplit(" ", 1)
+            values[sample] = float(value)
+    return values
+
+
+def test_requests_are_counted_by_route_and_status(client):
+    before = samples(client)
+    client.post("/uk-who/calculation", json=CALCULATION)
+    client.post("/uk-who/calculation", json=CALCULATION)
+    client.post("/uk-who/calculation", data="not json")
+
+    after = samples(client)
+
+    def added(sample):
+        return after.get(sample, 0) - before.get(sample, 0)
+    assert added('growth_http_requests_total{method="POST",route="/uk-who/calculation",status="200"}') == 2
+    assert added('growth_http_requests_total{method="POST",route="/uk-who/calculation",status="400"}') == 1
+    assert added('growth_http_request_duration_seconds_count{method="POST",route="/uk-who/calculation"}') == 3
+    assert added('growth_http_request_duration_seconds_bucket{method="POST",route="/uk-who/calculation",le="+Inf"}') == 3
+    # the scrape in progress is in flight
+    assert after["growth_http_requests_in_flight"] == 1
+
+
+def test_cache_and_calculation_counters_are_exposed(client):
+    reset_counters()
+    client.post("/uk-who/calculation", json=CALCULATION)
+    client.post("/uk-who/calculation", json=CALCULATION)
+
+    after = samples(client)
+
+    assert after["growth_calculation_cache_misses_total"] == 1
+    assert after["growth_calculation_cache_hits_total"] == 1
+    assert after["growth_calculation_cache_hit_ratio"] == 0.5
+    # one calculation: chronological and corrected ages
+    assert after['growth_reference_lookups_total{reference="uk-who",measurement_method="height"}'] == 2
+    assert sum(value for sample, value in after.items() if sample.startswith("growth_uk_who_segments_total")) == 2
@@ -0,0 +1,42 @@
+import json
+
+from blueprints.openapi_blueprint import OpenApiSpec
+
+
+def test_spec_is_served_with_an_etag(client):
+    response = client.get("/")
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/json"
+    assert response.get_json()["openapi"].startswith("3.")
+    assert response.headers["ETag"]
+    assert response.headers["Growth-Api-Version"] == response.get_json()["info"]["version"]
+
+
+def test_unchanged_spec_is_not_modified(client):
+    etag = client.get("/").headers["ETag"].strip('"')
+
+    response = client.get("/", headers={"If-None-Match": f'"{etag}"'})
+
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert client.get("/", headers={"If-None-Match": '"another"'}).status_code == 200
+
+
+def test_regenerated_spec_is_reloaded(tmp_path):
+    spec_path = tmp_path / "openapi.json"
+    spec_path.write_text(json.dumps({"info": {"version": "v1"}}))
+    spec = OpenApiSpec(spec_path=str(spec_path), refresh_seconds=0)
+    _body, etag, version = spec.get()
+    assert version == "v1"
+
+    spec_path.write_text(json.dumps({"info": {"version": "v2 (regenerated)"}}))
+    spec.refresh()
+
+    assert spec.version == "v2 (regenerated)"
+    assert spec.get()[1] != etag
+
+    # a spec being rewritten is not served: the loaded one is kept
+    spec_path.write_text('{"info": ')
+    spec.refresh()
+    assert spec.version == "v2 (regenerated)"
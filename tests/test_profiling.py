@@ -0,0 +1,87 @@
+import json
+import pstats
+import tempfile
+
+import pytest
+
+from blueprints.profiling_blueprint import PROFILE_TOKEN_HEADER, request_profiler
+
+CALCULATION = {
+    "birth_date": "2020-04-12",
+    "observation_date": "2021-06-12",
+    "observation_value": 75,
+    "measurement_method": "height",
+    "sex": "male",
+    "gestation_weeks": 40,
+    "gestation_days": 0
+}
+
+TOKEN = "a-test-token"
+
+
+@pytest.fixture
+def profiled_client(app):
+    app.config["PROFILING_TOKEN"] = TOKEN
+    request_profiler.clear()
+    yield app.test_client()
+    request_profiler.clear()
+
+
+def test_profiling_is_off_without_a_token(client):
+    request_profiler.clear()
+    response = client.post("/uk-who/calculation", json=CALCULATION, headers={PROFILE_TOKEN_HEADER: TOKEN})
+
+    assert response.status_code == 200
+    assert request_profiler.report() == ""
+    assert client.get("/profiling", headers={PROFILE_TOKEN_HEADER: TOKEN}).status_code == 404
+
+
+def test_profiling_is_not_found_without_the_token(profiled_client):
+    assert profiled_client.get("/profiling").status_code == 404
+    assert profiled_client.get("/profiling", headers={PROFILE_TOKEN_HEADER: "wrong"}).status_code == 404
+    assert profiled_client.get("/profiling", headers={PROFILE_TOKEN_HEADER: TOKEN}).status_code == 200
+
+
+def test_only_requests_with_the_token_are_profiled(profiled_client):
+    profiled_client.post("/uk-who/calculation", json=CALCULATION)
+    assert profiled_client.get("/profiling", headers={PROFILE_TOKEN_HEADER: TOKEN}).get_data(as_text=True) == ""
+
+    profiled_client.post("/uk-who/calculation", json=CALCULATION, headers={PROFILE_TOKEN_HEADER: TOKEN})
+    profiled_client.post("/uk-who/calculation", json=CALCULATION, headers={PROFILE_TOKEN_HEADER: TOKEN})
+
+    response = profiled_client.get("/profiling", headers={PROFILE_TOKEN_HEADER: TOKEN})
+    assert response.status_code == 200
+    report = response.get_data(as_text=True)
+    assert report.startswith("/uk-who/calculation: 2 requests profiled since ")
+    assert "uk_who_calculation" in report
+
+
+def test_profiles_are_read_in_the_pstats_format(profiled_client):
+    profiled_client.post("/uk-who/calculation", json=CALCULATION, headers={PROFILE_TOKEN_HEADER: TOKEN})
+
+    response = profiled_client.get(
+        "/profiling?route=/uk-who/calculation&format=pstats", headers={PROFILE_TOKEN_HEADER: TOKEN})
+
+    assert response.status_code == 200
+    with tempfile.NamedTemporaryFile(suffix=".prof") as profile_file:
+        profile_file.write(response.get_data())
+        profile_file.flush()
+        stats = pstats.Stats(profile_file.name)
+    assert any(function_name == "uk_who_calculation" for _, _, function_name in stats.stats)
+    # a route which has not been profiled
+    assert profiled_client.get(
+        "/profiling?route=/turner/calculation&format=pstats", headers={PROFILE_TOKEN_HEADER: TOKEN}).status_code == 404
+
+
+def test_streamed_responses_are_profiled_until_the_last_chunk(profiled_client):
+    body = "".join(json.dumps(CALCULATION) + "\n" for _ in range(3))
+
+    response = profiled_client.post(
+        "/uk-who/bulk-calculation", data=body, content_type="application/x-ndjson", headers={PROFILE_TOKEN_HEADER: TOKEN})
+    assert len(response.get_data(as_text=True).splitlines()) == 3
+    response.close()
+
+    report = profiled_client.get("/profiling?limit=200", headers={PROFILE_TOKEN_HEADER: TOKEN}).get_data(as_text=True)
+    assert report.startswith("/uk-who/bulk-calculation: 1 requests profiled since ")
+    # the chunks, calculated as the response is sent
+    assert "calculate_ndjson_chunk" in report
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+CALCULATION = {
+    "birth_date": "2020-04-12",
+    "observation_date": "2021-06-12",
+    "observation_value": 75,
+    "measurement_method": "height",
+    "sex": "male",
+    "gestation_weeks": 40,
+    "gestation_days": 0
+}
+
+REFERENCE_PATHS = ["/uk-who", "/trisomy-21", "/turner"]
+
+
+@pytest.mark.parametrize("reference_path", REFERENCE_PATHS)
+def test_unknown_calculation_fields_are_rejected(client, reference_path):
+    fields = "?fields=measurement_calculated_values.corrected_sds,measurement_calculated_values.corected_sds"
+
+    single = client.post(f"{reference_path}/calculation{fields}", json=CALCULATION)
+    bulk = client.post(f"{reference_path}/bulk-calculation{fields}", data=json.dumps(CALCULATION) + "\n", content_type="application/x-ndjson")
+
+    for response in (single, bulk):
+        assert response.status_code == 422
+        assert "Unknown field: 'measurement_calculated_values.corected_sds'" in response.get_data(as_text=True)
+
+
+@pytest.mark.parametrize("reference_path", REFERENCE_PATHS)
+def test_plottable_child_data_fields(client, reference_path):
+    results = [client.post(f"{reference_path}/calculation", json=CALCULATION).get_json()]
+    full = client.post(f"{reference_path}/plottable-child-data", json={"results": results}).get_json()
+
+    selected = client.post(f"{reference_path}/plottable-child-data?fields=sex,child_data.centile_data.x", json={"results": results})
+    assert selected.status_code == 200
+    # the centile data are pairs of data points (chronological and corrected) for each measurement
+    centile_data = [[{"x": point["x"]} for point in pair] for pair in full["child_data"]["centile_data"]]
+    assert selected.get_json() == {"sex": "male", "child_data": {"centile_data": centile_data}}
+
+    unknown = client.post(f"{reference_path}/plottable-child-data?fields=child_data.centile_data.z", json={"results": results})
+    assert unknown.status_code == 422
+    assert "Unknown field: 'child_data.centile_data.z'" in unknown.get_data(as_text=True)
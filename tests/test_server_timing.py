@@ -0,0 +1,44 @@
+CALCULATION = {
+    "birth_date": "2020-04-12",
+    "observation_date": "2021-06-12",
+    "observation_value": 75,
+    "measurement_method": "height",
+    "sex": "male",
+    "gestation_weeks": 40,
+    "gestation_days": 0
+}
+
+
+def timings(response) -> dict:
+    # {stage: milliseconds} from the Server-Timing header
+    return {name: float(duration[len("dur="):])
+            for name, duration in (metric.strip().split(";") for metric in response.headers["Server-Timing"].split(","))}
+
+
+def test_no_header_unless_server_timing_is_set(client):
+    response = client.post("/uk-who/calculation", json=CALCULATION)
+
+    assert response.status_code == 200
+    assert "Server-Timing" not in response.headers
+
+
+def test_calculation_stages_are_timed(app):
+    app.config["SERVER_TIMING"] = True
+    client = app.test_client()
+    response = client.post("/uk-who/calculation", json=CALCULATION)
+
+    assert response.status_code == 200
+    stages = timings(response)
+    for name in ("parse", "validation", "ages", "reference", "lms", "centile", "serialize", "total"):
+        assert name in stages
+    assert list(stages)[-1] == "total"
+    # the stages do not overlap (each duration is rounded to a microsecond)
+    assert sum(value for name, value in stages.items() if name != "total") <= stages["total"] + 0.001 * len(stages)
+
+
+def test_requests_without_calculations_have_a_total(app):
+    app.config["SERVER_TIMING"] = True
+
+    response = app.test_client().get("/metrics")
+
+    assert list(timings(response)) == ["total"]
@@ -0,0 +1,66 @@
+import json
+import logging
+
+CALCULATION = {
+    "birth_date": "2020-04-12",
+    "observation_date": "2021-06-12",
+    "observation_value": 75,
+    "measurement_method": "height",
+    "sex": "male",
+    "gestation_weeks": 40,
+    "gestation_days": 0
+}
+
+
+def slow_request_records(caplog) -> list:
+    return [record for record in caplog.records if record.name == "slow_requests"]
+
+
+def test_no_log_unless_slow_request_seconds_is_set(client, caplog):
+    with caplog.at_level(logging.WARNING, logger="slow_requests"):
+        client.post("/uk-who/calculation", json=CALCULATION)
+
+    assert slow_request_records(caplog) == []
+
+
+def test_slow_requests_are_logged_with_timings_and_anonymised_inputs(app, caplog):
+    app.config["SLOW_REQUEST_SECONDS"] = 0
+    with caplog.at_level(logging.WARNING, logger="slow_requests"):
+        app.test_client().post("/uk-who/calculation", json=CALCULATION)
+
+    [record] = slow_request_records(caplog)
+    assert record.levelno == logging.WARNING
+    assert record.route == "/uk-who/calculation"
+    assert record.method == "POST"
+    assert record.status == 200
+    assert record.seconds >= 0
+    assert {"validation", "lms", "total"} <= set(record.stage_seconds)
+    assert record.inputs["reference"] == "uk_who"
+    assert record.inputs["measurement_method"] == "height"
+    assert record.inputs["age_bucket"] == "1.1-1.2"
+    assert record.inputs["preterm"] is False
+    # nothing which identifies the child
+    logged = json.dumps(record.inputs)
+    assert "2020-04-12" not in logged
+    assert "2021-06-12" not in logged
+
+
+def test_fast_requests_are_not_logged(app, caplog):
+    app.config["SLOW_REQUEST_SECONDS"] = 60
+    with caplog.at_level(logging.WARNING, logger="slow_requests"):
+        app.test_client().post("/uk-who/calculation", json=CALCULATION)
+
+    assert slow_request_records(caplog) == []
+
+
+def test_streamed_requests_are_logged_after_the_last_chunk(app, caplog):
+    app.config["SLOW_REQUEST_SECONDS"] = 0
+    body = json.dumps(CALCULATION) + "\n"
+    with caplog.at_level(logging.WARNING, logger="slow_requests"):
+        response = app.test_client().post("/uk-who/bulk-calculation", data=body, content_type="application/x-ndjson")
+        response.get_data()
+        response.close()
+
+    [record] = slow_request_records(caplog)
+    assert record.route == "/uk-who/bulk-calculation"
+    assert record.inputs["content_type"] == "application/x-ndjson"